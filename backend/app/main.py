@@ -22,12 +22,40 @@ from .routers import (
     qr_code_generator,
     youtube_downloader,
 )
-from .services.cleanup import cleanup_temporary_files
+from .services.artifacts import artifact_store
+from .services.cleanup import (
+    CLEANUP_INTERVAL_MINUTES,
+    TEMP_FILES_RECONCILE_HOURS,
+    cleanup_temporary_files,
+    reconcile_disk_usage,
+    reconcile_temp_files,
+    temp_files,
+)
+from .services.disk_usage import RECONCILE_INTERVAL_MINUTES, disk_usage
+from .services.executors import info_pool, playlist_info_pool
+from .services.jobs import job_registry
+from .services.media_store import media_store
+from .services.metadata_cache import metadata_cache
+from .services.pdf_engine import page_pool
+from .services.scratch import scratch_space
+from .utils import require_admin_token
 
 # Scheduler for cleanup tasks
 scheduler = BackgroundScheduler()
-# Run cleanup every 30 minutes to ensure strict 2-hour file lifespan enforcement
-scheduler.add_job(cleanup_temporary_files, "interval", minutes=30)
+# Delete expired files; only entries that are due are touched
+scheduler.add_job(
+    cleanup_temporary_files, "interval", minutes=CLEANUP_INTERVAL_MINUTES
+)
+# Find temp files that nothing registered for expiry
+scheduler.add_job(
+    reconcile_temp_files, "interval", hours=TEMP_FILES_RECONCILE_HOURS
+)
+# Forget finished jobs on the same cadence as their temp files
+scheduler.add_job(job_registry.prune, "interval", minutes=30)
+# Correct the disk usage ledger for files written behind its back
+scheduler.add_job(
+    reconcile_disk_usage, "interval", minutes=RECONCILE_INTERVAL_MINUTES
+)
 
 # Initialize rate limiter
 limiter = Limiter(key_func=get_remote_address)
@@ -36,8 +64,17 @@ limiter = Limiter(key_func=get_remote_address)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     scheduler.start()
+    # Build the disk usage ledger before the first admission check needs it
+    reconcile_disk_usage()
+    # Register the files a previous run left behind for expiry
+    reconcile_temp_files()
+    # The RAM scratch tier outlives the process but not its workspaces
+    scratch_space.clear_ram()
+    # Continue playlist jobs that a restart interrupted, from their checkpoints
+    await youtube_downloader.resume_playlist_jobs()
     yield
     scheduler.shutdown()
+    page_pool.shutdown()
 
 
 app = FastAPI(
@@ -65,7 +102,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition", "content-disposition"],
+    expose_headers=[
+        "Content-Disposition",
+        "content-disposition",
+        "Content-Location",
+        "X-Artifact-Id",
+    ],
 )
 
 # Add security middleware (order matters - add from innermost to outermost)
@@ -113,3 +155,23 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/api/admin/stats")
+async def admin_stats(request: Request):
+    """
+    Report the state of the storage, caches and worker pools.
+
+    Requires the X-Admin-Token header to match the ADMIN_TOKEN setting.
+    """
+    require_admin_token(request)
+    return {
+        "disk_usage": disk_usage.stats(),
+        "temp_files": temp_files.stats(),
+        "artifacts": artifact_store.stats(),
+        "media_store": media_store.stats(),
+        "metadata_cache": metadata_cache.stats(),
+        "scratch": scratch_space.stats(),
+        "page_pool": page_pool.stats(),
+        "work_pools": [info_pool.stats(), playlist_info_pool.stats()],
+    }
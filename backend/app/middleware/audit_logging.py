@@ -7,6 +7,8 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
 
+from app.utils import get_client_ip
+
 # Configure audit logger
 audit_logger = logging.getLogger("audit")
 audit_logger.setLevel(logging.INFO)
@@ -80,22 +82,7 @@ class AuditLoggingMiddleware(BaseHTTPMiddleware):
     
     def _get_client_ip(self, request: Request) -> str:
         """Extract client IP address, considering proxy headers."""
-        # Check X-Forwarded-For header (common in proxied environments)
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            # Take the first IP in the chain
-            return forwarded_for.split(",")[0].strip()
-        
-        # Check X-Real-IP header
-        real_ip = request.headers.get("X-Real-IP")
-        if real_ip:
-            return real_ip
-        
-        # Fall back to direct connection IP
-        if request.client:
-            return request.client.host
-        
-        return "unknown"
+        return get_client_ip(request)
     
     def _is_file_operation(self, request: Request) -> bool:
         """Check if the request is a file operation."""
@@ -5,10 +5,13 @@ from typing import List
 
 import pillow_avif  # noqa: F401
 from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse
 from PIL import Image
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from starlette.background import BackgroundTask
+
+from app.services.scratch import scratch_space
 
 router = APIRouter()
 
@@ -69,62 +72,82 @@ async def convert_image(
                 f" Supported formats are: {list(SUPPORTED_INPUT_FORMATS.keys())}",
             )
 
-    converted_files = []
-    for file in files:
-        try:
-            image_data = await file.read()
-            image = Image.open(io.BytesIO(image_data))
-
-            if output_format == "jpeg" and image.mode in ("RGBA", "P", "LA"):
-                if image.mode != "RGBA":
-                    image = image.convert("RGBA")
-
-                background = Image.new("RGB", image.size, (255, 255, 255))
-                background.paste(image, (0, 0), image)
-                image = background
-            elif output_format == "ico" and image.mode in ("RGBA", "P"):
-                image = image.convert("RGB")
-
-            output_io = io.BytesIO()
-            image.save(output_io, format=SUPPORTED_OUTPUT_FORMATS[output_format])
-            output_io.seek(0)
-
-            base_filename, _ = os.path.splitext(file.filename)
-            new_filename = f"{base_filename}.{output_format}"
-
-            converted_files.append({"filename": new_filename, "data": output_io})
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"An error occurred during conversion"
-                f" of {file.filename}: {str(e)}",
+    # Converted images and the ZIP are written to a workspace, which is
+    # removed once the response has been sent
+    workspace = scratch_space.open("image-converter")
+    try:
+        converted_files = []
+        for index, file in enumerate(files):
+            try:
+                image_data = await file.read()
+                image = Image.open(io.BytesIO(image_data))
+
+                if output_format == "jpeg" and image.mode in ("RGBA", "P", "LA"):
+                    if image.mode != "RGBA":
+                        image = image.convert("RGBA")
+
+                    background = Image.new("RGB", image.size, (255, 255, 255))
+                    background.paste(image, (0, 0), image)
+                    image = background
+                elif output_format == "ico" and image.mode in ("RGBA", "P"):
+                    image = image.convert("RGB")
+
+                # Most conversions stay close to the input's size
+                output_path = workspace.path(
+                    f"{index}.{output_format}", len(image_data)
+                )
+                image.save(output_path, format=SUPPORTED_OUTPUT_FORMATS[output_format])
+
+                base_filename, _ = os.path.splitext(file.filename)
+                new_filename = f"{base_filename}.{output_format}"
+
+                converted_files.append(
+                    {"filename": new_filename, "path": workspace.written(output_path)}
+                )
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"An error occurred during conversion"
+                    f" of {file.filename}: {str(e)}",
+                )
+
+        # If only one file was processed, return it directly
+        if len(converted_files) == 1:
+            single_file = converted_files[0]
+            media_type = f"image/{output_format}"
+            if output_format == "ico":
+                media_type = "image/x-icon"
+
+            return FileResponse(
+                single_file["path"],
+                media_type=media_type,
+                headers={
+                    "Content-Disposition": (
+                        f"attachment; filename={single_file['filename']}"
+                    )
+                },
+                background=BackgroundTask(workspace.close),
             )
 
-    # If only one file was processed, return it directly
-    if len(converted_files) == 1:
-        single_file = converted_files[0]
-        media_type = f"image/{output_format}"
-        if output_format == "ico":
-            media_type = "image/x-icon"
-
-        return StreamingResponse(
-            single_file["data"],
-            media_type=media_type,
+        # If multiple files were processed, return a zip archive
+        zip_path = workspace.path(
+            "converted_images.zip",
+            sum(os.path.getsize(f["path"]) for f in converted_files),
+        )
+        with zipfile.ZipFile(
+            zip_path, mode="w", compression=zipfile.ZIP_DEFLATED
+        ) as zipf:
+            for f in converted_files:
+                zipf.write(f["path"], f["filename"])
+
+        return FileResponse(
+            workspace.written(zip_path),
+            media_type="application/zip",
             headers={
-                "Content-Disposition": f"attachment; filename={single_file['filename']}"
+                "Content-Disposition": "attachment; filename=converted_images.zip"
             },
+            background=BackgroundTask(workspace.close),
         )
-
-    # If multiple files were processed, return a zip archive
-    zip_io = io.BytesIO()
-    with zipfile.ZipFile(zip_io, mode="w", compression=zipfile.ZIP_DEFLATED) as zipf:
-        for f in converted_files:
-            zipf.writestr(f["filename"], f["data"].getvalue())
-
-    zip_io.seek(0)
-
-    return StreamingResponse(
-        zip_io,
-        media_type="application/zip",
-        headers={"Content-Disposition": "attachment; filename=converted_images.zip"},
-    )
+    except BaseException:
+        workspace.close()
+        raise
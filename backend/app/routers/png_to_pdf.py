@@ -1,22 +1,22 @@
 # app/routers/png_to_pdf.py
+import asyncio
 import logging
-import os
 import shutil
 import subprocess
-import tempfile
 import uuid
 from pathlib import Path
 from typing import List
 
 from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
 from fastapi.responses import FileResponse
-from PIL import Image
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from starlette.background import BackgroundTask
+from starlette.background import BackgroundTasks
 
-from app.services.cleanup import check_disk_space_available
-from app.utils import sanitize_filename
+from app.services.cleanup import DiskSpaceUnavailable, reserve_disk_space
+from app.services.pdf_engine import InvalidImageError, images_to_pdf
+from app.services.scratch import Workspace, scratch_space
+from app.utils import get_client_ip, sanitize_filename
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -40,8 +40,8 @@ def validate_image_file(file: UploadFile) -> bool:
     return file_ext in ALLOWED_EXTENSIONS
 
 
-def save_uploaded_file(file: UploadFile, temp_dir: str) -> str:
-    """Save uploaded file to temporary directory"""
+def save_uploaded_file(file: UploadFile, workspace: Workspace) -> str:
+    """Save uploaded file to the request's workspace"""
     if not validate_image_file(file):
         raise HTTPException(
             status_code=400, detail=f"Invalid file type. Allowed: {ALLOWED_EXTENSIONS}"
@@ -50,101 +50,68 @@ def save_uploaded_file(file: UploadFile, temp_dir: str) -> str:
     # Generate unique filename
     file_ext = Path(file.filename).suffix.lower()
     unique_filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = os.path.join(temp_dir, unique_filename)
+    file_path = workspace.path(unique_filename, file.size)
 
     # Save file
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
-
-    # Validate it's actually an image
-    try:
-        with Image.open(file_path) as img:
-            img.verify()
-    except Exception as e:
-        os.remove(file_path)
-        raise HTTPException(
-            status_code=400, detail=f"Invalid image file; verification error: {e}"
-        )
-
-    return file_path
+    # The content is validated when the image is decoded for conversion
+    return workspace.written(file_path)
 
 
 def convert_images_to_pdf(
-    image_paths: List[str], output_path: str, dpi: int = 300
+    image_paths: List[str],
+    output_path: str,
+    dpi: int,
+    workspace: Workspace,
+    ocr: bool = False,
 ) -> str:
-    """Convert list of images to PDF using ocrmypdf"""
+    """
+    Convert a list of images to a PDF, one page per image.
+
+    The PDF is written without external tools: JPEGs are embedded as they
+    are and other images losslessly, with the pages encoded in parallel on
+    the shared page pool. With ocr set, the PDF is then run through ocrmypdf
+    once to add a searchable text layer.
+    """
     try:
-        # Create a temporary directory for intermediate files
-        with tempfile.TemporaryDirectory() as temp_conversion_dir:
-            # Convert each image to PDF first (ocrmypdf requirement)
-            pdf_files = []
-
-            for i, image_path in enumerate(image_paths):
-                temp_pdf = os.path.join(temp_conversion_dir, f"page_{i:03d}.pdf")
-
-                # Use ocrmypdf to convert image to PDF with specified DPI
-                cmd = [
-                    "ocrmypdf",
-                    "--image-dpi",
-                    str(dpi),
-                    "--output-type",
-                    "pdf",
-                    "--skip-text",  # Don't perform OCR, just convert
-                    "--optimize",
-                    "0",  # Disable optimization to avoid Ghostscript issues
-                    image_path,
-                    temp_pdf,
-                ]
-
-                result = subprocess.run(cmd, capture_output=True, text=True)
-
-                if result.returncode != 0:
-                    logger.error(f"ocrmypdf failed for {image_path}: {result.stderr}")
-                    raise HTTPException(
-                        status_code=500, detail=f"Conversion failed: {result.stderr}"
-                    )
-
-                pdf_files.append(temp_pdf)
-
-            # Merge all PDFs into one
-            if len(pdf_files) == 1:
-                shutil.copy(pdf_files[0], output_path)
-            else:
-                # Use pypdf to merge PDFs
-                merge_pdfs(pdf_files, output_path)
-
-            return output_path
-
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Subprocess error: {e}")
-        raise HTTPException(status_code=500, detail="PDF conversion failed")
+        if not ocr:
+            return images_to_pdf(image_paths, output_path, dpi)
+
+        pages_path = workspace.path("pages.pdf")
+        images_to_pdf(image_paths, pages_path, dpi)
+        workspace.written(pages_path)
+        cmd = [
+            "ocrmypdf",
+            "--output-type",
+            "pdf",
+            "--optimize",
+            "0",  # Disable optimization to avoid Ghostscript issues
+            pages_path,
+            output_path,
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            logger.error(f"ocrmypdf failed: {result.stderr}")
+            raise HTTPException(
+                status_code=500, detail=f"Conversion failed: {result.stderr}"
+            )
+        return output_path
+
+    except InvalidImageError as e:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid image file; verification error: {e}"
+        )
+    except FileNotFoundError:
+        logger.error("OCR requested but ocrmypdf is not installed")
+        raise HTTPException(status_code=500, detail="OCR is not available")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Conversion error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def merge_pdfs(pdf_files: List[str], output_path: str):
-    """Merge multiple PDF files into one using pypdf"""
-    try:
-        from pypdf import PdfWriter
-
-        writer = PdfWriter()
-
-        for pdf_file in pdf_files:
-            writer.append(pdf_file)
-
-        with open(output_path, "wb") as output_file:
-            writer.write(output_file)
-
-    except ImportError:
-        # Fallback to using pdftk or similar command-line tool
-        cmd = ["pdftk"] + pdf_files + ["cat", "output", output_path]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-
-        if result.returncode != 0:
-            raise HTTPException(status_code=500, detail="PDF merging failed")
-
-
 @router.post("/convert")
 @limiter.limit("10/minute")
 async def convert_png_to_pdf(
@@ -152,15 +119,9 @@ async def convert_png_to_pdf(
     files: List[UploadFile] = File(...),
     dpi: int = Form(300),
     filename: str = Form("converted_document"),
+    ocr: bool = Form(False),
 ):
-    """Convert multiple PNG/JPG files to a single PDF"""
-
-    # Check disk space before accepting new conversion
-    if not check_disk_space_available():
-        raise HTTPException(
-            status_code=507,
-            detail="Service storage limit reached. Please try again later."
-        )
+    """Convert multiple PNG/JPG files to a single PDF, optionally with OCR"""
 
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
@@ -172,9 +133,16 @@ async def convert_png_to_pdf(
     if not 72 <= dpi <= 600:
         raise HTTPException(status_code=400, detail="DPI must be between 72 and 600")
 
-    # Create temporary directory for this conversion,
+    # Reserve room for the images and a PDF of about the same size
+    upload_bytes = sum(file.size or MAX_FILE_SIZE for file in files)
+    try:
+        reservation = reserve_disk_space(get_client_ip(request), 2 * upload_bytes)
+    except DiskSpaceUnavailable as e:
+        raise HTTPException(status_code=429 if e.quota_exceeded else 507, detail=str(e))
+
+    # Create a workspace for this conversion,
     # which will be cleaned up by a background task
-    temp_dir = tempfile.mkdtemp()
+    workspace = scratch_space.open("png-to-pdf")
 
     try:
         # Save all uploaded files
@@ -185,7 +153,7 @@ async def convert_png_to_pdf(
                     status_code=400, detail=f"File {file.filename} is too large"
                 )
 
-            file_path = save_uploaded_file(file, temp_dir)
+            file_path = save_uploaded_file(file, workspace)
             image_paths.append(file_path)
 
         # Generate output filename with sanitization to prevent path traversal
@@ -193,23 +161,32 @@ async def convert_png_to_pdf(
         output_filename = (
             f"{sanitized_filename}.pdf" if not sanitized_filename.endswith(".pdf") else sanitized_filename
         )
-        output_path = os.path.join(temp_dir, output_filename)
+        # The client gets output_filename; the path never holds user input
+        output_path = workspace.path("document.pdf", upload_bytes)
 
-        # Convert to PDF
-        convert_images_to_pdf(image_paths, output_path, dpi)
+        # Convert to PDF, waiting for the page pool off the event loop
+        await asyncio.to_thread(
+            convert_images_to_pdf, image_paths, output_path, dpi, workspace, ocr
+        )
+        output_path = workspace.written(output_path)
 
-        # Return the PDF file with a background task to clean up the temp directory
+        # Return the PDF file with background tasks to clean up the
+        # workspace and release its reservation
+        cleanup = BackgroundTasks()
+        cleanup.add_task(workspace.close)
+        cleanup.add_task(reservation.release)
         return FileResponse(
             path=output_path,
             filename=output_filename,
             media_type="application/pdf",
-            background=BackgroundTask(shutil.rmtree, temp_dir, ignore_errors=True),
+            background=cleanup,
         )
 
     except Exception as e:
         # If any exception occurs,
-        # ensure the temp directory is cleaned up before raising
-        shutil.rmtree(temp_dir, ignore_errors=True)
+        # ensure the workspace is cleaned up before raising
+        workspace.close()
+        reservation.release()
         if isinstance(e, HTTPException):
             raise
         logger.error(f"Unexpected error: {e}")
@@ -225,4 +202,5 @@ async def get_conversion_info():
         "max_file_size_mb": MAX_FILE_SIZE // (1024 * 1024),
         "max_files": 50,
         "dpi_range": {"min": 72, "max": 600, "default": 300},
+        "ocr_available": shutil.which("ocrmypdf") is not None,
     }
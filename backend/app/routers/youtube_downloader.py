@@ -1,24 +1,74 @@
+import asyncio
+import copy
+import itertools
 import json
 import logging
 import math
 import os
 import re
+import statistics
+import time
 import uuid
-import zipfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from functools import partial
 from shutil import rmtree
-from threading import Lock
+from threading import Event
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional
+from urllib.parse import quote
 
 import yt_dlp
 from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Request
-from fastapi.responses import FileResponse, JSONResponse
-from pydantic import BaseModel, field_validator
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from starlette.background import BackgroundTasks as ResponseBackgroundTasks
+from starlette.concurrency import run_in_threadpool
 from werkzeug.utils import secure_filename
 
-from app.services.cleanup import check_disk_space_available
-from app.utils import sanitize_filename
+from app.services.artifacts import ArtifactResponse, artifact_store
+from app.services.bandwidth import bandwidth_governor
+from app.services.cleanup import (
+    DiskSpaceUnavailable,
+    reserve_disk_space,
+    temp_files,
+)
+from app.services.concurrency import adaptive_concurrency
+from app.services.disk_usage import DiskReservation
+from app.services.download_scheduler import download_scheduler
+from app.services.executors import (
+    BlockingWorkPool,
+    WorkPoolBusyError,
+    WorkPoolTimeoutError,
+    info_pool,
+    playlist_info_pool,
+)
+from app.services.jobs import TERMINAL_STATUSES, job_registry
+from app.services.media_pipe import MediaPipeBusyError, open_media_pipe
+from app.services.media_store import MediaEntry, MediaKey, media_store
+from app.services.metadata_cache import (
+    metadata_cache,
+    parse_video_id,
+    playlist_cache_key,
+    video_cache_key,
+)
+from app.services.streaming_zip import StreamingZipWriter, partial_path
+from app.services.transcoder import (
+    AUDIO_FORMATS,
+    CANCEL_POLL_SECONDS,
+    DEFAULT_MP3_BITRATE,
+    MP3_BITRATES,
+    TranscodeError,
+    convert_audio,
+    pipe_command,
+    transcode_pool,
+)
+from app.services.transfer_progress import (
+    PROGRESS_INTERVAL_SECONDS,
+    TransferProgress,
+    throughput_log,
+)
+from app.utils import get_client_ip, require_admin_token, sanitize_filename
 
 # from urllib.parse import parse_qs, urlparse
 
@@ -33,6 +83,62 @@ router = APIRouter()
 # Initialize rate limiter for this router
 limiter = Limiter(key_func=get_remote_address)
 
+# Longest video accepted for download, in seconds (2 hours)
+MAX_VIDEO_DURATION = 7200
+
+# Longest a single /download/{file_format} request waits for its file
+DOWNLOAD_TIMEOUT_SECONDS = 1800
+# How often a running playlist job refreshes its queue position and byte
+# progress
+QUEUE_POSITION_REFRESH_SECONDS = PROGRESS_INTERVAL_SECONDS
+
+# Most entries listed for a playlist, and the page sizes of the streamed listing
+PLAYLIST_LISTING_MAX = 500
+PLAYLIST_PAGE_DEFAULT = 100
+
+# Quality component of media store keys for each output format; MP3s are
+# keyed by their bitrate instead
+MEDIA_QUALITY = {"mp4": "best", "m4a": "copy", "opus": "copy"}
+# Content type of each output format
+MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "mp4": "video/mp4",
+    "m4a": "audio/mp4",
+    "opus": "audio/ogg",
+}
+# yt-dlp format selection for each audio format. Passthrough formats prefer a
+# source stream that can be copied into their container as-is.
+AUDIO_SOURCE_FORMATS = {
+    "mp3": "bestaudio/best",
+    "m4a": "bestaudio[ext=m4a]/bestaudio[acodec^=mp4a]/bestaudio/best",
+    "opus": "bestaudio[acodec=opus]/bestaudio/best",
+}
+
+# Bytes per second of output, for estimating a download's size from its
+# duration; MP3s use their bitrate
+MEDIA_BYTE_RATES = {"mp4": 2_500_000 // 8, "m4a": 128_000 // 8, "opus": 160_000 // 8}
+# Duration assumed for a video whose metadata has not been extracted yet and
+# that no listing gives a duration for
+DEFAULT_ESTIMATE_DURATION = 600
+
+# yt-dlp format selection for piped downloads. The streams must fit their
+# container as-is, since a pipe cannot fall back to another format halfway.
+PIPE_SOURCE_FORMATS = {
+    "mp3": "bestaudio/best",
+    "m4a": "bestaudio[ext=m4a]/bestaudio[acodec^=mp4a]",
+    "opus": "bestaudio[acodec=opus]",
+    "mp4": "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]",
+}
+
+# Seconds between keep-alive comments on an idle progress event stream
+PROGRESS_STREAM_KEEPALIVE = 15
+# How long a job keeps running after its progress stream disconnected, so
+# that a reconnecting or polling client can take over
+ABANDONED_JOB_GRACE_SECONDS = 30
+# Read size and idle wait when tailing a playlist ZIP that is still being built
+ZIP_STREAM_CHUNK_SIZE = 1024 * 1024
+ZIP_STREAM_POLL_SECONDS = 1
+
 
 class URLModel(BaseModel):
     url: str
@@ -51,9 +157,18 @@ class URLModel(BaseModel):
         return v
 
 
+class BandwidthConfigModel(BaseModel):
+    # Global limit in bytes per second; 0 removes the limit
+    limit: Optional[int] = Field(None, ge=0)
+    # Largest fraction of the global limit one job may use
+    job_share: Optional[float] = Field(None, gt=0, le=1)
+
+
 class PlaylistDownloadModel(BaseModel):
     url: str
     video_ids: list[str]
+    audio_format: str = "mp3"
+    bitrate: str = DEFAULT_MP3_BITRATE
 
     @field_validator("url")
     @classmethod
@@ -79,6 +194,22 @@ class PlaylistDownloadModel(BaseModel):
                 raise ValueError(f"Invalid video ID format: {video_id}")
         return v
 
+    @field_validator("audio_format")
+    @classmethod
+    def validate_audio_format(cls, v: str) -> str:
+        """Validate the audio format of the playlist files."""
+        if v not in AUDIO_FORMATS:
+            raise ValueError(f"Audio format must be one of: {', '.join(AUDIO_FORMATS)}")
+        return v
+
+    @field_validator("bitrate")
+    @classmethod
+    def validate_bitrate(cls, v: str) -> str:
+        """Validate the MP3 bitrate."""
+        if v not in MP3_BITRATES:
+            raise ValueError(f"Bitrate must be one of: {', '.join(MP3_BITRATES)}")
+        return v
+
 
 # def remove_file(path: str):
 #     if os.path.exists(path):
@@ -100,6 +231,124 @@ def remove_dir(path: str):
         rmtree(path)
 
 
+def add_video_to_zip(zip_writer: StreamingZipWriter, entry: MediaEntry):
+    """
+    Append a stored video to the ZIP under its title, then release it.
+
+    The ZIP holds the only copy needed, so the stored file is deleted unless
+    another request is using it.
+    """
+    try:
+        ext = os.path.splitext(entry.path)[1]
+        title = yt_dlp.utils.sanitize_filename(entry.metadata.get("title", "video"))
+        zip_writer.add_file(entry.path, arcname=f"{title}{ext}")
+    finally:
+        media_store.release(entry, keep=False)
+
+
+def media_key(
+    video_id: str, file_format: str, bitrate: str = DEFAULT_MP3_BITRATE
+) -> MediaKey:
+    """Return the media store key of a video in an output format."""
+    quality = bitrate if file_format == "mp3" else MEDIA_QUALITY[file_format]
+    return (video_id, file_format, quality)
+
+
+def estimate_output_bytes(
+    info: Optional[dict], file_format: str, bitrate: str = DEFAULT_MP3_BITRATE
+) -> int:
+    """Estimate the size of a video's file in the output format."""
+    info = info or {}
+    size = info.get("filesize") or info.get("filesize_approx")
+    if file_format == "mp4" and size:
+        return int(size)
+    duration = info.get("duration") or DEFAULT_ESTIMATE_DURATION
+    if file_format == "mp3":
+        return int(duration * int(bitrate) * 1000 // 8)
+    return int(duration * MEDIA_BYTE_RATES[file_format])
+
+
+def estimate_media_bytes(
+    info: Optional[dict], file_format: str, bitrate: str = DEFAULT_MP3_BITRATE
+) -> int:
+    """
+    Estimate the disk space a download takes at its peak.
+
+    The downloaded source (filesize or filesize_approx from the metadata) and
+    the converted output exist side by side until the source is deleted.
+    """
+    output = estimate_output_bytes(info, file_format, bitrate)
+    source = (info or {}).get("filesize") or (info or {}).get("filesize_approx")
+    return int(source or output) + output
+
+
+def estimate_playlist_bytes(
+    listing: Optional[dict],
+    video_ids: list[str],
+    file_format: str,
+    bitrate: str = DEFAULT_MP3_BITRATE,
+) -> int:
+    """
+    Estimate the disk space a playlist job takes at its peak.
+
+    The ZIP ends up with a copy of every video. Sources and stored files only
+    exist while a video is in flight (the stored copy is deleted once
+    zipped), so they are charged for the largest videos the job can have in
+    flight at once: the ones downloading and as many waiting for conversion.
+
+    Args:
+        listing: The playlist listing with per-video durations, if cached
+        video_ids: The videos of the job
+        file_format: Output format of every video
+        bitrate: MP3 bitrate
+    """
+    entries = {
+        entry.get("id"): entry
+        for entry in (listing or {}).get("entries") or []
+        if entry
+    }
+    # Videos without a listed duration are assumed to be as long as the
+    # median listed video rather than DEFAULT_ESTIMATE_DURATION
+    durations = [
+        entry["duration"] for entry in entries.values() if entry.get("duration")
+    ]
+    fallback = {"duration": statistics.median(durations)} if durations else {}
+
+    infos = []
+    for video_id in video_ids:
+        info = entries.get(video_id) or {}
+        infos.append(info if info.get("duration") else {**info, **fallback})
+    peaks = sorted(
+        (estimate_media_bytes(info, file_format, bitrate) for info in infos),
+        reverse=True,
+    )
+    in_flight = peaks[: 2 * calculate_thread_count(len(video_ids))]
+    return sum(in_flight) + sum(
+        estimate_output_bytes(info, file_format, bitrate) for info in infos
+    )
+
+
+def admit(client_id: str, nbytes: int) -> DiskReservation:
+    """Reserve storage for a request, or refuse it with 507 or 429."""
+    try:
+        return reserve_disk_space(client_id, nbytes)
+    except DiskSpaceUnavailable as e:
+        raise HTTPException(status_code=429 if e.quota_exceeded else 507, detail=str(e))
+
+
+def release_with(
+    reservation: DiskReservation, on_delete: Optional[Callable[[], None]] = None
+) -> Callable[[], None]:
+    """Return an artifact callback that also releases a settled reservation."""
+
+    def release():
+        reservation.release()
+        if on_delete is not None:
+            on_delete()
+
+    return release
+
+
 def calculate_thread_count(video_count: int) -> int:
     """
     Calculate the number of threads to use based on video count.
@@ -119,16 +368,165 @@ def calculate_thread_count(video_count: int) -> int:
     return threads
 
 
+class PlaylistJobCancelled(Exception):
+    """The playlist job was cancelled while it was running."""
+
+
+class VideoDownloadError(Exception):
+    """A playlist video failed; carries its failed result dict."""
+
+    def __init__(self, result: dict):
+        super().__init__(result.get("error", "Unknown error"))
+        self.result = result
+
+
+def cancellation_hook(cancel_event: Event):
+    """Build a yt-dlp progress hook that aborts the download once cancelled."""
+
+    def hook(_status: dict):
+        if cancel_event.is_set():
+            raise yt_dlp.utils.DownloadCancelled("Download cancelled")
+
+    return hook
+
+
+async def run_blocking(pool: BlockingWorkPool, fn, *args):
+    """Run blocking work off the event loop, mapping pool errors to HTTP errors."""
+    try:
+        return await pool.run(fn, *args)
+    except WorkPoolBusyError:
+        raise HTTPException(
+            status_code=503, detail="Server is busy. Please try again shortly."
+        )
+    except WorkPoolTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+
+def extract_video_info(url: str) -> dict:
+    """Return single-video metadata for a URL, served from the metadata cache."""
+
+    def load() -> dict:
+        with yt_dlp.YoutubeDL({"noplaylist": True}) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    return metadata_cache.get_or_load(video_cache_key(url), load)
+
+
+def extract_playlist_info(url: str) -> dict:
+    """Return flat playlist metadata for a URL, served from the metadata cache."""
+
+    def load() -> dict:
+        ydl_opts = {
+            "extract_flat": True,
+            "playlistend": PLAYLIST_LISTING_MAX,
+        }
+        logging.info(f"Attempting to extract playlist info with options: {ydl_opts}")
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+
+            # If the extractor is a 'youtube:tab', it means it's a playlist page
+            # that might need a second pass to get the actual video entries.
+            if info.get("extractor_key") == "YoutubeTab" and "url" in info:
+                logging.info(
+                    "youtube:tab detected. Re-extracting with playlist URL: "
+                    f"{info['url']}"
+                )
+                info = ydl.extract_info(info["url"], download=False)
+        return info
+
+    return metadata_cache.get_or_load(playlist_cache_key(url), load)
+
+
+def duration_error(
+    video_id: str, title: str, duration: float, max_duration: int
+) -> dict:
+    """Build the failed result for a video that is longer than max_duration."""
+    max_hours = max_duration / 3600
+    actual_hours = duration / 3600
+    logging.warning(
+        f"Skipping video {video_id} ('{title}'): "
+        f"duration {actual_hours:.2f}h exceeds limit of {max_hours:.2f}h"
+    )
+    return {
+        "success": False,
+        "video_id": video_id,
+        "title": title,
+        "error": f"Video duration ({actual_hours:.2f}h) exceeds {max_hours}h limit",
+    }
+
+
+def partition_by_duration(
+    video_ids: list[str], playlist_info: dict, max_duration: int = MAX_VIDEO_DURATION
+) -> tuple[list[str], list[dict]]:
+    """
+    Reject over-limit videos using the durations from a flat playlist listing.
+
+    Videos whose duration is unknown in the listing are accepted; their
+    duration is checked again once their full metadata is extracted.
+
+    Returns:
+        tuple: (accepted video IDs, failed results for rejected videos)
+    """
+    entries = {
+        entry["id"]: entry
+        for entry in playlist_info.get("entries") or []
+        if entry and entry.get("id")
+    }
+    accepted = []
+    rejected = []
+    for video_id in video_ids:
+        entry = entries.get(video_id, {})
+        duration = entry.get("duration") or 0
+        if duration > max_duration:
+            rejected.append(
+                duration_error(
+                    video_id, entry.get("title", "Unknown"), duration, max_duration
+                )
+            )
+        else:
+            accepted.append(video_id)
+    return accepted, rejected
+
+
+def find_downloaded_file(directory: str, ext: str) -> str:
+    """Return the file with the given extension in directory, else the largest."""
+    files = [os.path.join(directory, f) for f in os.listdir(directory)]
+    files = [f for f in files if os.path.isfile(f)]
+    if not files:
+        raise FileNotFoundError("Downloaded file not found.")
+    matching = [f for f in files if f.endswith(ext)]
+    return max(matching or files, key=os.path.getsize)
+
+
 def download_single_video(
-    video_id: str, temp_dir: str, max_duration: int = 7200
+    video_id: str,
+    temp_dir: str,
+    max_duration: int = MAX_VIDEO_DURATION,
+    extract_audio: bool = True,
+    cancel_event: Optional[Event] = None,
+    audio_format: str = "mp3",
+    bitrate: str = DEFAULT_MP3_BITRATE,
+    bandwidth_job: Optional[str] = None,
+    progress_hook: Optional[Callable[[dict], None]] = None,
 ) -> dict:
     """
     Download a single video with error handling and duration check.
 
+    Metadata is extracted once (or taken from the metadata cache), the
+    duration limit is enforced on it before any media is fetched, and the
+    same metadata then drives the download.
+
     Args:
         video_id: The YouTube video ID
         temp_dir: Directory to save the downloaded file
         max_duration: Maximum video duration in seconds (default: 7200 = 2 hours)
+        extract_audio: Convert to audio_format with ffmpeg in this thread.
+            When False, the raw audio is kept for the transcode pool to convert.
+        cancel_event: When set, the download is aborted at its next chunk
+        audio_format: One of AUDIO_FORMATS; selects the source stream too
+        bitrate: MP3 bitrate in kbps
+        bandwidth_job: Job whose bandwidth share the download counts against
+        progress_hook: Additional yt-dlp progress hook, e.g. for byte progress
 
     Returns:
         dict with keys: success (bool), video_id (str), error (str, optional)
@@ -137,48 +535,52 @@ def download_single_video(
 
     try:
         # First, check video duration
-        info_opts = {"noplaylist": True}
-        with yt_dlp.YoutubeDL(info_opts) as ydl:
-            info = ydl.extract_info(video_url, download=False)
-            duration = info.get("duration", 0)
-            title = info.get("title", "Unknown")
-
-            if duration > max_duration:
-                max_hours = max_duration / 3600
-                actual_hours = duration / 3600
-                logging.warning(
-                    f"Skipping video {video_id} ('{title}'): "
-                    f"duration {actual_hours:.2f}h exceeds limit of {max_hours:.2f}h"
-                )
-                return {
-                    "success": False,
-                    "video_id": video_id,
-                    "title": title,
-                    "error": f"Video duration ({actual_hours:.2f}h) exceeds {max_hours}h limit",
-                }
+        info = extract_video_info(video_url)
+        duration = info.get("duration") or 0
+        title = info.get("title", "Unknown")
+
+        if duration > max_duration:
+            return duration_error(video_id, title, duration, max_duration)
 
         # Download the video
         ydl_opts = {
-            "format": "bestaudio/best",
-            "postprocessors": [
-                {
-                    "key": "FFmpegExtractAudio",
-                    "preferredcodec": "mp3",
-                    "preferredquality": "192",
-                }
-            ],
+            "format": AUDIO_SOURCE_FORMATS[audio_format],
             "outtmpl": os.path.join(temp_dir, "%(title)s.%(ext)s"),
             "noplaylist": True,
         }
-
+        if extract_audio:
+            # For passthrough formats yt-dlp copies a matching stream as-is
+            ydl_opts["postprocessors"] = [
+                {
+                    "key": "FFmpegExtractAudio",
+                    "preferredcodec": audio_format,
+                    "preferredquality": bitrate,
+                }
+            ]
+        # Finished transfers feed the adaptive download concurrency; every
+        # chunk is charged to the shared bandwidth budget
+        ydl_opts["progress_hooks"] = [
+            adaptive_concurrency.progress_hook,
+            bandwidth_governor.progress_hook(bandwidth_job, cancel_event),
+        ]
+        if progress_hook is not None:
+            ydl_opts["progress_hooks"].append(progress_hook)
+        if cancel_event is not None:
+            if cancel_event.is_set():
+                raise yt_dlp.utils.DownloadCancelled("Download cancelled")
+            ydl_opts["progress_hooks"].append(cancellation_hook(cancel_event))
+
+        # Download from the extracted metadata instead of extracting again.
+        # The cached dict is shared, and processing it mutates it.
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([video_url])
+            ydl.process_ie_result(copy.deepcopy(info), download=True)
 
         logging.info(f"Successfully downloaded video {video_id} ('{title}')")
         return {"success": True, "video_id": video_id, "title": title}
 
     except Exception as e:
         logging.error(f"Error downloading video {video_id}: {e}")
+        adaptive_concurrency.record_error(str(e))
         return {
             "success": False,
             "video_id": video_id,
@@ -186,35 +588,165 @@ def download_single_video(
         }
 
 
+def download_playlist_video(
+    video_id: str,
+    max_duration: int = MAX_VIDEO_DURATION,
+    cancel_event: Optional[Event] = None,
+    audio_format: str = "mp3",
+    bitrate: str = DEFAULT_MP3_BITRATE,
+    bandwidth_job: Optional[str] = None,
+    progress_hook: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Download stage of a playlist video; runs on a download scheduler worker.
+
+    A video already in the media store is not downloaded again. Otherwise
+    its raw audio is downloaded and the result carries the media store
+    reservation and "raw_path" for transcode_playlist_video, so this worker
+    is free for the next download while the audio is converted.
+
+    Returns:
+        The result of download_single_video; a finished success also holds
+        the referenced media entry under "media", which the caller must release.
+    """
+    key = media_key(video_id, audio_format, bitrate)
+    while True:
+        claim = media_store.reserve(key)
+        if isinstance(claim, MediaEntry):
+            return {
+                "success": True,
+                "video_id": video_id,
+                "title": claim.metadata.get("title", "Unknown"),
+                "media": claim,
+            }
+        if not isinstance(claim, Future):
+            break
+        # Another job is producing this video; failures are not cached, so
+        # either outcome is followed by another attempt
+        while not claim.done():
+            if cancel_event is not None and cancel_event.is_set():
+                return {
+                    "success": False,
+                    "video_id": video_id,
+                    "error": "Download cancelled",
+                }
+            wait([claim], timeout=CANCEL_POLL_SECONDS)
+
+    try:
+        result = download_single_video(
+            video_id,
+            claim.staging_dir,
+            max_duration,
+            extract_audio=False,
+            cancel_event=cancel_event,
+            audio_format=audio_format,
+            bandwidth_job=bandwidth_job,
+            progress_hook=progress_hook,
+        )
+        if result["success"]:
+            result["raw_path"] = find_downloaded_file(claim.staging_dir, "")
+    except Exception as e:
+        logging.error(f"Error downloading video {video_id}: {e}")
+        result = {"success": False, "video_id": video_id, "error": str(e)}
+
+    if not result["success"]:
+        claim.fail(VideoDownloadError(result))
+        return result
+    result["reservation"] = claim
+    return result
+
+
+def transcode_playlist_video(
+    result: dict,
+    cancel_event: Optional[Event] = None,
+    audio_format: str = "mp3",
+    bitrate: str = DEFAULT_MP3_BITRATE,
+) -> dict:
+    """
+    Transcode stage of a playlist video; runs on the transcode pool.
+
+    Converts the raw audio from download_playlist_video to audio_format and
+    stores it. Passthrough formats are only remuxed. Setting cancel_event
+    kills ffmpeg.
+
+    Returns:
+        The finished result, holding the referenced media entry under "media"
+        on success
+    """
+    claim = result.pop("reservation")
+    raw_path = result.pop("raw_path")
+    try:
+        path = convert_audio(raw_path, audio_format, bitrate, cancel_event)
+        entry = claim.commit(path, {"title": result["title"]})
+    except Exception as e:
+        logging.error(f"Error transcoding video {result['video_id']}: {e}")
+        claim.fail(e)
+        return {
+            "success": False,
+            "video_id": result["video_id"],
+            "title": result["title"],
+            "error": str(e),
+        }
+    return {**result, "media": entry}
+
+
+def discard_playlist_result(future: Future):
+    """Give back whatever an abandoned playlist download left behind."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    result = future.result()
+    if "reservation" in result:
+        result["reservation"].fail(RuntimeError("Playlist job aborted"))
+    elif "media" in result:
+        media_store.release(result["media"])
+
+
+def abandon_playlist_downloads(pending: set):
+    """
+    Stop the outstanding work of a playlist job.
+
+    Queued downloads and transcodes are dropped. Running ones are expected to
+    stop on their own through the job's cancel event; whatever they produce
+    is discarded once they do.
+    """
+    for future in pending:
+        future.cancel()
+        future.add_done_callback(discard_playlist_result)
+
+
 @router.post("/info")
 @limiter.limit("30/minute")
 async def get_info(request: Request, url_model: URLModel):
-    ydl_opts = {"noplaylist": True}
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url_model.url, download=False)
-            return {"title": info.get("title"), "thumbnail": info.get("thumbnail")}
+        info = await run_blocking(info_pool, extract_video_info, url_model.url)
+        return {"title": info.get("title"), "thumbnail": info.get("thumbnail")}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error fetching video info: {e}")
 
 
-@router.post("/download/{file_format}")
-@limiter.limit("5/minute")
-async def download_file(
-    request: Request,
-    file_format: str, url_model: URLModel, background_tasks: BackgroundTasks
-):
-    # Check disk space before accepting new download
-    if not check_disk_space_available():
-        raise HTTPException(
-            status_code=507,
-            detail="Service storage limit reached. Please try again later."
-        )
-    
-    if file_format not in ["mp3", "mp4"]:
-        raise HTTPException(status_code=400, detail="Invalid format specified.")
+def download_media(
+    url: str,
+    file_format: str,
+    temp_dir: str = "temp_downloads",
+    extract_audio: bool = True,
+    bitrate: str = DEFAULT_MP3_BITRATE,
+) -> tuple[str, str]:
+    """
+    Download a single video as mp4 or in one of the audio formats.
+
+    Args:
+        url: The video URL
+        file_format: "mp4" or one of AUDIO_FORMATS
+        temp_dir: Directory to save the downloaded file
+        extract_audio: For audio, convert with ffmpeg in this thread. When
+            False, the raw audio is returned for the transcode pool.
+        bitrate: MP3 bitrate in kbps
 
-    temp_dir = "temp_downloads"
+    Returns:
+        tuple: (path of the downloaded file, video title)
+    """
     os.makedirs(temp_dir, exist_ok=True)
 
     unique_id = uuid.uuid4()
@@ -222,21 +754,23 @@ async def download_file(
     ydl_opts = {
         "noplaylist": True,
         "outtmpl": os.path.join(temp_dir, f"{unique_id}.%(ext)s"),
+        "progress_hooks": [
+            adaptive_concurrency.progress_hook,
+            bandwidth_governor.progress_hook(),
+        ],
     }
 
-    if file_format == "mp3":
-        ydl_opts.update(
-            {
-                "format": "bestaudio/best",
-                "postprocessors": [
-                    {
-                        "key": "FFmpegExtractAudio",
-                        "preferredcodec": "mp3",
-                        "preferredquality": "192",
-                    }
-                ],
-            }
-        )
+    if file_format in AUDIO_FORMATS:
+        ydl_opts["format"] = AUDIO_SOURCE_FORMATS[file_format]
+        if extract_audio:
+            # For passthrough formats yt-dlp copies a matching stream as-is
+            ydl_opts["postprocessors"] = [
+                {
+                    "key": "FFmpegExtractAudio",
+                    "preferredcodec": file_format,
+                    "preferredquality": bitrate,
+                }
+            ]
     elif file_format == "mp4":
         ydl_opts.update(
             {
@@ -246,12 +780,14 @@ async def download_file(
 
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(url_model.url, download=True)
+            info_dict = ydl.extract_info(url, download=True)
             title = info_dict.get("title", "video")
 
             original_ext = info_dict.get("ext")
-            if file_format == "mp3":
-                downloaded_file_path = os.path.join(temp_dir, f"{unique_id}.mp3")
+            if file_format in AUDIO_FORMATS and extract_audio:
+                downloaded_file_path = os.path.join(
+                    temp_dir, f"{unique_id}.{file_format}"
+                )
             else:
                 downloaded_file_path = os.path.join(
                     temp_dir, f"{unique_id}.{original_ext}"
@@ -270,143 +806,681 @@ async def download_file(
                     )
 
     except Exception as e:
+        adaptive_concurrency.record_error(str(e))
         raise HTTPException(status_code=500, detail=f"Failed to download: {e}")
 
-    # Sanitize the title to remove characters that are illegal in filenames
-    sanitized_title = sanitize_filename(title)
-    file_name_for_client = f"{sanitized_title}.{file_format}"
-    media_type = "audio/mpeg" if file_format == "mp3" else "video/mp4"
+    return downloaded_file_path, title
 
-    # Schedule file deletion after serving to user
-    background_tasks.add_task(remove_file, downloaded_file_path)
 
-    return FileResponse(
-        path=downloaded_file_path, media_type=media_type, filename=file_name_for_client
-    )
+async def run_scheduled(
+    client_id: str,
+    fn,
+    *args,
+    on_abandon: Optional[Callable[[Future], None]] = None,
+    **kwargs,
+):
+    """
+    Run a download on the shared scheduler and wait for it with a timeout.
 
+    Args:
+        on_abandon: Called with the task's future once it finishes, if the
+            caller stopped waiting for it (timeout or disconnect)
+    """
+    # If the request goes away while still queued, cancelling drops the task
+    future = download_scheduler.submit(client_id, fn, *args, **kwargs)
+    try:
+        return await asyncio.wait_for(
+            asyncio.wrap_future(future), timeout=DOWNLOAD_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        if on_abandon is not None:
+            future.add_done_callback(on_abandon)
+        raise HTTPException(status_code=504, detail="Download timed out.")
+    except asyncio.CancelledError:
+        if on_abandon is not None:
+            future.add_done_callback(on_abandon)
+        raise
 
-@router.post("/playlist-info")
-@limiter.limit("20/minute")
-async def get_playlist_info(request: Request, url_model: URLModel):
-    logging.info(f"Fetching playlist info for URL: {url_model.url}")
 
-    ydl_opts = {
-        "extract_flat": True,
-        "playlistend": 500,
-    }
+def download_claimed_media(key: MediaKey, url: str):
+    """
+    Reserve key in the media store and download it; runs on a scheduler worker.
+
+    Reserving only once a worker runs the task means the holder of every
+    reservation already has a worker (or is converting on the transcode
+    pool). Tasks waiting for its key can therefore never take the last
+    worker away from it.
 
+    Returns:
+        MediaEntry: The file was stored meanwhile; a reference was taken
+        Future: Another caller is producing it; nothing was downloaded
+        tuple: The reservation with the downloaded file's path and title,
+            to be converted and committed by the caller
+    """
+    claim = media_store.reserve(key)
+    if isinstance(claim, (MediaEntry, Future)):
+        return claim
+    _, file_format, _ = key
     try:
-        # First attempt: Treat as a playlist
-        logging.info(f"Attempting to extract playlist info with options: {ydl_opts}")
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url_model.url, download=False)
+        path, title = download_media(
+            url,
+            file_format,
+            claim.staging_dir,
+            extract_audio=file_format not in AUDIO_FORMATS,
+        )
+    except BaseException as e:
+        claim.fail(e)
+        raise
+    return claim, path, title
 
-        # If the extractor is a 'youtube:tab', it means it's a playlist page
-        # that might need a second pass to get the actual video entries.
-        if info.get("extractor_key") == "YoutubeTab" and "url" in info:
-            logging.info(
-                f"youtube:tab detected. Re-extracting with playlist URL: {info['url']}"
-            )
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(info["url"], download=False)
 
-        if "entries" in info and info["entries"]:
-            logging.info("Successfully extracted playlist with entries.")
-            videos = [
-                {"id": entry["id"], "title": entry["title"]}
-                for entry in info.get("entries", [])
-                if entry
-            ]
-            response_data = {"title": info.get("title"), "videos": videos}
-            logging.info(f"Responding with playlist data: {json.dumps(response_data)}")
-            return response_data
+def discard_claimed_media(future: Future):
+    """Give back what an abandoned download_claimed_media produced."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    outcome = future.result()
+    if isinstance(outcome, MediaEntry):
+        media_store.release(outcome)
+    elif isinstance(outcome, tuple):
+        outcome[0].fail(RuntimeError("Download abandoned"))
 
-        # Fallback: Treat as a single video
-        logging.warning("No entries found, falling back to single video extraction.")
-        ydl_opts_single = {"noplaylist": True}
-        with yt_dlp.YoutubeDL(ydl_opts_single) as ydl_single:
-            single_video_info = ydl_single.extract_info(url_model.url, download=False)
-            response_data = {
-                "title": single_video_info.get("title"),
-                "videos": [
-                    {"id": single_video_info["id"], "title": single_video_info["title"]}
-                ],
-            }
-            logging.info(
-                f"Responding with single video data: {json.dumps(response_data)}"
-            )
-            return response_data
 
-    except Exception as e:
-        logging.error(f"Exception occurred while fetching info: {e}", exc_info=True)
-        # Final fallback for any exception: try to extract as a single video
+async def acquire_media(client_id: str, key: MediaKey, url: str) -> MediaEntry:
+    """
+    Take a reference to the stored file for key, downloading it on a miss.
+
+    A download already in progress for the same key is awaited without
+    taking a scheduler slot. Audio is downloaded raw and converted (or, for
+    passthrough formats, remuxed) on the transcode pool, which frees the
+    download worker meanwhile.
+    """
+    entry = media_store.acquire_cached(key)
+    if entry is not None:
+        return entry
+    while True:
+        outcome = await run_scheduled(
+            client_id,
+            download_claimed_media,
+            key,
+            url,
+            on_abandon=discard_claimed_media,
+        )
+        if isinstance(outcome, MediaEntry):
+            return outcome
+        if not isinstance(outcome, Future):
+            break
         try:
-            logging.warning(
-                "Exception occurred, attempting final fallback"
-                " to single video extraction."
+            # Shield the shared future so a disconnecting waiter cannot cancel it
+            await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(outcome)),
+                timeout=DOWNLOAD_TIMEOUT_SECONDS,
             )
-            ydl_opts_single = {"noplaylist": True}
-            with yt_dlp.YoutubeDL(ydl_opts_single) as ydl_single:
-                single_video_info = ydl_single.extract_info(
-                    url_model.url, download=False
-                )
-                response_data = {
-                    "title": single_video_info.get("title"),
-                    "videos": [
-                        {
-                            "id": single_video_info["id"],
-                            "title": single_video_info["title"],
-                        }
-                    ],
-                }
-                logging.info(
-                    f"Responding with single video data after exception:"
-                    f" {json.dumps(response_data)}"
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Download timed out.")
+        except Exception:
+            # The other download failed; failures are not cached, so retry
+            pass
+
+    claim, path, title = outcome
+    _, file_format, quality = key
+    try:
+        if file_format in AUDIO_FORMATS:
+            bitrate = quality if file_format == "mp3" else DEFAULT_MP3_BITRATE
+            try:
+                path = await asyncio.wrap_future(
+                    transcode_pool.submit(convert_audio, path, file_format, bitrate)
                 )
-                return response_data
-        except Exception as final_e:
-            logging.error(
-                f"Final fallback to single video extraction failed: {final_e}",
-                exc_info=True,
-            )
-            raise HTTPException(
-                status_code=400, detail=f"Error fetching info: {final_e}"
-            )
+            except TranscodeError as e:
+                raise HTTPException(status_code=500, detail=f"Failed to convert: {e}")
+        return claim.commit(path, {"title": title})
+    except BaseException as e:
+        claim.fail(e)
+        raise
 
 
-def do_playlist_download(url: str, video_ids: list[str], job_id: str):
-    logging.info(f"Starting playlist download for job_id: {job_id}")
-    progress_file = os.path.join("temp_downloads", f"{job_id}_progress.json")
-    progress_lock = Lock()  # Lock for thread-safe progress file writes
+@router.post("/download/{file_format}")
+@limiter.limit("5/minute")
+async def download_file(
+    request: Request,
+    file_format: str,
+    url_model: URLModel,
+    bitrate: str = Query(DEFAULT_MP3_BITRATE),
+):
+    """
+    Download a single video and send it.
 
-    if len(video_ids) > 50:
-        logging.error(
-            f"Job {job_id}: Attempted to download "
-            f"{len(video_ids)} videos, but the limit is 50."
-        )
-        with open(progress_file, "w") as f:
-            json.dump(
-                {
-                    "status": "error",
-                    "message": "Cannot download more than 50 videos at a time.",
-                },
-                f,
+    "mp3" is re-encoded at the requested bitrate. "m4a" and "opus" copy the
+    source audio stream without re-encoding, at a fraction of the CPU cost.
+
+    The result stays available as an artifact for its lease, so a dropped
+    transfer can be resumed with a Range request to the URL in the
+    Content-Location header instead of downloading the video again.
+    """
+    if file_format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid format specified.")
+    if bitrate not in MP3_BITRATES:
+        raise HTTPException(status_code=400, detail="Invalid bitrate specified.")
+
+    # Reserve the expected size before downloading. The metadata is known
+    # if the client fetched /info first.
+    client_id = get_client_ip(request)
+    info = metadata_cache.get(video_cache_key(url_model.url))
+    reservation = admit(client_id, estimate_media_bytes(info, file_format, bitrate))
+
+    # Downloads share the process-wide scheduler with playlist jobs
+    video_id = parse_video_id(url_model.url)
+    try:
+        if video_id is None:
+            # Not addressable by video ID: downloaded uncached, deleted on expiry
+            downloaded_file_path, title = await run_scheduled(
+                client_id, download_media, url_model.url, file_format, bitrate=bitrate
             )
-        return
+            on_delete = None
+        else:
+            # Served from the media store; the reference is dropped on expiry
+            key = media_key(video_id, file_format, bitrate)
+            entry = await acquire_media(client_id, key, url_model.url)
+            downloaded_file_path = entry.path
+            title = entry.metadata.get("title", "video")
+            on_delete = partial(media_store.release, entry)
+    except BaseException:
+        reservation.release()
+        raise
+    # The client is charged for the file until the artifact expires
+    reservation.settle(os.path.getsize(downloaded_file_path))
 
-    temp_dir = f"temp_downloads/{job_id}"
-    os.makedirs(temp_dir, exist_ok=True)
+    # Sanitize the title to remove characters that are illegal in filenames
+    sanitized_title = sanitize_filename(title)
+    file_name_for_client = f"{sanitized_title}.{file_format}"
+    media_type = MEDIA_TYPES[file_format]
+
+    artifact = artifact_store.publish(
+        downloaded_file_path,
+        file_name_for_client,
+        media_type,
+        on_delete=release_with(reservation, on_delete),
+        owns_file=video_id is None,
+    )
+    return artifact_response(artifact)
+
+
+def artifact_response(artifact) -> ArtifactResponse:
+    """Serve an artifact, pointing the client at its re-downloadable URL."""
+    return ArtifactResponse(
+        artifact,
+        artifact_store,
+        headers={
+            "Content-Location": f"/api/youtube/artifacts/{artifact.artifact_id}",
+            "X-Artifact-Id": artifact.artifact_id,
+        },
+    )
 
-    total_videos = len(video_ids)
-    thread_count = calculate_thread_count(total_videos)
+
+def resolve_pipe_sources(info: dict, selector: str) -> list[dict]:
+    """
+    Select the formats to pipe from a video's extracted metadata.
+
+    Returns:
+        One source, or a video and an audio source to be merged, each with
+        its "url" and "http_headers"
+    """
+    with yt_dlp.YoutubeDL({"format": selector, "quiet": True}) as ydl:
+        # The cached dict is shared, and processing it mutates it
+        selected = ydl.process_ie_result(copy.deepcopy(info), download=False)
+    formats = selected.get("requested_formats") or [selected]
+    return [
+        {"url": f["url"], "http_headers": f.get("http_headers") or {}}
+        for f in formats
+    ]
+
+
+@router.post("/download/{file_format}/stream")
+@limiter.limit("5/minute")
+async def stream_download(
+    request: Request,
+    file_format: str,
+    url_model: URLModel,
+    bitrate: str = Query(DEFAULT_MP3_BITRATE),
+):
+    """
+    Download a single video and pipe it to the client while it is fetched.
+
+    ffmpeg reads the selected formats from YouTube and its output goes
+    straight into the response, so the first bytes arrive within seconds and
+    nothing is stored on disk. The response has no length and cannot be
+    resumed; use /download/{file_format} for that.
+    """
+    if file_format not in PIPE_SOURCE_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid format specified.")
+    if bitrate not in MP3_BITRATES:
+        raise HTTPException(status_code=400, detail="Invalid bitrate specified.")
+
+    try:
+        info = await run_blocking(info_pool, extract_video_info, url_model.url)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error fetching video info: {e}")
+
+    duration = info.get("duration") or 0
+    title = info.get("title", "video")
+    if duration > MAX_VIDEO_DURATION:
+        raise HTTPException(
+            status_code=400,
+            detail=duration_error(
+                info.get("id", ""), title, duration, MAX_VIDEO_DURATION
+            )["error"],
+        )
+
+    try:
+        sources = await run_blocking(
+            info_pool, resolve_pipe_sources, info, PIPE_SOURCE_FORMATS[file_format]
+        )
+    except yt_dlp.utils.DownloadError as e:
+        raise HTTPException(
+            status_code=400, detail=f"Format not available for streaming: {e}"
+        )
+
+    # Piped bytes count against the shared bandwidth budget, like downloads
+    throttle = partial(bandwidth_governor.consume, job_id=f"pipe-{uuid.uuid4()}")
+    try:
+        pipe = await open_media_pipe(
+            pipe_command(sources, file_format, bitrate), throttle
+        )
+    except MediaPipeBusyError:
+        raise HTTPException(
+            status_code=503, detail="Server is busy. Please try again shortly."
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Stream did not start in time.")
+    except TranscodeError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to stream: {e}")
+
+    filename = f"{sanitize_filename(title)}.{file_format}"
+    return StreamingResponse(
+        pipe.chunks(),
+        media_type=MEDIA_TYPES[file_format],
+        headers={
+            "Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.get("/artifacts/{artifact_id}")
+@limiter.limit("60/minute")
+async def download_artifact(request: Request, artifact_id: str):
+    """
+    Download a finished result again, in full or as a Range, until it expires.
+    """
+    try:
+        # Validate artifact_id as a UUID
+        uuid.UUID(artifact_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid artifact ID format.")
+
+    artifact = artifact_store.get(artifact_id)
+    if artifact is None or not os.path.exists(artifact.path):
+        raise HTTPException(status_code=404, detail="Download not found or expired.")
+    return artifact_response(artifact)
+
+
+def fetch_playlist_listing(url: str) -> dict:
+    """
+    List the videos of a playlist, falling back to a single video.
+
+    Returns:
+        dict with keys: title (str), videos (list of {id, title})
+    """
+    logging.info(f"Fetching playlist info for URL: {url}")
+
+    try:
+        # First attempt: Treat as a playlist
+        info = extract_playlist_info(url)
+
+        if "entries" in info and info["entries"]:
+            logging.info("Successfully extracted playlist with entries.")
+            videos = [
+                {"id": entry["id"], "title": entry["title"]}
+                for entry in info.get("entries", [])
+                if entry
+            ]
+            response_data = {"title": info.get("title"), "videos": videos}
+            logging.info(f"Responding with {len(videos)} playlist entries")
+            logging.debug(f"Playlist data: {response_data}")
+            return response_data
+
+        # Fallback: Treat as a single video
+        logging.warning("No entries found, falling back to single video extraction.")
+        single_video_info = extract_video_info(url)
+        response_data = {
+            "title": single_video_info.get("title"),
+            "videos": [
+                {"id": single_video_info["id"], "title": single_video_info["title"]}
+            ],
+        }
+        logging.info("Responding with single video data")
+        logging.debug(f"Single video data: {response_data}")
+        return response_data
+
+    except Exception as e:
+        logging.error(f"Exception occurred while fetching info: {e}", exc_info=True)
+        # Final fallback for any exception: try to extract as a single video
+        try:
+            logging.warning(
+                "Exception occurred, attempting final fallback"
+                " to single video extraction."
+            )
+            single_video_info = extract_video_info(url)
+            response_data = {
+                "title": single_video_info.get("title"),
+                "videos": [
+                    {
+                        "id": single_video_info["id"],
+                        "title": single_video_info["title"],
+                    }
+                ],
+            }
+            logging.info("Responding with single video data after exception")
+            return response_data
+        except Exception as final_e:
+            logging.error(
+                f"Final fallback to single video extraction failed: {final_e}",
+                exc_info=True,
+            )
+            raise HTTPException(
+                status_code=400, detail=f"Error fetching info: {final_e}"
+            )
+
+
+@router.post("/playlist-info")
+@limiter.limit("20/minute")
+async def get_playlist_info(request: Request, url_model: URLModel):
+    return await run_blocking(playlist_info_pool, fetch_playlist_listing, url_model.url)
+
+
+def listing_records(
+    title: Optional[str], entries: Iterable, offset: int, limit: int
+) -> Iterator[dict]:
+    """
+    Turn playlist entries into the records of the streamed listing.
+
+    Yields a "playlist" header, one "video" per entry and an "end" record
+    whose next_offset is set if more entries follow. entries must start at
+    offset and may yield one entry past the page to detect that.
+    """
+    yield {"type": "playlist", "title": title, "offset": offset, "limit": limit}
+    count = 0
+    next_offset = None
+    for index, entry in enumerate(entries, start=offset):
+        if index - offset == limit:
+            next_offset = index
+            break
+        if not entry or not entry.get("id"):
+            continue
+        count += 1
+        yield {
+            "type": "video",
+            "index": index,
+            "id": entry["id"],
+            "title": entry.get("title"),
+            "duration": entry.get("duration"),
+        }
+    yield {"type": "end", "count": count, "next_offset": next_offset}
+
+
+def slice_playlist_entries(entries, start: int, stop: int) -> Iterator[dict]:
+    """Yield entries[start:stop] from a list, lazy generator or paged list."""
+    if isinstance(entries, yt_dlp.utils.PagedList):
+        yield from entries.getslice(start, stop)
+    else:
+        yield from itertools.islice(entries or [], start, stop)
+
+
+def iter_playlist_listing(url: str, offset: int, limit: int) -> Iterator[dict]:
+    """
+    List a page of a playlist while yt-dlp pages through it.
+
+    Entries are yielded as soon as yt-dlp fetches the page of the playlist
+    they are on, instead of after the whole playlist has been extracted.
+    A URL of a single video is listed as a playlist of one. A complete
+    listing is stored in the metadata cache for the download that follows.
+    """
+    with yt_dlp.YoutubeDL({"extract_flat": True}) as ydl:
+        info = ydl.extract_info(url, download=False, process=False)
+        # Channel pages and watch?v=...&list=... URLs redirect to the playlist
+        for _ in range(3):
+            if info.get("_type") not in ("url", "url_transparent"):
+                break
+            info = ydl.extract_info(info["url"], download=False, process=False)
+
+        if info.get("_type") not in ("playlist", "multi_video"):
+            entries = [info] if info.get("id") else []
+            yield from listing_records(
+                info.get("title"), entries[offset:], offset, limit
+            )
+            return
+
+        # Only a listing that starts at the top and has no next page is complete
+        listed = []
+        for record in listing_records(
+            info.get("title"),
+            slice_playlist_entries(info.get("entries"), offset, offset + limit + 1),
+            offset,
+            limit,
+        ):
+            if record["type"] == "video":
+                listed.append({k: record[k] for k in ("id", "title", "duration")})
+            elif record["type"] == "end" and not offset and not record["next_offset"]:
+                metadata_cache.put(
+                    playlist_cache_key(url),
+                    {"title": info.get("title"), "entries": listed},
+                )
+            yield record
+
+
+def cached_playlist_listing(url: str, offset: int, limit: int) -> Optional[Iterator]:
+    """Return the listing records from the metadata cache, if it has the page."""
+    info = metadata_cache.get(playlist_cache_key(url))
+    if info is None:
+        return None
+    entries = info.get("entries") or []
+    # The cached listing may be cut off at PLAYLIST_LISTING_MAX entries
+    if offset + limit >= len(entries) and len(entries) >= PLAYLIST_LISTING_MAX:
+        return None
+    return listing_records(
+        info.get("title"), entries[offset : offset + limit + 1], offset, limit
+    )
+
+
+@router.post("/playlist-info/stream")
+@limiter.limit("20/minute")
+async def stream_playlist_info(
+    request: Request,
+    url_model: URLModel,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(PLAYLIST_PAGE_DEFAULT, ge=1, le=PLAYLIST_LISTING_MAX),
+):
+    """
+    Stream a page of a playlist listing as NDJSON while it is being extracted.
+
+    Each line is one JSON record: a "playlist" header with the title, one
+    "video" record (index, id, title, duration) per entry, then an "end"
+    record whose next_offset is the offset of the next page, or null. Errors
+    after the stream started are sent as an "error" record.
+    """
+
+    async def records():
+        cached = cached_playlist_listing(url_model.url, offset, limit)
+        if cached is not None:
+            for record in cached:
+                yield record
+            return
+        async for record in playlist_info_pool.stream(
+            iter_playlist_listing, url_model.url, offset, limit
+        ):
+            yield record
+
+    async def ndjson():
+        try:
+            async for record in records():
+                yield json.dumps(record) + "\n"
+        except WorkPoolBusyError:
+            yield json.dumps(
+                {"type": "error", "detail": "Server is busy. Please try again shortly."}
+            ) + "\n"
+        except Exception as e:
+            logging.error(f"Error streaming playlist info: {e}", exc_info=True)
+            yield json.dumps(
+                {"type": "error", "detail": f"Error fetching info: {e}"}
+            ) + "\n"
+
+    return StreamingResponse(
+        ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/concurrency")
+@limiter.limit("30/minute")
+async def get_download_concurrency(request: Request):
+    """
+    Report the adaptive download concurrency and its recent decisions.
+
+    Meant for tuning the controller's constants from real traffic.
+    """
+    return {
+        "controller": adaptive_concurrency.stats(),
+        "scheduler": download_scheduler.stats(),
+        "transcoder": transcode_pool.stats(),
+        "decisions": adaptive_concurrency.decisions(),
+    }
+
+
+@router.get("/bandwidth")
+@limiter.limit("30/minute")
+async def get_bandwidth(request: Request):
+    """Report the ingress bandwidth limits and current utilization."""
+    return bandwidth_governor.stats()
+
+
+@router.get("/throughput")
+@limiter.limit("30/minute")
+async def get_throughput(request: Request):
+    """Report hourly download volume and peak rates for capacity planning."""
+    return {"hours": throughput_log.stats()}
+
+
+@router.put("/bandwidth")
+@limiter.limit("10/minute")
+async def set_bandwidth(request: Request, config: BandwidthConfigModel):
+    """
+    Change the ingress bandwidth limits at runtime.
+
+    Requires the X-Admin-Token header to match the ADMIN_TOKEN setting.
+    """
+    require_admin_token(request)
+    bandwidth_governor.configure(limit=config.limit, job_share=config.job_share)
+    return bandwidth_governor.stats()
+
+
+def job_queue_position(futures) -> Optional[int]:
+    """
+    Return how many downloads are queued ahead of a job's next video.
+
+    0 while any of the job's videos is downloading; None once nothing is left.
+    """
+    positions = []
+    for future in futures:
+        if future.running():
+            return 0
+        position = download_scheduler.queue_position(future)
+        if position is not None:
+            positions.append(position)
+    return min(positions) if positions else None
+
+
+def do_playlist_download(
+    url: str,
+    video_ids: list[str],
+    job_id: str,
+    client_id: str = "anonymous",
+    audio_format: str = "mp3",
+    bitrate: str = DEFAULT_MP3_BITRATE,
+    resumed: bool = False,
+    reservation: Optional[DiskReservation] = None,
+):
+    """
+    Run a playlist job, checkpointing every finished video.
+
+    Every video is stored as audio_format; MP3s are encoded at bitrate.
+
+    The job's storage reservation is settled to the size of the ZIP and
+    released with it; a job that does not produce a ZIP releases it at once.
+
+    With resumed set, the job continues from its last checkpoint: videos that
+    failed before are reported as failed again, and videos that finished are
+    taken from the media store instead of being downloaded again.
+    """
     logging.info(
-        f"Total videos to download: {total_videos} using {thread_count} threads for job_id: {job_id}"
+        f"{'Resuming' if resumed else 'Starting'} playlist download "
+        f"for job_id: {job_id}"
     )
 
+    if len(video_ids) > 50:
+        logging.error(
+            f"Job {job_id}: Attempted to download "
+            f"{len(video_ids)} videos, but the limit is 50."
+        )
+        job_registry.set(
+            job_id,
+            {
+                "status": "error",
+                "message": "Cannot download more than 50 videos at a time.",
+            },
+        )
+        if reservation is not None:
+            reservation.release()
+        return
+
+    total_videos = len(video_ids)
+    cancel_event = job_registry.cancel_event(job_id)
+
+    # Outcome of every finished video by ID, saved after each one so that the
+    # job can continue from here after a restart
+    checkpoint = job_registry.get_checkpoint(job_id) if resumed else None
+    finished = dict(checkpoint["finished"]) if checkpoint else {}
+
+    def save_checkpoint():
+        job_registry.save_checkpoint(
+            job_id,
+            {
+                "url": url,
+                "video_ids": video_ids,
+                "client_id": client_id,
+                "audio_format": audio_format,
+                "bitrate": bitrate,
+                "finished": finished,
+            },
+        )
+
+    save_checkpoint()
+
+    zip_writer = None
+    pending = set()
+    # Byte progress of the downloads, published at a fixed rate
+    transfer = TransferProgress(video_ids)
+    # Track download results
+    completed = 0
+    failed_videos = []
+    successful_videos = []
     try:
-        playlist_info_opts = {"extract_flat": True, "noplaylist": False}
-        with yt_dlp.YoutubeDL(playlist_info_opts) as ydl:
-            playlist_info = ydl.extract_info(url, download=False)
+        if cancel_event.is_set():
+            raise PlaylistJobCancelled()
+
+        playlist_info = extract_playlist_info(url)
         playlist_title = playlist_info.get("title", "playlist")
         # Defense in depth: Use both sanitization functions for maximum safety
         # sanitize_filename() handles command injection and path traversal
@@ -417,50 +1491,160 @@ def do_playlist_download(url: str, video_ids: list[str], job_id: str):
             f"Playlist title: '{sanitized_playlist_title}' for job_id: {job_id}"
         )
 
-        # Track download results
-        completed = 0
-        failed_videos = []
-        successful_videos = []
-
-        # Use ThreadPoolExecutor for concurrent downloads
-        with ThreadPoolExecutor(max_workers=thread_count) as executor:
-            # Submit all download tasks
-            future_to_video = {
-                executor.submit(download_single_video, video_id, temp_dir): video_id
-                for video_id in video_ids
-            }
+        # The ZIP is built incrementally: each video is appended from the media
+        # store as soon as it finishes, so there is no separate zipping phase
+        # and the archive can be streamed while the job is running.
+        zip_filename = f"{sanitized_playlist_title}_{job_id}.zip"
+        os.makedirs("temp_downloads", exist_ok=True)
+        zip_path = os.path.join("temp_downloads", zip_filename)
+        zip_writer = StreamingZipWriter(zip_path)
+
+        def record_result(result: dict):
+            nonlocal completed
+            completed += 1
+            transfer.finish(result["video_id"], result["success"])
+
+            if result["success"]:
+                entry = result.pop("media")
+                finished[result["video_id"]] = {
+                    "success": True,
+                    "title": result.get("title", "Unknown"),
+                    "path": entry.path,
+                }
+                add_video_to_zip(zip_writer, entry)
+                successful_videos.append(result)
+                title = result.get("title", result["video_id"])
+                logging.info(
+                    f"Progress: {completed}/{total_videos} - "
+                    f"Successfully downloaded '{title}'"
+                )
+            else:
+                finished[result["video_id"]] = {
+                    "success": False,
+                    "title": result.get("title", "Unknown"),
+                    "error": result.get("error", "Unknown error"),
+                }
+                failed_videos.append(result)
+                error = result.get("error", "Unknown error")
+                logging.warning(
+                    f"Progress: {completed}/{total_videos} - "
+                    f"Failed to download {result['video_id']}: {error}"
+                )
+            save_checkpoint()
 
-            # Process completed downloads
-            for future in as_completed(future_to_video):
-                result = future.result()
-                completed += 1
+            job_registry.notify(
+                job_id,
+                "video",
+                {
+                    "video_id": result["video_id"],
+                    "title": result.get("title", "Unknown"),
+                    "success": result["success"],
+                    "error": result.get("error"),
+                },
+            )
 
-                if result["success"]:
-                    successful_videos.append(result)
-                    logging.info(
-                        f"Progress: {completed}/{total_videos} - "
-                        f"Successfully downloaded '{result.get('title', result['video_id'])}'"
-                    )
-                else:
-                    failed_videos.append(result)
-                    logging.warning(
-                        f"Progress: {completed}/{total_videos} - "
-                        f"Failed to download {result['video_id']}: {result.get('error', 'Unknown error')}"
-                    )
+        def publish_progress(queue_position: Optional[int]):
+            transfer.changed()
+            job_registry.set(
+                job_id,
+                {
+                    "status": "queued" if queue_position else "processing",
+                    "current": completed,
+                    "total": total_videos,
+                    "successful": len(successful_videos),
+                    "failed": len(failed_videos),
+                    "queue_position": queue_position,
+                    "zip_name": zip_filename,
+                    "resumed": resumed,
+                    "transfer": transfer.snapshot(),
+                },
+            )
+
+        # When resuming, videos that failed before stay failed. Videos that
+        # finished were deleted once zipped, but the ZIP is rebuilt; those
+        # still on disk (e.g. kept by another request) are registered with
+        # the media store again, the rest are downloaded again
+        remaining_ids = []
+        for video_id in video_ids:
+            outcome = finished.get(video_id)
+            if outcome is not None and not outcome["success"]:
+                record_result({"video_id": video_id, **outcome})
+                continue
+            if outcome is not None:
+                media_store.adopt(
+                    media_key(video_id, audio_format, bitrate),
+                    outcome["path"],
+                    {"title": outcome["title"]},
+                )
+            remaining_ids.append(video_id)
+
+        # Reject over-limit videos from the listing's durations up front so
+        # they never occupy a download thread
+        accepted_ids, rejected = partition_by_duration(remaining_ids, playlist_info)
+        for result in rejected:
+            record_result(result)
 
-                # Update progress file with thread-safe lock
-                with progress_lock:
-                    with open(progress_file, "w") as f:
-                        json.dump(
-                            {
-                                "status": "processing",
-                                "current": completed,
-                                "total": total_videos,
-                                "successful": len(successful_videos),
-                                "failed": len(failed_videos),
-                            },
-                            f,
+        thread_count = calculate_thread_count(len(accepted_ids))
+        logging.info(
+            f"Total videos to download: {len(accepted_ids)} using up to "
+            f"{thread_count} scheduler workers for job_id: {job_id}"
+        )
+
+        # Queue every video on the shared download scheduler. Videos already
+        # in the media store are not downloaded again. The job may occupy at
+        # most thread_count of the global workers.
+        download_scheduler.set_job_limit(job_id, thread_count)
+        pending = {
+            download_scheduler.submit(
+                client_id,
+                download_playlist_video,
+                video_id,
+                cancel_event=cancel_event,
+                audio_format=audio_format,
+                bitrate=bitrate,
+                bandwidth_job=job_id,
+                progress_hook=transfer.progress_hook(video_id),
+                job_id=job_id,
+            )
+            for video_id in accepted_ids
+        }
+        last_position = job_queue_position(pending)
+        publish_progress(last_position)
+
+        # Process completed downloads, refreshing the queue position and the
+        # byte progress meanwhile
+        while pending:
+            if cancel_event.is_set():
+                raise PlaylistJobCancelled()
+            done, pending = wait(
+                pending,
+                timeout=QUEUE_POSITION_REFRESH_SECONDS,
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                result = future.result()
+                if "reservation" in result:
+                    # Downloaded; convert on the transcode pool while the
+                    # download worker moves on to the next video
+                    pending.add(
+                        transcode_pool.submit(
+                            transcode_playlist_video,
+                            result,
+                            cancel_event,
+                            audio_format,
+                            bitrate,
                         )
+                    )
+                else:
+                    record_result(result)
+            position = job_queue_position(pending)
+            if done or position != last_position:
+                publish_progress(position)
+                last_position = position
+            elif transfer.changed():
+                # Hooks fire per chunk; their totals go out once per interval
+                # and are not persisted
+                job_registry.update(job_id, persist=False, transfer=transfer.snapshot())
 
         # Log summary
         logging.info(
@@ -492,40 +1676,29 @@ def do_playlist_download(url: str, video_ids: list[str], job_id: str):
                 ],
             }
 
-            with open(progress_file, "w") as f:
-                json.dump(final_status, f)
-
-            # Clean up temp directory
-            rmtree(temp_dir)
+            zip_writer.abort()
+            job_registry.set(job_id, final_status)
             return
 
-        # Zip the successfully downloaded files
-        logging.info(f"Zipping files for job_id: {job_id}")
-        with open(progress_file, "w") as f:
-            json.dump(
-                {
-                    "status": "zipping",
-                    "current": total_videos,
-                    "total": total_videos,
-                    "successful": len(successful_videos),
-                    "failed": len(failed_videos),
-                },
-                f,
-            )
-
-        zip_filename = f"{sanitized_playlist_title}_{job_id}.zip"
-        zip_path = os.path.join("temp_downloads", zip_filename)
-        with zipfile.ZipFile(zip_path, "w") as zipf:
-            for root, _, files in os.walk(temp_dir):
-                for file in files:
-                    zipf.write(os.path.join(root, file), arcname=file)
-
-        logging.info(f"Zipping complete for job_id: {job_id}. Zip path: {zip_path}")
+        zip_writer.close()
+        logging.info(f"Zip complete for job_id: {job_id}. Zip path: {zip_path}")
+
+        # The ZIP stays downloadable for its lease; the job goes with it
+        on_delete = partial(job_registry.remove, job_id)
+        if reservation is not None:
+            # The client is charged for the ZIP until it expires
+            reservation.settle(os.path.getsize(zip_path))
+            on_delete = release_with(reservation, on_delete)
+            reservation = None
+        artifact = artifact_store.publish(
+            zip_path, zip_filename, "application/zip", on_delete=on_delete
+        )
 
         # Prepare final status with failed video info
         final_status = {
             "status": "complete",
             "zip_name": zip_filename,
+            "artifact_id": artifact.artifact_id,
             "total": total_videos,
             "successful": len(successful_videos),
             "failed": len(failed_videos),
@@ -542,18 +1715,132 @@ def do_playlist_download(url: str, video_ids: list[str], job_id: str):
                 for v in failed_videos
             ]
 
-        with open(progress_file, "w") as f:
-            json.dump(final_status, f)
-
-        rmtree(temp_dir)
-        logging.info(f"Cleaned up temp directory: {temp_dir}")
+        job_registry.set(job_id, final_status)
 
+    except PlaylistJobCancelled:
+        logging.info(f"Playlist download cancelled for job_id: {job_id}")
+        abandon_playlist_downloads(pending)
+        # The partial archive is deleted right away, not at the next cleanup
+        if zip_writer is not None:
+            zip_writer.abort()
+        job_registry.set(
+            job_id,
+            {
+                "status": "cancelled",
+                "message": "Download cancelled.",
+                "current": completed,
+                "total": total_videos,
+                "successful": len(successful_videos),
+                "failed": len(failed_videos),
+            },
+        )
     except Exception as e:
         logging.error(
             f"Error in do_playlist_download for job_id: {job_id}: {e}", exc_info=True
         )
-        with open(progress_file, "w") as f:
-            json.dump({"status": "error", "message": str(e)}, f)
+        if zip_writer is not None:
+            zip_writer.abort()
+        abandon_playlist_downloads(pending)
+        job_registry.set(job_id, {"status": "error", "message": str(e)})
+    finally:
+        download_scheduler.clear_job(job_id)
+        # Still set unless the ZIP was published
+        if reservation is not None:
+            reservation.release()
+
+
+# Resumed playlist jobs; referenced so they are not garbage collected
+_resumed_jobs: set[asyncio.Task] = set()
+
+
+async def resume_playlist_jobs() -> int:
+    """
+    Continue the playlist jobs that were running when the server stopped.
+
+    Called once on startup. Only a durable job registry outlives the process;
+    without one there is nothing to resume. Jobs that were interrupted before
+    saving a checkpoint cannot be resumed and are reported as failed.
+
+    Like a new job, a resumed job is admitted against the disk quota of the
+    client that started it, and runs in the threadpool that runs the
+    background tasks of /download-playlist, so its videos are queued on the
+    download scheduler under that client. A job that does not fit on disk
+    anymore is reported as failed.
+
+    Returns:
+        Number of jobs resumed
+    """
+    if not job_registry.durable:
+        return 0
+    # No reservation survives a restart, so its staging directory is garbage
+    media_store.clear_staging()
+
+    resumed = 0
+    for job_id in job_registry.interrupted_jobs():
+        checkpoint = job_registry.get_checkpoint(job_id)
+        if checkpoint is None:
+            job_registry.set(
+                job_id,
+                {
+                    "status": "error",
+                    "message": "The download was interrupted by a server restart.",
+                },
+            )
+            continue
+
+        # Videos that failed before are not retried; finished videos may
+        # have to be downloaded again and all of them go into the new ZIP
+        audio_format = checkpoint.get("audio_format", "mp3")
+        bitrate = checkpoint.get("bitrate", DEFAULT_MP3_BITRATE)
+        finished = checkpoint["finished"]
+        outstanding = [
+            video_id
+            for video_id in checkpoint["video_ids"]
+            if finished.get(video_id, {}).get("success", True)
+        ]
+        estimate = estimate_playlist_bytes(
+            metadata_cache.get(playlist_cache_key(checkpoint["url"])),
+            outstanding,
+            audio_format,
+            bitrate,
+        )
+        try:
+            reservation = reserve_disk_space(checkpoint["client_id"], estimate)
+        except DiskSpaceUnavailable as e:
+            logging.warning(f"Cannot resume job {job_id}: {e}")
+            job_registry.set(
+                job_id,
+                {
+                    "status": "error",
+                    "message": (
+                        "The download was interrupted by a server restart "
+                        "and there is not enough storage to resume it."
+                    ),
+                },
+            )
+            continue
+
+        job_registry.update(job_id, status="resumed", resumed=True, queue_position=None)
+        task = asyncio.create_task(
+            run_in_threadpool(
+                do_playlist_download,
+                checkpoint["url"],
+                checkpoint["video_ids"],
+                job_id,
+                checkpoint["client_id"],
+                audio_format,
+                bitrate,
+                resumed=True,
+                reservation=reservation,
+            )
+        )
+        _resumed_jobs.add(task)
+        task.add_done_callback(_resumed_jobs.discard)
+        resumed += 1
+
+    if resumed:
+        logging.info(f"Resumed {resumed} interrupted playlist job(s)")
+    return resumed
 
 
 @router.post("/download-playlist")
@@ -562,28 +1849,54 @@ async def download_playlist(
     request: Request,
     request_body: PlaylistDownloadModel, background_tasks: BackgroundTasks
 ):
-    # Check disk space before accepting new download
-    if not check_disk_space_available():
-        raise HTTPException(
-            status_code=507,
-            detail="Service storage limit reached. Please try again later."
+    # If the listing from /playlist-info is still cached, refuse a job in
+    # which every selected video is over the duration limit
+    cached_playlist = metadata_cache.get(playlist_cache_key(request_body.url))
+    if cached_playlist is not None:
+        accepted_ids, _ = partition_by_duration(
+            request_body.video_ids, cached_playlist
         )
-    
+        if not accepted_ids:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    "All selected videos exceed the "
+                    f"{MAX_VIDEO_DURATION / 3600:g}h duration limit."
+                ),
+            )
+
+    # Reserve storage for the job, using the durations from the cached
+    # listing where available
+    estimate = estimate_playlist_bytes(
+        cached_playlist,
+        request_body.video_ids,
+        request_body.audio_format,
+        request_body.bitrate,
+    )
+    # Quota and fair scheduling are keyed on the address our proxies report
+    client_id = get_client_ip(request)
+    reservation = admit(client_id, estimate)
+
     job_id = str(uuid.uuid4())
     logging.info(f"Creating download job with job_id: {job_id}")
 
     os.makedirs("temp_downloads", exist_ok=True)
 
-    progress_file = os.path.join("temp_downloads", f"{job_id}_progress.json")
-
-    # Create the progress file immediately with an initializing state
-    with open(progress_file, "w") as f:
-        json.dump(
-            {"status": "initializing", "current": 0, "total": len(request_body.video_ids)}, f
-        )
+    # Register the job immediately with an initializing state
+    job_registry.set(
+        job_id,
+        {"status": "initializing", "current": 0, "total": len(request_body.video_ids)},
+    )
 
     background_tasks.add_task(
-        do_playlist_download, request_body.url, request_body.video_ids, job_id
+        do_playlist_download,
+        request_body.url,
+        request_body.video_ids,
+        job_id,
+        client_id,
+        request_body.audio_format,
+        request_body.bitrate,
+        reservation=reservation,
     )
     return JSONResponse({"job_id": job_id})
 
@@ -596,29 +1909,241 @@ async def get_playlist_download_progress(job_id: str):
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid job ID format.")
 
-    base_path = "temp_downloads"
-    progress_file = os.path.normpath(os.path.join(base_path, f"{job_id}_progress.json"))
+    progress = job_registry.get(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    # Polling clients keep the job from being cancelled as abandoned
+    job_registry.touch(job_id)
+    return JSONResponse(progress)
 
-    # Ensure the normalized path is within the base directory
-    if not progress_file.startswith(base_path):
-        raise HTTPException(
-            status_code=403, detail="Access to the specified file is forbidden."
-        )
 
-    if not os.path.exists(progress_file):
+@router.post("/playlist-download/{job_id}/cancel")
+@limiter.limit("30/minute")
+async def cancel_playlist_download(request: Request, job_id: str):
+    """
+    Cancel a playlist job.
+
+    Queued downloads are dropped, running downloads and ffmpeg processes are
+    stopped and the partial ZIP is deleted. The job then reports the
+    "cancelled" status. Cancelling a finished job has no effect.
+    """
+    try:
+        # Validate job_id as a UUID
+        uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid job ID format.")
+
+    state = job_registry.get(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if not job_registry.request_cancel(job_id):
+        return JSONResponse(state)
+    return JSONResponse({"job_id": job_id, "status": "cancelling"})
+
+
+# Pending abandonment checks; referenced so they are not garbage collected
+_abandonment_checks: set[asyncio.Task] = set()
+
+
+async def cancel_if_abandoned(job_id: str, since: float):
+    """Cancel a job nobody follows anymore, after a grace period to reconnect."""
+    await asyncio.sleep(ABANDONED_JOB_GRACE_SECONDS)
+    if not job_registry.is_watched_since(job_id, since) and job_registry.request_cancel(
+        job_id
+    ):
+        logging.info(f"Cancelled job {job_id}: its progress stream disconnected")
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Format a single Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/playlist-download-progress/{job_id}/events")
+async def stream_playlist_download_progress(job_id: str):
+    """
+    Push playlist job progress as Server-Sent Events.
+
+    Emits a "progress" event with the full job state on every status change
+    and a "video" event for every finished video. The stream ends once the
+    job is complete, failed or cancelled. Clients that cannot use SSE should
+    keep polling /playlist-download-progress/{job_id}.
+
+    If the client disconnects before the job finished and nobody follows
+    the job within ABANDONED_JOB_GRACE_SECONDS, the job is cancelled.
+    """
+    try:
+        # Validate job_id as a UUID
+        uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid job ID format.")
+
+    if job_registry.get(job_id) is None:
         raise HTTPException(status_code=404, detail="Job not found.")
-    with open(progress_file, "r") as f:
-        progress = json.load(f)
-    return JSONResponse(progress)
+
+    async def event_stream():
+        queue = job_registry.subscribe(job_id)
+        finished = False
+        try:
+            # Send the current state first so late subscribers are in sync
+            state = job_registry.get(job_id)
+            if state is None or state.get("status") in TERMINAL_STATUSES:
+                finished = True
+            if state is None:
+                return
+            yield format_sse("progress", state)
+            if finished:
+                return
+
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(
+                        queue.get(), timeout=PROGRESS_STREAM_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event == "progress" and data.get("status") in TERMINAL_STATUSES:
+                    finished = True
+                yield format_sse(event, data)
+                if finished:
+                    return
+        finally:
+            job_registry.unsubscribe(job_id, queue)
+            if not finished:
+                task = asyncio.get_running_loop().create_task(
+                    cancel_if_abandoned(job_id, time.time())
+                )
+                _abandonment_checks.add(task)
+                task.add_done_callback(_abandonment_checks.discard)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def open_playlist_zip(zip_path: str) -> BinaryIO:
+    """Open a playlist ZIP, whether it is still being built or finished."""
+    try:
+        return open(partial_path(zip_path), "rb")
+    except FileNotFoundError:
+        # Closed and moved into place meanwhile
+        return open(zip_path, "rb")
+
+
+def release_streamed_zip(job_id: str, zip_path: str):
+    """Count a fully streamed ZIP as delivered, like a complete /download-zip."""
+    artifact = artifact_store.find_by_path(zip_path)
+    if artifact is None:
+        remove_file(zip_path)
+        job_registry.remove(job_id)
+        return
+    artifact_store.record_sent(artifact.artifact_id, 0, artifact.size)
+
+
+async def wait_for_job_change(job_id: str, queue: asyncio.Queue, timeout: float):
+    """Wait until the job publishes anything, or the timeout elapses."""
+    try:
+        await asyncio.wait_for(queue.get(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+@router.get("/download-zip-stream/{job_id}")
+@limiter.limit("10/minute")
+async def stream_playlist_zip(request: Request, job_id: str):
+    """
+    Stream a playlist ZIP while the job is still downloading.
+
+    Entries are appended to the archive as each video finishes, so the client
+    receives the first file long before the slowest video is done. If the job
+    fails midway the connection is aborted rather than ending cleanly, so the
+    client never mistakes a truncated archive for a complete one.
+    """
+    try:
+        # Validate job_id as a UUID
+        uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid job ID format.")
+
+    # The archive name is only known once the playlist title is resolved
+    queue = job_registry.subscribe(job_id)
+    try:
+        state = job_registry.get(job_id)
+        while (
+            state is not None
+            and "zip_name" not in state
+            and state.get("status") not in TERMINAL_STATUSES
+        ):
+            await wait_for_job_change(job_id, queue, PROGRESS_STREAM_KEEPALIVE)
+            state = job_registry.get(job_id)
+    finally:
+        job_registry.unsubscribe(job_id, queue)
+
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    zip_name = state.get("zip_name")
+    zip_path = os.path.join("temp_downloads", zip_name) if zip_name else None
+    if (
+        state.get("status") in ("error", "cancelled")
+        or not zip_path
+        or not (os.path.exists(zip_path) or os.path.exists(partial_path(zip_path)))
+    ):
+        raise HTTPException(status_code=404, detail="Zip file not found.")
+
+    async def tail_zip():
+        queue = job_registry.subscribe(job_id)
+        try:
+            # Leased so that the archive is not expired while it is sent
+            with temp_files.lease(zip_path), open_playlist_zip(zip_path) as zip_file:
+                while True:
+                    chunk = await asyncio.to_thread(
+                        zip_file.read, ZIP_STREAM_CHUNK_SIZE
+                    )
+                    if chunk:
+                        yield chunk
+                        continue
+                    state = job_registry.get(job_id) or {"status": "error"}
+                    if state["status"] in ("error", "cancelled"):
+                        raise RuntimeError(
+                            f"Playlist job {job_id} {state['status']} while streaming"
+                        )
+                    if state["status"] == "complete":
+                        # The archive is closed before the job is marked complete
+                        remainder = await asyncio.to_thread(zip_file.read)
+                        if remainder:
+                            yield remainder
+                        return
+                    await wait_for_job_change(job_id, queue, ZIP_STREAM_POLL_SECONDS)
+        finally:
+            job_registry.unsubscribe(job_id, queue)
+
+    # Once the whole archive has been sent, release it like /download-zip does
+    cleanup = ResponseBackgroundTasks()
+    cleanup.add_task(release_streamed_zip, job_id, zip_path)
+
+    return StreamingResponse(
+        tail_zip(),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{zip_name}"',
+            "X-Accel-Buffering": "no",
+        },
+        background=cleanup,
+    )
 
 
 @router.get("/download-zip/")
 @limiter.limit("10/minute")
-async def download_zip(
-    request: Request,
-    zip_name: str = Query(..., alias="filename"),
-    background_tasks: BackgroundTasks = BackgroundTasks(),
-):
+async def download_zip(request: Request, zip_name: str = Query(..., alias="filename")):
+    """
+    Download a finished playlist ZIP.
+
+    The ZIP is a leased artifact: it can be downloaded again and resumed with
+    Range/If-Range until its lease expires or it has been fully delivered.
+    """
     logging.info(f"Download request received for zip: {zip_name}")
     base_path = "temp_downloads"
     # Defense in depth: Use both sanitization functions for maximum safety
@@ -636,34 +2161,33 @@ async def download_zip(
         logging.error(f"Zip file not found at path: {zip_path}")
         raise HTTPException(status_code=404, detail="Zip file not found.")
 
-    # Extract job_id from zip filename to locate progress file
-    # Filename format: {sanitized_playlist_title}_{job_id}.zip
-    # SECURITY: Use sanitized_zip_name instead of original zip_name to prevent path traversal
-    try:
-        job_id = sanitized_zip_name.rsplit("_", 1)[1].replace(".zip", "")
+    artifact = artifact_store.find_by_path(zip_path)
+    if artifact is None:
+        # Not published by a job of this process; lease it now.
+        # Filename format: {sanitized_playlist_title}_{job_id}.zip
+        try:
+            job_id = sanitized_zip_name.rsplit("_", 1)[1].replace(".zip", "")
 
-        # Validate that job_id is a proper UUID (consistent with other endpoints)
-        uuid.UUID(job_id)
+            # Validate that job_id is a proper UUID (consistent with other endpoints)
+            uuid.UUID(job_id)
+        except (IndexError, ValueError):
+            # If we can't extract or validate job_id, only the zip is leased
+            job_id = None
+            logging.warning(
+                "Could not extract valid job_id from zip filename: "
+                f"{sanitized_zip_name}"
+            )
+
+        # The job publishes its ZIP itself right after moving it into place
+        state = job_registry.get(job_id) if job_id else None
+        if state is not None and state.get("status") != "complete":
+            raise HTTPException(status_code=404, detail="Zip file not found.")
 
-        base_path_abs = os.path.abspath(base_path)
-        progress_file_path = os.path.abspath(
-            os.path.normpath(os.path.join(base_path_abs, f"{job_id}_progress.json"))
+        artifact = artifact_store.publish(
+            zip_path,
+            sanitized_zip_name,
+            "application/zip",
+            on_delete=partial(job_registry.remove, job_id) if job_id else None,
         )
 
-        # Validate the progress file path is within the allowed directory
-        # Use os.sep for more robust path validation across platforms
-        if not progress_file_path.startswith(base_path_abs + os.sep):
-            logging.warning(f"Progress file path traversal attempt blocked: {progress_file_path}")
-            progress_file_path = None
-    except (IndexError, ValueError):
-        # If we can't extract or validate job_id, just delete the zip file
-        progress_file_path = None
-        logging.warning(f"Could not extract valid job_id from zip filename: {sanitized_zip_name}")
-
-    # Schedule file deletions after serving to user
-    background_tasks.add_task(remove_file, zip_path)
-    if progress_file_path and os.path.exists(progress_file_path):
-        background_tasks.add_task(remove_file, progress_file_path)
-
-    # Use sanitized filename in the response header
-    return FileResponse(path=zip_path, media_type="application/zip", filename=sanitized_zip_name)
+    return artifact_response(artifact)
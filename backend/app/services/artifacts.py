@@ -0,0 +1,315 @@
+"""
+Leased download artifacts that can be fetched again and resumed.
+
+A finished result (a playlist ZIP or a single video) is published as an
+artifact with a lease. Until the lease expires it can be downloaded any
+number of times, including partial ``Range`` requests to resume a dropped
+connection. The byte ranges that were confirmed sent are tracked; once the
+whole file has been delivered the lease is cut short to a grace period.
+
+Artifacts are registered with the cleanup service's temp file registry,
+which deletes them when they expire. While an artifact is being sent it
+holds a read lease on its file, so neither expiry nor eviction can delete
+it from under the response.
+"""
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from functools import partial
+from threading import Lock
+from typing import Callable, Optional
+
+from starlette.responses import FileResponse
+from starlette.types import Message, Receive, Scope, Send
+
+from app.services.cleanup import TempFileRegistry, temp_files
+from app.services.disk_usage import disk_usage
+
+# How long a result stays downloadable after it is ready
+ARTIFACT_LEASE_SECONDS = int(os.getenv("ARTIFACT_LEASE_SECONDS", "3600"))
+# How long it stays once every byte has been delivered at least once
+ARTIFACT_COMPLETED_GRACE_SECONDS = 300
+
+logger = logging.getLogger(__name__)
+
+
+def merge_ranges(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Merge overlapping or adjacent half-open byte ranges."""
+    merged: list[tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+@dataclass
+class Artifact:
+    artifact_id: str
+    path: str
+    filename: str
+    media_type: str
+    size: int
+    expires_at: float
+    # Called once the artifact is deleted, e.g. to release a media reference
+    on_delete: Optional[Callable[[], None]] = None
+    # Whether deleting the artifact deletes its file
+    owns_file: bool = True
+    sent: list[tuple[int, int]] = field(default_factory=list)
+    downloads: int = 0
+
+    @property
+    def fully_sent(self) -> bool:
+        return self.sent == [(0, self.size)]
+
+
+class ArtifactStore:
+    """
+    Registry of leased artifacts by ID.
+
+    Args:
+        lease_seconds: Default lease of a newly published artifact
+        completed_grace_seconds: Remaining lease once fully delivered
+        registry: Expires the artifacts and tracks their read leases
+    """
+
+    def __init__(
+        self,
+        lease_seconds: float = ARTIFACT_LEASE_SECONDS,
+        completed_grace_seconds: float = ARTIFACT_COMPLETED_GRACE_SECONDS,
+        registry: TempFileRegistry = temp_files,
+    ):
+        self.lease_seconds = lease_seconds
+        self.completed_grace_seconds = completed_grace_seconds
+        self.registry = registry
+        self._artifacts: dict[str, Artifact] = {}
+        self._lock = Lock()
+
+    def publish(
+        self,
+        path: str,
+        filename: str,
+        media_type: str,
+        on_delete: Optional[Callable[[], None]] = None,
+        owns_file: bool = True,
+        lease_seconds: Optional[float] = None,
+    ) -> Artifact:
+        """
+        Make a finished file downloadable until its lease expires.
+
+        Args:
+            path: The file on disk
+            filename: Name offered to the client
+            media_type: Content type of the file
+            on_delete: Called once the artifact is deleted
+            owns_file: Delete the file together with the artifact
+            lease_seconds: Overrides the default lease
+
+        Returns:
+            The published artifact
+        """
+        lease = self.lease_seconds if lease_seconds is None else lease_seconds
+        artifact = Artifact(
+            artifact_id=str(uuid.uuid4()),
+            path=path,
+            filename=filename,
+            media_type=media_type,
+            size=os.path.getsize(path),
+            expires_at=time.time() + lease,
+            on_delete=on_delete,
+            owns_file=owns_file,
+        )
+        with self._lock:
+            self._artifacts[artifact.artifact_id] = artifact
+        disk_usage.record(path, artifact.size)
+        self.registry.register(
+            path,
+            expires_at=artifact.expires_at,
+            # Only the bytes of an owned file are freed by deleting it
+            size=artifact.size if owns_file else 0,
+            on_expire=partial(self.remove, artifact.artifact_id),
+            key=registry_key(artifact.artifact_id),
+        )
+        logger.info(f"Published artifact {artifact.artifact_id} for {path}")
+        return artifact
+
+    def get(self, artifact_id: str) -> Optional[Artifact]:
+        """
+        Return a live artifact.
+
+        An expired artifact is deleted right away unless it is still being
+        sent; then the cleanup service deletes it once it is not.
+        """
+        with self._lock:
+            artifact = self._artifacts.get(artifact_id)
+            if artifact is None or artifact.expires_at > time.time():
+                return artifact
+            if self.registry.leased(artifact.path):
+                return None
+            del self._artifacts[artifact_id]
+        self._delete(artifact)
+        return None
+
+    def find_by_path(self, path: str) -> Optional[Artifact]:
+        """Return the live artifact serving a file, if any."""
+        path = os.path.abspath(path)
+        with self._lock:
+            artifact_id = next(
+                (
+                    a.artifact_id
+                    for a in self._artifacts.values()
+                    if os.path.abspath(a.path) == path
+                ),
+                None,
+            )
+        return self.get(artifact_id) if artifact_id else None
+
+    def record_sent(self, artifact_id: str, start: int, end: int):
+        """
+        Record that bytes [start, end) were delivered completely.
+
+        Once the whole file has been delivered, the remaining lease is cut
+        short to the grace period.
+        """
+        with self._lock:
+            artifact = self._artifacts.get(artifact_id)
+            if artifact is None:
+                return
+            artifact.sent = merge_ranges([*artifact.sent, (start, end)])
+            if artifact.fully_sent:
+                artifact.downloads += 1
+                artifact.expires_at = min(
+                    artifact.expires_at, time.time() + self.completed_grace_seconds
+                )
+                self.registry.reschedule(
+                    registry_key(artifact_id), artifact.expires_at
+                )
+
+    def remove(self, artifact_id: str):
+        """Delete an artifact right away."""
+        with self._lock:
+            artifact = self._artifacts.pop(artifact_id, None)
+        if artifact is not None:
+            self._delete(artifact)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """
+        Delete every artifact whose lease has expired and that is not being
+        sent.
+
+        Returns:
+            Number of bytes freed
+        """
+        now = now or time.time()
+        with self._lock:
+            expired = [
+                a
+                for a in self._artifacts.values()
+                if a.expires_at <= now and not self.registry.leased(a.path)
+            ]
+            for artifact in expired:
+                del self._artifacts[artifact.artifact_id]
+        return sum(self._delete(artifact) for artifact in expired)
+
+    def _delete(self, artifact: Artifact) -> int:
+        self.registry.discard(registry_key(artifact.artifact_id))
+        freed = 0
+        if artifact.owns_file:
+            try:
+                os.unlink(artifact.path)
+                freed = artifact.size
+            except FileNotFoundError:
+                disk_usage.forget(artifact.path)
+            except OSError as e:
+                logger.error(f"Error deleting artifact {artifact.path}: {e}")
+            else:
+                disk_usage.forget(artifact.path)
+        if artifact.on_delete is not None:
+            try:
+                artifact.on_delete()
+            except Exception as e:
+                logger.error(f"Error releasing artifact {artifact.artifact_id}: {e}")
+        logger.info(f"Deleted artifact {artifact.artifact_id}")
+        return freed
+
+    def stats(self) -> dict:
+        """Return the number of live artifacts and their size."""
+        with self._lock:
+            return {
+                "artifacts": len(self._artifacts),
+                "bytes": sum(a.size for a in self._artifacts.values()),
+            }
+
+
+def registry_key(artifact_id: str) -> str:
+    """Key of an artifact's entry in the temp file registry."""
+    return f"artifact:{artifact_id}"
+
+
+def parse_content_range(value: str) -> Optional[tuple[int, int]]:
+    """Parse a ``bytes start-end/size`` header into a half-open range."""
+    try:
+        unit, spec = value.split(" ", 1)
+        first, last = spec.split("/", 1)[0].split("-", 1)
+        if unit != "bytes":
+            return None
+        return int(first), int(last) + 1
+    except ValueError:
+        return None
+
+
+class ArtifactResponse(FileResponse):
+    """
+    FileResponse for an artifact that records which bytes were delivered.
+
+    Range and If-Range handling is FileResponse's own. A range only counts
+    as delivered once the response finished without the client going away.
+    """
+
+    def __init__(self, artifact: Artifact, store: ArtifactStore, **kwargs):
+        super().__init__(
+            artifact.path,
+            media_type=artifact.media_type,
+            filename=artifact.filename,
+            **kwargs,
+        )
+        self.artifact = artifact
+        self.store = store
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        expected: Optional[tuple[int, int]] = None
+        body_bytes = 0
+
+        async def tracking_send(message: Message):
+            nonlocal expected, body_bytes
+            if message["type"] == "http.response.start":
+                headers = {
+                    key.decode("latin-1").lower(): value.decode("latin-1")
+                    for key, value in message.get("headers", [])
+                }
+                content_type = headers.get("content-type", "")
+                if message["status"] == 200:
+                    expected = (0, self.artifact.size)
+                elif message["status"] == 206 and "multipart" not in content_type:
+                    # Multipart responses interleave boundaries; not tracked
+                    expected = parse_content_range(headers.get("content-range", ""))
+            elif message["type"] == "http.response.body":
+                body_bytes += len(message.get("body", b""))
+            await send(message)
+
+        # The file must outlive the response, even if its lease expires
+        with self.store.registry.lease(self.artifact.path):
+            await super().__call__(scope, receive, tracking_send)
+
+        if (
+            scope.get("method") != "HEAD"
+            and expected is not None
+            and body_bytes == expected[1] - expected[0]
+        ):
+            self.store.record_sent(self.artifact.artifact_id, *expected)
+
+
+artifact_store = ArtifactStore()
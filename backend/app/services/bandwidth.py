@@ -0,0 +1,248 @@
+"""
+Server-wide ingress bandwidth budget for YouTube downloads.
+
+Every yt-dlp download reports the bytes it received through a progress hook.
+The hook charges them to two token buckets, the global one and the one of
+the job the download belongs to, and sleeps the download thread until both
+are back in budget. Holding the thread stops yt-dlp from reading the socket,
+so TCP flow control slows the sender down as well.
+
+A job may use at most its share of the global limit, so one playlist of
+large videos cannot take the whole uplink from everyone else. A limit of 0
+means unlimited. Both values can be changed at runtime.
+"""
+import logging
+import math
+import os
+import time
+import uuid
+from collections import deque
+from threading import Event, Lock
+from typing import Callable, Optional
+
+# Global ingress limit in bytes per second; 0 disables the limit
+YOUTUBE_BANDWIDTH_LIMIT = int(os.getenv("YOUTUBE_BANDWIDTH_LIMIT", "0"))
+# Largest share of the global limit a single job or download may use
+YOUTUBE_JOB_BANDWIDTH_SHARE = float(
+    os.getenv("YOUTUBE_JOB_BANDWIDTH_SHARE", "0.5")
+)
+# Seconds of traffic a bucket may send in one burst after being idle
+BURST_SECONDS = 1.0
+# Window over which utilization is reported
+UTILIZATION_WINDOW_SECONDS = 5.0
+# A job's bucket is forgotten after this long without traffic
+IDLE_JOB_SECONDS = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket that may go into debt.
+
+    Consuming always succeeds and returns how long the caller has to wait
+    until the bucket is back in budget, so one large chunk is never refused.
+
+    Args:
+        rate: Tokens (bytes) added per second; 0 means unlimited
+        clock: Monotonic time source
+    """
+
+    def __init__(self, rate: float, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.rate = rate
+        self._tokens = rate * BURST_SECONDS
+        self._updated = clock()
+
+    def set_rate(self, rate: float):
+        """Change the refill rate, keeping the current balance."""
+        self._refill()
+        self.rate = rate
+        self._tokens = min(self._tokens, rate * BURST_SECONDS)
+
+    def _refill(self):
+        now = self._clock()
+        if self.rate > 0:
+            self._tokens = min(
+                self.rate * BURST_SECONDS,
+                self._tokens + (now - self._updated) * self.rate,
+            )
+        self._updated = now
+
+    def consume(self, amount: float) -> float:
+        """Take amount tokens; return the seconds until the debt is repaid."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        self._tokens -= amount
+        return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+class _Meter:
+    """
+    Bytes received over the last UTILIZATION_WINDOW_SECONDS.
+
+    Amounts are summed into one bucket per second and buckets that leave the
+    window are dropped as new ones arrive, so a meter holds at most one
+    bucket per second of the window however many chunks it counts.
+    """
+
+    def __init__(self):
+        # [second, bytes received in it], oldest first
+        self._buckets: deque[list] = deque()
+        self._total = 0
+        self.last_seen = time.monotonic()
+
+    def _prune(self, now: float):
+        cutoff = now - UTILIZATION_WINDOW_SECONDS
+        while self._buckets and self._buckets[0][0] < cutoff:
+            self._total -= self._buckets.popleft()[1]
+
+    def add(self, now: float, amount: int):
+        second = math.floor(now)
+        if self._buckets and self._buckets[-1][0] == second:
+            self._buckets[-1][1] += amount
+        else:
+            self._buckets.append([second, amount])
+        self._total += amount
+        self._prune(now)
+        self.last_seen = now
+
+    def rate(self, now: float) -> float:
+        self._prune(now)
+        return self._total / UTILIZATION_WINDOW_SECONDS
+
+
+class BandwidthGovernor:
+    """
+    Shared bandwidth budget with a global cap and per-job shares.
+
+    Args:
+        limit: Global limit in bytes per second; 0 means unlimited
+        job_share: Largest fraction of the limit one job may use
+        sleep: Used to hold back a download thread
+    """
+
+    def __init__(
+        self,
+        limit: int = YOUTUBE_BANDWIDTH_LIMIT,
+        job_share: float = YOUTUBE_JOB_BANDWIDTH_SHARE,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.limit = max(0, limit)
+        self.job_share = min(1.0, max(0.01, job_share))
+        self._sleep = sleep
+        self._global = TokenBucket(self.limit)
+        self._global_meter = _Meter()
+        self._jobs: dict[str, TokenBucket] = {}
+        self._job_meters: dict[str, _Meter] = {}
+        self._lock = Lock()
+
+    def _job_rate(self) -> float:
+        return self.limit * self.job_share
+
+    def configure(
+        self, limit: Optional[int] = None, job_share: Optional[float] = None
+    ):
+        """
+        Change the global limit and/or the per-job share at runtime.
+
+        Running downloads pick up the new values with their next chunk.
+        """
+        with self._lock:
+            if limit is not None:
+                self.limit = max(0, limit)
+            if job_share is not None:
+                self.job_share = min(1.0, max(0.01, job_share))
+            self._global.set_rate(self.limit)
+            for bucket in self._jobs.values():
+                bucket.set_rate(self._job_rate())
+        logger.info(
+            f"Bandwidth limit set to {self.limit} B/s "
+            f"with a per-job share of {self.job_share:g}"
+        )
+
+    def consume(self, amount: int, job_id: str) -> float:
+        """
+        Charge received bytes to the global and the job's budget.
+
+        Returns:
+            Seconds the download has to pause to stay within both budgets
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._jobs.get(job_id)
+            if bucket is None:
+                bucket = self._jobs[job_id] = TokenBucket(self._job_rate())
+                self._job_meters[job_id] = _Meter()
+            self._global_meter.add(now, amount)
+            self._job_meters[job_id].add(now, amount)
+            delay = max(self._global.consume(amount), bucket.consume(amount))
+            self._forget_idle_jobs(now)
+        return delay
+
+    def _forget_idle_jobs(self, now: float):
+        """Drop the buckets of jobs without recent traffic; caller holds the lock."""
+        for job_id, meter in list(self._job_meters.items()):
+            if now - meter.last_seen > IDLE_JOB_SECONDS:
+                del self._job_meters[job_id]
+                del self._jobs[job_id]
+
+    def progress_hook(
+        self, job_id: Optional[str] = None, cancel_event: Optional[Event] = None
+    ) -> Callable[[dict], None]:
+        """
+        Build a yt-dlp progress hook that keeps a download within budget.
+
+        Args:
+            job_id: Downloads of the same job share one bucket; without it
+                the download gets a bucket of its own
+            cancel_event: Ends a pause early once set, so that a cancelled
+                download is not held back
+        """
+        job_id = job_id or f"download-{uuid.uuid4()}"
+        # downloaded_bytes is cumulative per file; mp4 downloads fetch a video
+        # and an audio file one after the other
+        received: dict[str, int] = {}
+
+        def hook(status: dict):
+            if status.get("status") != "downloading":
+                return
+            name = status.get("tmpfilename") or status.get("filename") or ""
+            total = status.get("downloaded_bytes") or 0
+            amount = total - received.get(name, 0)
+            received[name] = total
+            if amount <= 0:
+                return
+            delay = self.consume(amount, job_id)
+            if delay <= 0:
+                return
+            if cancel_event is not None:
+                cancel_event.wait(delay)
+            else:
+                self._sleep(delay)
+
+        return hook
+
+    def stats(self) -> dict:
+        """
+        Return the limits and the bandwidth currently used, in bytes/s.
+
+        Job IDs grant access to their jobs, so only per-job rates are shown.
+        """
+        now = time.monotonic()
+        with self._lock:
+            used = self._global_meter.rate(now)
+            job_rates = [meter.rate(now) for meter in self._job_meters.values()]
+            return {
+                "limit": self.limit,
+                "job_share": self.job_share,
+                "job_limit": self._job_rate(),
+                "used": round(used),
+                "utilization": round(used / self.limit, 3) if self.limit else None,
+                "active_jobs": sum(1 for rate in job_rates if rate > 0),
+                "busiest_job": round(max(job_rates, default=0)),
+            }
+
+
+bandwidth_governor = BandwidthGovernor()
@@ -1,10 +1,64 @@
+"""
+Expiry and eviction of everything stored in the temp directories.
+
+Every file or directory in temp_downloads and uploads is registered in
+temp_files with its size and expiry: download artifacts register
+themselves when they are published, anything else is adopted when the
+directories are reconciled. Expiry pops the registry's deadline heap, so a
+cleanup run only touches what is actually due and can run every minute.
+Cached media has its own expiry in the media store, under its own root.
+
+Files that are being sent to a client are leased. A leased file is neither
+expired nor evicted; it goes at the first cleanup after its last lease
+ends. Only reconciliation lists the directories, to adopt files that
+nothing registered (e.g. yt-dlp leftovers) and drop entries whose file is
+gone; it runs when the service starts and every few hours.
+"""
+import heapq
+import itertools
+import logging
 import os
+import shutil
 import time
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
+from threading import Lock
+from typing import Callable, Iterable, Iterator, Optional
+
+from app.services.disk_usage import DiskReservation, disk_usage
+from app.services.jobs import job_registry
+from app.services.media_store import media_store
+from app.services.streaming_zip import partial_path
 
 TEMP_DIRS = ["temp_downloads", "uploads"]
 MAX_DIR_SIZE_GB = 25  # Maximum directory size in GB (allocated to service)
 DISK_USAGE_THRESHOLD = 0.90  # Reject new requests at 90% of MAX_DIR_SIZE_GB
+# Lifetime of a temp file that nothing registered with its own expiry
+TEMP_FILE_TTL_SECONDS = 7200
+# How often expired temp files are deleted; only due entries are touched
+CLEANUP_INTERVAL_MINUTES = 1
+# How often the temp directories are listed to find unregistered files
+TEMP_FILES_RECONCILE_HOURS = 6
+# Most storage one client may have reserved or kept at once, in GB
+CLIENT_DISK_QUOTA_GB = float(os.getenv("CLIENT_DISK_QUOTA_GB", "5"))
+
+logger = logging.getLogger(__name__)
+
+
+class DiskSpaceUnavailable(Exception):
+    """
+    A request was refused at admission for lack of storage.
+
+    Args:
+        message: Why the request was refused
+        quota_exceeded: True if the client's quota is used up, False if
+            the service's storage is
+    """
+
+    def __init__(self, message: str, quota_exceeded: bool = False):
+        super().__init__(message)
+        self.quota_exceeded = quota_exceeded
 
 
 def get_directory_size(path: Path) -> int:
@@ -17,132 +71,400 @@ def get_directory_size(path: Path) -> int:
                 try:
                     total_size += filepath.stat().st_size
                 except Exception as e:
-                    print(f"Error getting size of {filepath}: {e}")
+                    logger.error(f"Error getting size of {filepath}: {e}")
     except Exception as e:
-        print(f"Error walking directory {path}: {e}")
+        logger.error(f"Error walking directory {path}: {e}")
     return total_size
 
 
-def get_total_disk_usage() -> tuple[int, int]:
+@dataclass
+class TempFile:
+    key: str
+    path: str
+    size: int
+    expires_at: float
+    # Deletes the file instead of the registry, e.g. to drop an artifact
+    on_expire: Optional[Callable[[], None]] = None
+
+
+class TempFileRegistry:
     """
-    Get total disk usage across all temp directories.
-    
-    Returns:
-        tuple: (total_bytes_used, max_bytes_allowed)
+    Temp files and directories with their size, expiry and leases.
+
+    Entries are kept in a heap ordered by deadline. Rescheduling an entry
+    pushes a new deadline; outdated heap items are skipped when popped.
     """
-    total_bytes = 0
-    for temp_dir in TEMP_DIRS:
-        path = Path(temp_dir)
-        if path.is_dir():
-            total_bytes += get_directory_size(path)
-    
-    max_bytes = int(MAX_DIR_SIZE_GB * (1024**3))
-    return total_bytes, max_bytes
 
+    def __init__(self):
+        self._entries: dict[str, TempFile] = {}
+        self._heap: list[tuple[float, int, str]] = []
+        self._leases: dict[str, int] = {}
+        self._counter = itertools.count()
+        self._directories: Optional[tuple[str, ...]] = None
+        self._reconciled_at: Optional[float] = None
+        self._lock = Lock()
+
+    @property
+    def directories(self) -> Optional[tuple[str, ...]]:
+        """The directories of the last reconciliation."""
+        return self._directories
+
+    def _push(self, entry: TempFile):
+        """Schedule an entry's deadline; caller holds the lock."""
+        heapq.heappush(self._heap, (entry.expires_at, next(self._counter), entry.key))
+
+    def register(
+        self,
+        path: str,
+        expires_at: Optional[float] = None,
+        size: Optional[int] = None,
+        on_expire: Optional[Callable[[], None]] = None,
+        key: Optional[str] = None,
+    ) -> str:
+        """
+        Register a file or directory for deletion at its expiry.
+
+        Args:
+            path: The file or directory
+            expires_at: Deadline; defaults to TEMP_FILE_TTL_SECONDS from now
+            size: Bytes it takes; stat'ed when omitted
+            on_expire: Called instead of deleting the path
+            key: Identifies the entry; defaults to the path. An owner that
+                registers a path under its own key takes it over from the
+                entry keyed by the path alone, e.g. one adopted by reconcile()
+
+        Returns:
+            The entry's key
+        """
+        path = os.path.abspath(path)
+        if size is None:
+            size = (
+                get_directory_size(Path(path))
+                if os.path.isdir(path)
+                else os.path.getsize(path)
+            )
+        if expires_at is None:
+            expires_at = time.time() + TEMP_FILE_TTL_SECONDS
+        entry = TempFile(key or path, path, size, expires_at, on_expire)
+        with self._lock:
+            if entry.key != path:
+                # Its deadline would otherwise delete the file from under the owner
+                self._entries.pop(path, None)
+            self._entries[entry.key] = entry
+            self._push(entry)
+        return entry.key
+
+    def reschedule(self, key: str, expires_at: float):
+        """Move an entry's deadline."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at != expires_at:
+                entry.expires_at = expires_at
+                self._push(entry)
+
+    def discard(self, key: str):
+        """Forget an entry whose owner deleted it."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def acquire(self, path: str):
+        """Protect a file from expiry and eviction while it is read."""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._leases[path] = self._leases.get(path, 0) + 1
+
+    def release(self, path: str):
+        """End a lease taken with acquire()."""
+        path = os.path.abspath(path)
+        with self._lock:
+            count = self._leases.get(path, 0) - 1
+            if count > 0:
+                self._leases[path] = count
+            else:
+                self._leases.pop(path, None)
+
+    @contextmanager
+    def lease(self, path: str) -> Iterator[None]:
+        """Hold a lease on a file for the duration of the block."""
+        self.acquire(path)
+        try:
+            yield
+        finally:
+            self.release(path)
+
+    def leased(self, path: str) -> bool:
+        """Whether a file is being read."""
+        with self._lock:
+            return os.path.abspath(path) in self._leases
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """
+        Delete every unleased entry whose deadline has passed.
+
+        Leased entries stay due and are retried by the next run.
+
+        Returns:
+            Number of bytes freed
+        """
+        now = now or time.time()
+        due = []
+        with self._lock:
+            deferred = []
+            while self._heap and self._heap[0][0] <= now:
+                item = heapq.heappop(self._heap)
+                entry = self._entries.get(item[2])
+                if entry is None or entry.expires_at != item[0]:
+                    # Deleted or rescheduled since
+                    continue
+                if entry.path in self._leases:
+                    deferred.append(item)
+                    continue
+                del self._entries[entry.key]
+                due.append(entry)
+            for item in deferred:
+                heapq.heappush(self._heap, item)
+        return sum(self._delete(entry) for entry in due)
+
+    def evict(self, nbytes: int) -> int:
+        """
+        Delete unleased entries, nearest deadline first, to free nbytes.
+
+        Returns:
+            Number of bytes freed
+        """
+        with self._lock:
+            candidates = sorted(
+                (
+                    entry
+                    for entry in self._entries.values()
+                    # Entries over borrowed files free nothing themselves
+                    if entry.size and entry.path not in self._leases
+                ),
+                key=lambda entry: entry.expires_at,
+            )
+            victims = []
+            planned = 0
+            for entry in candidates:
+                if planned >= nbytes:
+                    break
+                del self._entries[entry.key]
+                victims.append(entry)
+                planned += entry.size
+        return sum(self._delete(entry) for entry in victims)
+
+    def _delete(self, entry: TempFile) -> int:
+        if entry.on_expire is not None:
+            try:
+                entry.on_expire()
+            except Exception as e:
+                logger.error(f"Error expiring {entry.key}: {e}")
+                return 0
+            return entry.size
+        try:
+            if os.path.isdir(entry.path):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Error deleting temporary file {entry.path}: {e}")
+            return 0
+        disk_usage.forget(entry.path)
+        logger.info(
+            f"Deleted expired temporary file: {entry.path} "
+            f"({entry.size / (1024**2):.2f}MB)"
+        )
+        return entry.size
+
+    def reconcile(self, directories: Iterable[str], skip: Iterable[str] = ()) -> int:
+        """
+        List the directories and bring the registry in line with them.
 
-def check_disk_space_available() -> bool:
+        Files and directories that nothing registered are adopted with an
+        expiry of TEMP_FILE_TTL_SECONDS after their last modification;
+        entries whose path is gone are dropped. Only the top level of each
+        directory is listed; a nested directory is one entry.
+
+        Args:
+            directories: Directories to account for
+            skip: Paths managed elsewhere, e.g. the media store's root
+
+        Returns:
+            Number of entries adopted
+        """
+        directories = tuple(directories)
+        skipped = {os.path.abspath(path) for path in skip}
+        found = {}
+        for directory in directories:
+            try:
+                with os.scandir(directory) as scan:
+                    for item in scan:
+                        path = os.path.abspath(item.path)
+                        if path in skipped:
+                            continue
+                        try:
+                            found[path] = item.stat().st_mtime
+                        except OSError:
+                            # Deleted while listing
+                            continue
+            except FileNotFoundError:
+                continue
+
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.on_expire is None and entry.path not in found:
+                    del self._entries[key]
+            known = {entry.path for entry in self._entries.values()}
+        adopted = 0
+        for path, mtime in found.items():
+            if path in known:
+                continue
+            try:
+                self.register(path, expires_at=mtime + TEMP_FILE_TTL_SECONDS)
+            except OSError:
+                continue
+            adopted += 1
+        self._directories = directories
+        self._reconciled_at = time.time()
+        return adopted
+
+    def stats(self) -> dict:
+        """Return the registered entries, their size and the active leases."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(entry.size for entry in self._entries.values()),
+                "leases": sum(self._leases.values()),
+                "reconciled_at": self._reconciled_at,
+            }
+
+
+temp_files = TempFileRegistry()
+
+
+def reconcile_temp_files() -> int:
+    """
+    Adopt unregistered files in the temp directories into temp_files.
+
+    The partial ZIPs of unfinished jobs are left alone: they are still being
+    written, or are written again when the job resumes, and their job
+    deletes them if it fails.
+    """
+    skip = [media_store.root]
+    for job_id in job_registry.interrupted_jobs():
+        zip_name = (job_registry.get(job_id) or {}).get("zip_name")
+        if zip_name:
+            skip.extend(
+                partial_path(os.path.join(directory, zip_name))
+                for directory in TEMP_DIRS
+            )
+    adopted = temp_files.reconcile(TEMP_DIRS, skip=skip)
+    if adopted:
+        logger.info(f"Registered {adopted} untracked temporary files for expiry")
+    return adopted
+
+
+def reconcile_disk_usage() -> int:
+    """Check the disk usage ledger against the temp directories' contents."""
+    return disk_usage.reconcile(TEMP_DIRS)
+
+
+def reserve_disk_space(client_id: str, nbytes: int) -> DiskReservation:
     """
-    Check if there's enough disk space to accept new requests.
-    
+    Reserve storage for a request before admitting it.
+
+    The request is admitted if the stored bytes, the outstanding
+    reservations and nbytes stay below the usage threshold, and the client
+    stays within CLIENT_DISK_QUOTA_GB.
+
+    Args:
+        client_id: The client the bytes are charged to
+        nbytes: Estimated bytes the request will write
+
     Returns:
-        bool: True if disk usage is below threshold, False otherwise
+        The reservation; the caller must settle() or release() it
+
+    Raises:
+        DiskSpaceUnavailable: If the reservation does not fit
     """
-    total_bytes, max_bytes = get_total_disk_usage()
-    threshold_bytes = int(max_bytes * DISK_USAGE_THRESHOLD)
-    
-    if total_bytes >= threshold_bytes:
-        usage_gb = total_bytes / (1024**3)
-        max_gb = max_bytes / (1024**3)
-        threshold_gb = threshold_bytes / (1024**3)
-        print(
-            f"Disk space threshold exceeded: {usage_gb:.2f}GB / {max_gb:.2f}GB "
-            f"(threshold: {threshold_gb:.2f}GB at {DISK_USAGE_THRESHOLD*100:.0f}%)"
+    limit = int(MAX_DIR_SIZE_GB * (1024**3) * DISK_USAGE_THRESHOLD)
+    client_limit = int(CLIENT_DISK_QUOTA_GB * (1024**3))
+    # Builds the ledger on first use
+    disk_usage.usage(TEMP_DIRS)
+    reservation = disk_usage.reserve(client_id, nbytes, limit, client_limit)
+    if reservation is not None:
+        return reservation
+    if disk_usage.client_usage(client_id) + nbytes > client_limit:
+        raise DiskSpaceUnavailable(
+            "Your storage quota is in use by your other downloads. "
+            "Please try again once they have finished.",
+            quota_exceeded=True,
         )
-        return False
-    
-    return True
+    raise DiskSpaceUnavailable(
+        "Service storage limit reached. Please try again later."
+    )
 
 
 def cleanup_temporary_files():
     """
-    Clean up temporary files based on age and total disk usage.
-    - Delete files older than 2 hours (7200 seconds)
-    - If total disk usage exceeds MAX_DIR_SIZE_GB, delete oldest files first across all directories
+    Clean up temporary files based on their expiry and total disk usage.
+    - Delete registered files and artifacts whose expiry has passed; files
+      nothing registered expire 2 hours after they were last modified
+    - Evict cached media that nobody has used within its TTL
+    - If total disk usage exceeds MAX_DIR_SIZE_GB, evict unused cached media
+      first, then the files closest to expiry
+    Files that are being sent to a client are never deleted.
     """
     for temp_dir in TEMP_DIRS:
         Path(temp_dir).mkdir(parents=True, exist_ok=True)
 
-    for temp_dir in TEMP_DIRS:
-        path = Path(temp_dir)
-        if not path.is_dir():
-            continue
-
-        # First pass: delete files older than 2 hours
-        two_hours = 7200  # 2 hours in seconds
-        for filename in os.listdir(path):
-            file_path = path / filename
-            try:
-                if (
-                    file_path.is_file()
-                    and (time.time() - file_path.stat().st_mtime) > two_hours
-                ):
-                    file_path.unlink()
-                    print(f"Deleted old temporary file (>2h): {file_path}")
-            except Exception as e:
-                print(f"Error deleting file {file_path}: {e}")
-    
-    # After first pass on all directories, check total disk usage
+    # The registry only lists the directories when it is first used or they
+    # changed; otherwise reconciliation runs on its own schedule
+    if temp_files.directories != tuple(TEMP_DIRS):
+        reconcile_temp_files()
+
+    # Expired files and artifacts go first, as artifacts may hold references
+    # to cached media
+    try:
+        freed = temp_files.expire()
+        if freed:
+            logger.info(f"Deleted expired temporary files ({freed / (1024**2):.2f}MB)")
+    except Exception as e:
+        logger.error(f"Error deleting expired temporary files: {e}")
+
+    # Cached media lives in a nested directory and has its own expiry, which
+    # never touches files that are still being served
     try:
-        total_bytes, max_bytes = get_total_disk_usage()
+        freed = media_store.evict_expired()
+        if freed:
+            logger.info(f"Evicted expired cached media ({freed / (1024**2):.2f}MB)")
+    except Exception as e:
+        logger.error(f"Error evicting expired cached media: {e}")
+
+    # Check total disk usage from the ledger
+    try:
+        total_bytes = disk_usage.usage(TEMP_DIRS)
         total_gb = total_bytes / (1024**3)
 
         if total_gb > MAX_DIR_SIZE_GB:
-            print(
+            logger.warning(
                 f"Total disk usage ({total_gb:.2f}GB) "
                 f"exceeds limit ({MAX_DIR_SIZE_GB}GB). Cleaning up..."
             )
 
-            # Collect all files from all temp directories with their metadata
-            all_files_with_time = []
-            for temp_dir in TEMP_DIRS:
-                path = Path(temp_dir)
-                if not path.is_dir():
-                    continue
-                    
-                for filename in os.listdir(path):
-                    file_path = path / filename
-                    if file_path.is_file():
-                        try:
-                            mtime = file_path.stat().st_mtime
-                            size = file_path.stat().st_size
-                            all_files_with_time.append((file_path, mtime, size))
-                        except Exception as e:
-                            print(f"Error getting file info for {file_path}: {e}")
-
-            # Sort by modification time (oldest first) across all directories
-            all_files_with_time.sort(key=lambda x: x[1])
-
-            # Delete oldest files until we're under the limit
+            # Unused cached media is the cheapest thing to give up
             bytes_to_free = int((total_gb - MAX_DIR_SIZE_GB) * (1024**3))
-            bytes_freed = 0
+            bytes_freed = media_store.evict_lru(bytes_to_free)
 
-            for file_path, mtime, size in all_files_with_time:
-                if bytes_freed >= bytes_to_free:
-                    break
-                try:
-                    file_path.unlink()
-                    bytes_freed += size
-                    print(
-                        f"Deleted file to reduce disk usage: {file_path} "
-                        f"({size / (1024**2):.2f}MB)"
-                    )
-                except Exception as e:
-                    print(f"Error deleting file {file_path}: {e}")
+            # Then whatever would expire soonest, unless it is being sent
+            if bytes_freed < bytes_to_free:
+                bytes_freed += temp_files.evict(bytes_to_free - bytes_freed)
 
             final_size_gb = (total_bytes - bytes_freed) / (1024**3)
-            print(
+            logger.info(
                 f"Cleanup complete. Total disk usage reduced from "
                 f"{total_gb:.2f}GB to {final_size_gb:.2f}GB"
             )
     except Exception as e:
-        print(f"Error checking/cleaning total disk usage: {e}")
+        logger.error(f"Error checking/cleaning total disk usage: {e}")
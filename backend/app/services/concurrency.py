@@ -0,0 +1,198 @@
+"""
+Adaptive limit on the number of downloads in flight.
+
+The download scheduler has a fixed number of worker threads, but how many of
+them should actually download at once depends on the host and on YouTube:
+an idle host with a fast link benefits from more parallel downloads, while a
+busy one only queues more work for ffmpeg, and too many requests get the
+server throttled by the extractor.
+
+The controller follows AIMD (additive increase, multiplicative decrease),
+fed by every finished download:
+
+- Throttling errors from the extractor halve the limit.
+- A transcode backlog (ffmpeg already saturating the CPUs) cuts it by a
+  quarter.
+- Falling per-download bandwidth means the link is shared by too many
+  downloads; the limit is lowered by one.
+- Otherwise, while downloads are waiting for a slot, the limit grows by one
+  per limit downloads.
+
+Every decision is kept in a bounded history and logged when the limit
+changes, so the constants below can be tuned from real traffic.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from app.services.download_scheduler import download_scheduler
+from app.services.transcoder import transcode_pool
+
+# Multiplicative decrease after a throttling error and under CPU pressure
+THROTTLE_DECREASE = 0.5
+CPU_DECREASE = 0.75
+# Transcode tasks per transcode worker above which the CPUs count as saturated
+CPU_PRESSURE_THRESHOLD = 2.0
+# Per-download bandwidth below this share of the recent peak means the link
+# is saturated
+BANDWIDTH_DROP_RATIO = 0.5
+# Weight of the newest sample in the bandwidth average, and how fast the
+# remembered peak decays per sample
+BANDWIDTH_EWMA_WEIGHT = 0.3
+BANDWIDTH_PEAK_DECAY = 0.98
+# Transfers smaller or shorter than this say nothing about the bandwidth
+MIN_SAMPLE_BYTES = 256 * 1024
+MIN_SAMPLE_SECONDS = 0.5
+# Number of decisions kept for inspection
+DECISION_HISTORY = 200
+
+# Extractor errors that mean YouTube is rate limiting this server
+THROTTLING_MARKERS = (
+    "http error 429",
+    "too many requests",
+    "rate-limit",
+    "rate limit",
+    "confirm you're not a bot",
+    "confirm you’re not a bot",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def is_throttling_error(message: str) -> bool:
+    """Whether an extractor error message means the server is being throttled."""
+    message = message.lower()
+    return any(marker in message for marker in THROTTLING_MARKERS)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD controller for the number of downloads in flight.
+
+    Args:
+        max_limit: Highest limit, e.g. the number of download workers
+        apply: Called with the new whole-number limit whenever it changes
+        cpu_pressure: Returns queued transcode work per transcode worker
+        is_backlogged: Returns whether downloads are waiting for a slot
+        initial_limit: Starting limit; half of max_limit by default
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        apply: Callable[[int], None],
+        cpu_pressure: Callable[[], float] = lambda: 0.0,
+        is_backlogged: Callable[[], bool] = lambda: True,
+        initial_limit: Optional[int] = None,
+    ):
+        self.max_limit = max(1, max_limit)
+        self._apply = apply
+        self._cpu_pressure = cpu_pressure
+        self._is_backlogged = is_backlogged
+        self._limit = float(initial_limit or max(1, self.max_limit // 2))
+        self._limit = min(self._limit, self.max_limit)
+        self._bandwidth: Optional[float] = None
+        self._peak_bandwidth = 0.0
+        self._decisions: deque[dict] = deque(maxlen=DECISION_HISTORY)
+        self._lock = threading.Lock()
+        self._apply(self.limit)
+
+    @property
+    def limit(self) -> int:
+        """The current whole-number limit."""
+        return max(1, int(self._limit))
+
+    def progress_hook(self, status: dict):
+        """yt-dlp progress hook that reports every finished transfer."""
+        if status.get("status") != "finished":
+            return
+        size = status.get("downloaded_bytes") or status.get("total_bytes") or 0
+        elapsed = status.get("elapsed") or 0
+        self.record_download(size, elapsed)
+
+    def record_download(self, size: int, seconds: float):
+        """Adjust the limit after a successful download of size bytes."""
+        bandwidth = None
+        if size >= MIN_SAMPLE_BYTES and seconds >= MIN_SAMPLE_SECONDS:
+            bandwidth = size / seconds
+        with self._lock:
+            if bandwidth is not None:
+                self._bandwidth = (
+                    bandwidth
+                    if self._bandwidth is None
+                    else BANDWIDTH_EWMA_WEIGHT * bandwidth
+                    + (1 - BANDWIDTH_EWMA_WEIGHT) * self._bandwidth
+                )
+                self._peak_bandwidth = max(
+                    self._bandwidth, self._peak_bandwidth * BANDWIDTH_PEAK_DECAY
+                )
+
+            pressure = self._cpu_pressure()
+            if pressure > CPU_PRESSURE_THRESHOLD:
+                self._decide("cpu_saturated", self._limit * CPU_DECREASE, pressure)
+            elif (
+                bandwidth is not None
+                and self._bandwidth < BANDWIDTH_DROP_RATIO * self._peak_bandwidth
+            ):
+                self._decide("bandwidth_saturated", self._limit - 1, pressure)
+            elif self._is_backlogged():
+                self._decide("increase", self._limit + 1 / self._limit, pressure)
+            else:
+                self._decide("hold", self._limit, pressure)
+
+    def record_error(self, message: str):
+        """Adjust the limit after a failed download."""
+        if not is_throttling_error(message):
+            return
+        with self._lock:
+            self._decide(
+                "throttled", self._limit * THROTTLE_DECREASE, self._cpu_pressure()
+            )
+
+    def _decide(self, reason: str, limit: float, cpu_pressure: float):
+        """Record a decision and apply it. Caller must hold the lock."""
+        before = self.limit
+        self._limit = min(float(self.max_limit), max(1.0, limit))
+        after = self.limit
+        self._decisions.append(
+            {
+                "time": time.time(),
+                "reason": reason,
+                "limit": round(self._limit, 2),
+                "bandwidth": round(self._bandwidth) if self._bandwidth else None,
+                "peak_bandwidth": round(self._peak_bandwidth),
+                "cpu_pressure": round(cpu_pressure, 2),
+            }
+        )
+        if after != before:
+            logger.info(
+                f"Download concurrency {before} -> {after} ({reason}, "
+                f"bandwidth={self._bandwidth or 0:.0f} B/s, "
+                f"cpu_pressure={cpu_pressure:.2f})"
+            )
+            self._apply(after)
+
+    def decisions(self) -> list[dict]:
+        """Return the recent decisions, oldest first."""
+        with self._lock:
+            return list(self._decisions)
+
+    def stats(self) -> dict:
+        """Return the current limit and the signals it is based on."""
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "max_limit": self.max_limit,
+                "bandwidth": round(self._bandwidth) if self._bandwidth else None,
+                "peak_bandwidth": round(self._peak_bandwidth),
+            }
+
+
+adaptive_concurrency = AdaptiveConcurrency(
+    max_limit=download_scheduler.max_workers,
+    apply=download_scheduler.set_concurrency_limit,
+    cpu_pressure=transcode_pool.pressure,
+    is_backlogged=download_scheduler.is_backlogged,
+)
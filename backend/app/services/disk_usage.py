@@ -0,0 +1,227 @@
+"""
+Running total of the bytes stored in the service's temp directories.
+
+Admission checks used to walk and stat every file under temp_downloads and
+uploads on every request. The ledger keeps the size of every file instead:
+the services that write and delete files (the media store, the artifact
+store, the ZIP writer and the cleanup service) report each change, so
+reading the total is a single lookup.
+
+Files written by anything that does not report to the ledger (e.g. yt-dlp
+staging files) are picked up by reconcile(), which walks the directories
+and replaces the ledger with what is actually on disk. It runs at startup,
+when the ledger is first used and every RECONCILE_INTERVAL_MINUTES from the
+scheduler, and logs how far the ledger had drifted. The cleanup sweep does
+not walk the directories: it deletes what is due on the temp file
+registry's deadline heap and reports each deletion to the ledger.
+
+Admission reserves the bytes a request is expected to write before it
+starts, so requests admitted at the same time cannot together overrun the
+volume: a request is only admitted if the stored bytes, the outstanding
+reservations and its own estimate fit. A reservation is charged to the
+client that made it. When the work is done, the reservation is settled to
+the actual size of what was kept, which then counts against the client's
+quota until it is released along with the files.
+"""
+import logging
+import os
+import time
+from threading import Lock
+from typing import Iterable, Optional
+
+# How often the ledger is checked against the directory contents
+RECONCILE_INTERVAL_MINUTES = 5
+
+logger = logging.getLogger(__name__)
+
+
+class DiskReservation:
+    """
+    Bytes set aside for a request, obtained from DiskUsageLedger.reserve().
+
+    Until settle() the reservation holds back its estimate from everyone
+    else. Afterwards the written files count themselves, and only the
+    client's quota stays charged until release().
+    """
+
+    def __init__(self, ledger: "DiskUsageLedger", client_id: str, nbytes: int):
+        self.client_id = client_id
+        self.reserved = nbytes
+        self.charged = nbytes
+        self._ledger = ledger
+
+    def settle(self, actual: int):
+        """Replace the estimate with the size of the files that were kept."""
+        self._ledger._settle(self, actual)
+
+    def release(self):
+        """Give up the reservation, e.g. once its files are deleted."""
+        self._ledger._settle(self, 0)
+
+
+class DiskUsageLedger:
+    """Thread-safe map of file path to size, with a running total."""
+
+    def __init__(self):
+        self._files: dict[str, int] = {}
+        self._total = 0
+        self._reservations: set[DiskReservation] = set()
+        self._directories: Optional[tuple[str, ...]] = None
+        self._roots: tuple[str, ...] = ()
+        self._reconciled_at: Optional[float] = None
+        self._last_drift = 0
+        self._lock = Lock()
+
+    def _covers(self, path: str) -> bool:
+        """Whether path lies in one of the ledger's directories."""
+        return any(path.startswith(root) for root in self._roots)
+
+    def record(self, path: str, size: Optional[int] = None):
+        """
+        Record that a file was written or has grown.
+
+        Args:
+            path: The file
+            size: Its current size; the file is stat'ed when omitted
+        """
+        path = os.path.abspath(path)
+        if not self._covers(path):
+            return
+        if size is None:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                return
+        with self._lock:
+            self._total += size - self._files.get(path, 0)
+            self._files[path] = size
+
+    def forget(self, path: str):
+        """Record that a file, or a directory with everything in it, is gone."""
+        path = os.path.abspath(path)
+        if not self._covers(path):
+            return
+        prefix = path + os.sep
+        with self._lock:
+            if path in self._files:
+                self._total -= self._files.pop(path)
+                return
+            for name in [name for name in self._files if name.startswith(prefix)]:
+                self._total -= self._files.pop(name)
+
+    def usage(self, directories: Iterable[str]) -> int:
+        """
+        Return the bytes stored in directories.
+
+        The ledger is built on first use, and rebuilt when asked about other
+        directories than before; otherwise this is a lookup.
+        """
+        if tuple(directories) != self._directories:
+            return self.reconcile(directories)
+        return self._total
+
+    def reconcile(self, directories: Optional[Iterable[str]] = None) -> int:
+        """
+        Rebuild the ledger from the directory contents.
+
+        Args:
+            directories: Directories to account for; defaults to the current
+
+        Returns:
+            The bytes stored in the directories
+        """
+        if directories is None:
+            directories = self._directories or ()
+        directories = tuple(directories)
+        files: dict[str, int] = {}
+        for directory in directories:
+            for dirpath, _, filenames in os.walk(directory):
+                for filename in filenames:
+                    path = os.path.abspath(os.path.join(dirpath, filename))
+                    try:
+                        files[path] = os.path.getsize(path)
+                    except OSError:
+                        # Deleted while walking
+                        continue
+        total = sum(files.values())
+        with self._lock:
+            drift = total - self._total
+            known = self._directories == directories
+            self._files = files
+            self._total = total
+            self._directories = directories
+            self._roots = tuple(
+                os.path.abspath(directory) + os.sep for directory in directories
+            )
+            self._reconciled_at = time.time()
+            self._last_drift = drift if known else 0
+        if known and drift:
+            logger.info(f"Disk usage ledger was off by {drift} bytes; corrected")
+        return total
+
+    def reserve(
+        self, client_id: str, nbytes: int, limit: int, client_limit: int
+    ) -> Optional[DiskReservation]:
+        """
+        Set aside nbytes for a client if they fit.
+
+        The ledger must have been built (see usage()) for limit to be
+        checked against the stored bytes.
+
+        Args:
+            client_id: Who the bytes are charged to
+            nbytes: Estimated bytes the request will write
+            limit: Most bytes stored and reserved at once
+            client_limit: Most bytes charged to one client at once
+
+        Returns:
+            The reservation, or None if it does not fit
+        """
+        with self._lock:
+            reserved = sum(r.reserved for r in self._reservations)
+            charged = sum(
+                r.charged for r in self._reservations if r.client_id == client_id
+            )
+            if charged + nbytes > client_limit:
+                return None
+            if self._total + reserved + nbytes > limit:
+                return None
+            reservation = DiskReservation(self, client_id, nbytes)
+            self._reservations.add(reservation)
+        return reservation
+
+    def _settle(self, reservation: DiskReservation, actual: int):
+        with self._lock:
+            reservation.reserved = 0
+            reservation.charged = actual
+            if actual:
+                self._reservations.add(reservation)
+            else:
+                self._reservations.discard(reservation)
+
+    def reserved(self) -> int:
+        """Return the bytes reserved for requests still writing."""
+        with self._lock:
+            return sum(r.reserved for r in self._reservations)
+
+    def client_usage(self, client_id: str) -> int:
+        """Return the bytes charged to a client."""
+        with self._lock:
+            return sum(
+                r.charged for r in self._reservations if r.client_id == client_id
+            )
+
+    def stats(self) -> dict:
+        """Return the tracked total, file count and the last correction."""
+        with self._lock:
+            return {
+                "bytes": self._total,
+                "reserved": sum(r.reserved for r in self._reservations),
+                "reservations": len(self._reservations),
+                "files": len(self._files),
+                "reconciled_at": self._reconciled_at,
+                "last_drift": self._last_drift,
+            }
+
+
+disk_usage = DiskUsageLedger()
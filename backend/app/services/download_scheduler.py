@@ -0,0 +1,219 @@
+"""
+Process-wide scheduler for YouTube downloads.
+
+All downloads, whether single files or playlist videos, share one fixed
+budget of worker threads. Waiting work is queued per client and dispatched
+round-robin across clients, so one user's 50-video playlist cannot starve
+everyone else. A job can additionally cap how many of its own tasks run at
+once, and a global concurrency limit below the number of workers can be set
+at runtime (see app.services.concurrency).
+"""
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "6"))
+
+
+@dataclass
+class _Task:
+    client_id: str
+    job_id: Optional[str]
+    fn: Callable
+    args: tuple
+    kwargs: dict
+    future: Future = field(default_factory=Future)
+
+
+class DownloadScheduler:
+    """
+    Fixed-size worker pool with per-client fair queuing.
+
+    Args:
+        max_workers: Number of downloads that run at the same time
+    """
+
+    def __init__(self, max_workers: int = DOWNLOAD_WORKERS):
+        self.max_workers = max_workers
+        # Client queues in round-robin order; the next client to serve is first
+        self._queues: OrderedDict[str, deque[_Task]] = OrderedDict()
+        self._job_limits: dict[str, int] = {}
+        self._job_running: dict[str, int] = {}
+        self._running = 0
+        self._limit = max_workers
+        self._condition = threading.Condition()
+        self._workers: list[threading.Thread] = []
+        self._shutdown = False
+
+    def _start_workers(self):
+        """Start the worker threads on first use. Caller must hold the lock."""
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(
+                target=self._work,
+                name=f"download-worker-{len(self._workers)}",
+                daemon=True,
+            )
+            self._workers.append(worker)
+            worker.start()
+
+    def set_job_limit(self, job_id: str, limit: int):
+        """Cap how many tasks of a job may run at the same time."""
+        with self._condition:
+            self._job_limits[job_id] = max(1, limit)
+            self._condition.notify_all()
+
+    def set_concurrency_limit(self, limit: int):
+        """Cap how many tasks run at once, between 1 and max_workers."""
+        with self._condition:
+            self._limit = min(self.max_workers, max(1, limit))
+            self._condition.notify_all()
+
+    def is_backlogged(self) -> bool:
+        """Whether tasks are waiting because every allowed slot is busy."""
+        with self._condition:
+            return self._running >= self._limit and any(self._queues.values())
+
+    def clear_job(self, job_id: str):
+        """Forget the per-job limit once a job has finished."""
+        with self._condition:
+            self._job_limits.pop(job_id, None)
+            self._job_running.pop(job_id, None)
+
+    def submit(
+        self,
+        client_id: str,
+        fn: Callable,
+        *args,
+        job_id: Optional[str] = None,
+        **kwargs,
+    ) -> Future:
+        """
+        Queue fn(*args, **kwargs) for a client.
+
+        Args:
+            client_id: Identifies the requester for fair queuing (e.g. its IP)
+            fn: The blocking download function
+            job_id: Optional job the task belongs to, for per-job limits
+
+        Returns:
+            A Future for the result; cancelling it drops the task if it has
+            not started yet
+        """
+        task = _Task(client_id, job_id, fn, args, kwargs)
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Download scheduler has been shut down")
+            self._start_workers()
+            self._queues.setdefault(client_id, deque()).append(task)
+            self._condition.notify()
+        return task.future
+
+    def _job_has_capacity(self, task: _Task) -> bool:
+        if task.job_id is None or task.job_id not in self._job_limits:
+            return True
+        return self._job_running.get(task.job_id, 0) < self._job_limits[task.job_id]
+
+    def _next_task(self) -> Optional[_Task]:
+        """Pick the next runnable task round-robin. Caller must hold the lock."""
+        if self._running >= self._limit:
+            return None
+        for client_id in list(self._queues):
+            queue = self._queues[client_id]
+            # Drop tasks that were cancelled while waiting
+            while queue and queue[0].future.cancelled():
+                queue.popleft()
+            task = next((t for t in queue if self._job_has_capacity(t)), None)
+            if task is None:
+                if not queue:
+                    del self._queues[client_id]
+                continue
+            queue.remove(task)
+            # Serve this client again only after every other waiting client
+            if queue:
+                self._queues.move_to_end(client_id)
+            else:
+                del self._queues[client_id]
+            return task
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                task = None
+                while not self._shutdown:
+                    task = self._next_task()
+                    if task is not None:
+                        break
+                    self._condition.wait()
+                if task is None:
+                    return
+                if not task.future.set_running_or_notify_cancel():
+                    continue
+                self._running += 1
+                if task.job_id is not None:
+                    self._job_running[task.job_id] = (
+                        self._job_running.get(task.job_id, 0) + 1
+                    )
+
+            try:
+                result = task.fn(*task.args, **task.kwargs)
+            except BaseException as e:
+                task.future.set_exception(e)
+            else:
+                task.future.set_result(result)
+            finally:
+                with self._condition:
+                    self._running -= 1
+                    if task.job_id in self._job_running:
+                        self._job_running[task.job_id] -= 1
+                    self._condition.notify_all()
+
+    def queue_position(self, future: Future) -> Optional[int]:
+        """
+        Return how many queued tasks will be dispatched before this one.
+
+        Assumes round-robin dispatch from the current state. Returns None if
+        the task is running, finished or unknown.
+        """
+        with self._condition:
+            order = list(self._queues.items())
+            for rank, (client_id, queue) in enumerate(order):
+                for index, task in enumerate(queue):
+                    if task.future is not future:
+                        continue
+                    ahead = index
+                    for other_rank, (_, other_queue) in enumerate(order):
+                        if other_rank == rank:
+                            continue
+                        # Clients ahead in the rotation get one extra turn
+                        turns = index + 1 if other_rank < rank else index
+                        ahead += min(len(other_queue), turns)
+                    return ahead
+        return None
+
+    def stats(self) -> dict:
+        """Return the worker budget and current load."""
+        with self._condition:
+            return {
+                "max_workers": self.max_workers,
+                "concurrency_limit": self._limit,
+                "running": self._running,
+                "queued": sum(len(queue) for queue in self._queues.values()),
+                "waiting_clients": len(self._queues),
+            }
+
+    def shutdown(self):
+        """Stop the workers once their current tasks finish; cancel queued ones."""
+        with self._condition:
+            self._shutdown = True
+            for queue in self._queues.values():
+                for task in queue:
+                    task.future.cancel()
+            self._queues.clear()
+            self._condition.notify_all()
+
+
+download_scheduler = DownloadScheduler()
@@ -0,0 +1,165 @@
+"""
+Bounded thread pools for running blocking work from async endpoints.
+
+yt-dlp extraction and downloads are synchronous and can take minutes. Calling
+them directly from an ``async def`` endpoint freezes the event loop, and with
+it every other request on the worker. Each pool here caps how much of one kind
+of work runs at once, bounds how long a request waits for a free slot, and
+bounds how long it waits for the result.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+
+# Marks the end of a streamed iteration
+_END = object()
+
+
+class WorkPoolBusyError(Exception):
+    """No slot became free in time; the caller should retry later."""
+
+
+class WorkPoolTimeoutError(Exception):
+    """The work did not finish within the pool's timeout."""
+
+
+class BlockingWorkPool:
+    """
+    Thread pool with a concurrency cap and timeouts for async callers.
+
+    A slot stays taken until the blocking call really returns, even if the
+    awaiting request already gave up, so a pool never runs more than
+    max_workers calls at once.
+
+    Args:
+        name: Pool name, used for thread names and error messages
+        max_workers: Maximum number of calls running at once
+        timeout: Seconds a caller waits for the result
+        queue_timeout: Seconds a caller waits for a free slot
+    """
+
+    def __init__(
+        self, name: str, max_workers: int, timeout: float, queue_timeout: float = 10
+    ):
+        self.name = name
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"{name}-pool"
+        )
+        self._slots = asyncio.Semaphore(max_workers)
+        self.active = 0
+
+    async def _acquire_slot(self) -> Callable:
+        """Wait for a free slot; returns the callback that frees it again."""
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise WorkPoolBusyError(f"The {self.name} pool is busy")
+
+        loop = asyncio.get_running_loop()
+        self.active += 1
+
+        def _release():
+            self.active -= 1
+            self._slots.release()
+
+        def release(_future):
+            try:
+                loop.call_soon_threadsafe(_release)
+            except RuntimeError:
+                # The requesting event loop is gone; nobody is waiting on it
+                _release()
+
+        return release
+
+    def _timeout_error(self) -> WorkPoolTimeoutError:
+        return WorkPoolTimeoutError(
+            f"The {self.name} operation timed out after {self.timeout:g}s"
+        )
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the pool and return its result.
+
+        Raises:
+            WorkPoolBusyError: If no slot became free within queue_timeout
+            WorkPoolTimeoutError: If the call did not finish within timeout
+        """
+        release = await self._acquire_slot()
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(release)
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)), timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            raise self._timeout_error()
+
+    async def stream(self, fn: Callable[..., Iterable], *args, **kwargs):
+        """
+        Iterate fn(*args, **kwargs) on the pool, yielding items as they arrive.
+
+        The slot stays taken until the iteration on the thread ends. If the
+        caller stops consuming early, the thread stops at its next item.
+
+        Raises:
+            WorkPoolBusyError: If no slot became free within queue_timeout
+            WorkPoolTimeoutError: If the iteration did not end within timeout
+        """
+        release = await self._acquire_slot()
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stopped = threading.Event()
+
+        def put(item, error=None):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+            except RuntimeError:
+                # The consuming event loop is gone
+                stopped.set()
+
+        def produce():
+            try:
+                for item in fn(*args, **kwargs):
+                    if stopped.is_set():
+                        return
+                    put(item)
+            except Exception as e:
+                put(_END, e)
+            else:
+                put(_END)
+
+        future = self._executor.submit(produce)
+        future.add_done_callback(release)
+        deadline = loop.time() + self.timeout
+        try:
+            while True:
+                try:
+                    item, error = await asyncio.wait_for(
+                        queue.get(), timeout=max(0, deadline - loop.time())
+                    )
+                except asyncio.TimeoutError:
+                    raise self._timeout_error()
+                if item is _END:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            stopped.set()
+
+    def stats(self) -> dict:
+        """Return the pool's capacity and current load."""
+        return {
+            "name": self.name,
+            "max_workers": self.max_workers,
+            "active": self.active,
+        }
+
+
+# One pool per metadata endpoint; downloads go through the download scheduler
+info_pool = BlockingWorkPool("info", max_workers=8, timeout=30)
+playlist_info_pool = BlockingWorkPool("playlist-info", max_workers=4, timeout=120)
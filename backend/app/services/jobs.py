@@ -0,0 +1,299 @@
+"""
+In-process registry for background job state.
+
+Job producers (e.g. the YouTube playlist downloader) publish state here and
+progress endpoints read it back. Every published state is a fresh dict that is
+never mutated afterwards, so readers get a consistent snapshot from a single
+dictionary lookup without taking the lock or touching the disk.
+
+Readers that want push updates (e.g. the Server-Sent Events progress stream)
+can subscribe to a job and receive every published state and producer event
+on an asyncio queue, instead of polling.
+
+A job can be asked to cancel. The registry only carries the request, as a
+thread-safe event the producer checks; the producer stops its own work and
+publishes the final "cancelled" state.
+
+Durability is optional: when ``JOB_REGISTRY_DB`` is set, every write is also
+persisted to a SQLite database in WAL mode and reloaded on startup. Producers
+can also store a private checkpoint per job (what the job was asked to do and
+how far it got), which is never shown to readers. A job that was still running
+when the process stopped can be resumed from its checkpoint.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from threading import Event, Lock
+from typing import Optional
+
+TERMINAL_STATUSES = frozenset({"complete", "error", "cancelled"})
+JOB_RETENTION_SECONDS = 7200  # Keep finished jobs for 2 hours, like temp files
+
+logger = logging.getLogger(__name__)
+
+
+class JobRegistry:
+    """Thread-safe mapping of job_id to the latest published job state."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self._jobs: dict[str, dict] = {}
+        self._updated_at: dict[str, float] = {}
+        self._subscribers: dict[
+            str, list[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]
+        ] = {}
+        self._cancel_events: dict[str, Event] = {}
+        self._last_seen: dict[str, float] = {}
+        self._checkpoints: dict[str, dict] = {}
+        self._lock = Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._open_db(db_path)
+
+    @property
+    def durable(self) -> bool:
+        """Whether jobs are persisted and outlive the process."""
+        return self._db is not None
+
+    def _open_db(self, db_path: str):
+        """Open (or create) the SQLite backing store and load persisted jobs."""
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "job_id TEXT PRIMARY KEY, checkpoint TEXT NOT NULL)"
+        )
+        self._db.commit()
+        for job_id, state, updated_at in self._db.execute(
+            "SELECT job_id, state, updated_at FROM jobs"
+        ):
+            self._jobs[job_id] = json.loads(state)
+            self._updated_at[job_id] = updated_at
+        for job_id, checkpoint in self._db.execute(
+            "SELECT job_id, checkpoint FROM checkpoints"
+        ):
+            self._checkpoints[job_id] = json.loads(checkpoint)
+        logger.info(f"Loaded {len(self._jobs)} job(s) from {db_path}")
+
+    def _persist(self, job_id: str, state: Optional[dict], updated_at: float):
+        """Write a state change through to SQLite. Caller must hold the lock."""
+        finished = state is None or state.get("status") in TERMINAL_STATUSES
+        if finished:
+            # A finished or forgotten job is never resumed
+            self._checkpoints.pop(job_id, None)
+        if self._db is None:
+            return
+        try:
+            if state is None:
+                self._db.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+            else:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO jobs (job_id, state, updated_at) "
+                    "VALUES (?, ?, ?)",
+                    (job_id, json.dumps(state), updated_at),
+                )
+            if finished:
+                self._db.execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error persisting job {job_id}: {e}")
+
+    def save_checkpoint(self, job_id: str, checkpoint: dict):
+        """
+        Store the private resume information of a running job.
+
+        The checkpoint is not part of the published state. It is dropped once
+        the job reaches a terminal status or is forgotten.
+        """
+        snapshot = json.loads(json.dumps(checkpoint))
+        with self._lock:
+            self._checkpoints[job_id] = snapshot
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO checkpoints (job_id, checkpoint) "
+                    "VALUES (?, ?)",
+                    (job_id, json.dumps(snapshot)),
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error persisting checkpoint of job {job_id}: {e}")
+
+    def get_checkpoint(self, job_id: str) -> Optional[dict]:
+        """Return the last checkpoint of a job, or None if it has none."""
+        return self._checkpoints.get(job_id)
+
+    def interrupted_jobs(self) -> list[str]:
+        """Return the IDs of jobs that have not finished, e.g. after a restart."""
+        with self._lock:
+            return [
+                job_id
+                for job_id, state in self._jobs.items()
+                if state.get("status") not in TERMINAL_STATUSES
+            ]
+
+    def _notify(self, job_id: str, event: str, data: dict):
+        """Hand an event to every subscriber of a job, from any thread."""
+        for loop, queue in list(self._subscribers.get(job_id, ())):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+            except RuntimeError:
+                # The subscriber's event loop has been closed
+                self.unsubscribe(job_id, queue)
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """
+        Subscribe to state changes and events of a job.
+
+        Must be called from a running event loop. Every item put on the
+        returned queue is an (event, data) tuple; state changes use the
+        "progress" event with the new state snapshot as data.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append((loop, queue))
+            self._last_seen[job_id] = time.time()
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        """Stop delivering events for a job to the given queue."""
+        with self._lock:
+            subscribers = [
+                entry
+                for entry in self._subscribers.get(job_id, ())
+                if entry[1] is not queue
+            ]
+            if subscribers:
+                self._subscribers[job_id] = subscribers
+            else:
+                self._subscribers.pop(job_id, None)
+            self._last_seen[job_id] = time.time()
+
+    def touch(self, job_id: str):
+        """Record that a client is still following a job (e.g. by polling)."""
+        with self._lock:
+            self._last_seen[job_id] = time.time()
+
+    def is_watched_since(self, job_id: str, since: float) -> bool:
+        """Whether a client subscribes to the job or has looked at it since."""
+        with self._lock:
+            return bool(self._subscribers.get(job_id)) or (
+                self._last_seen.get(job_id, 0) > since
+            )
+
+    def cancel_event(self, job_id: str) -> Event:
+        """Return the event that is set once cancelling the job is requested."""
+        with self._lock:
+            return self._cancel_events.setdefault(job_id, Event())
+
+    def request_cancel(self, job_id: str) -> bool:
+        """
+        Ask the producer of a job to stop.
+
+        Returns:
+            False if the job is unknown or already finished
+        """
+        state = self._jobs.get(job_id)
+        if state is None or state.get("status") in TERMINAL_STATUSES:
+            return False
+        self.cancel_event(job_id).set()
+        logger.info(f"Cancellation requested for job {job_id}")
+        return True
+
+    def notify(self, job_id: str, event: str, data: dict):
+        """Publish a producer event (e.g. a finished video) without changing state."""
+        self._notify(job_id, event, data)
+
+    def set(self, job_id: str, state: dict) -> dict:
+        """
+        Replace the state of a job.
+
+        Args:
+            job_id: The job identifier
+            state: The complete new state; it must contain a "status" key
+
+        Returns:
+            The published state snapshot
+        """
+        snapshot = dict(state)
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = snapshot
+            self._updated_at[job_id] = now
+            self._persist(job_id, snapshot, now)
+        self._notify(job_id, "progress", snapshot)
+        return snapshot
+
+    def update(self, job_id: str, persist: bool = True, **changes) -> dict:
+        """
+        Merge changes into the current state of a job.
+
+        Args:
+            job_id: The job identifier
+            persist: Write the state to the database. Frequent transient
+                changes (e.g. byte progress) are only published; the next
+                persisted write stores them along with the rest.
+
+        Returns:
+            The published state snapshot
+        """
+        now = time.time()
+        with self._lock:
+            snapshot = {**self._jobs.get(job_id, {}), **changes}
+            self._jobs[job_id] = snapshot
+            self._updated_at[job_id] = now
+            if persist:
+                self._persist(job_id, snapshot, now)
+        self._notify(job_id, "progress", snapshot)
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Return the latest state snapshot of a job, or None if unknown."""
+        return self._jobs.get(job_id)
+
+    def remove(self, job_id: str):
+        """Forget a job."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._updated_at.pop(job_id, None)
+            self._cancel_events.pop(job_id, None)
+            self._last_seen.pop(job_id, None)
+            self._persist(job_id, None, time.time())
+
+    def prune(self, max_age: int = JOB_RETENTION_SECONDS) -> int:
+        """
+        Forget finished jobs whose last update is older than max_age seconds.
+
+        Returns:
+            Number of jobs removed
+        """
+        cutoff = time.time() - max_age
+        with self._lock:
+            expired = [
+                job_id
+                for job_id, state in self._jobs.items()
+                if state.get("status") in TERMINAL_STATUSES
+                and self._updated_at.get(job_id, 0) < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+                self._updated_at.pop(job_id, None)
+                self._cancel_events.pop(job_id, None)
+                self._last_seen.pop(job_id, None)
+                self._persist(job_id, None, time.time())
+        return len(expired)
+
+
+job_registry = JobRegistry(os.getenv("JOB_REGISTRY_DB"))
@@ -0,0 +1,186 @@
+"""
+Pipe ffmpeg output straight into an HTTP response.
+
+A piped download reads the media from YouTube and writes the requested format
+to ffmpeg's stdout, which is relayed to the client chunk by chunk. The client
+gets the first bytes within seconds instead of after the whole file was
+downloaded (and, for mp4, merged), and nothing is written to temp_downloads.
+The price is that a piped response has no Content-Length and cannot be
+resumed or served again; the regular download path still offers both.
+"""
+import asyncio
+import logging
+import os
+from threading import Lock
+from typing import AsyncIterator, Callable, Optional
+
+from app.services.transcoder import TranscodeError
+
+# Piped downloads running at once; each one holds an ffmpeg process
+MAX_MEDIA_PIPES = int(os.getenv("YOUTUBE_MAX_STREAMS", "4"))
+PIPE_CHUNK_SIZE = 64 * 1024
+# Longest wait for ffmpeg to produce its first bytes
+FIRST_CHUNK_TIMEOUT_SECONDS = 60
+# Bytes of ffmpeg's stderr kept to report why it failed
+STDERR_TAIL_BYTES = 4096
+
+logger = logging.getLogger(__name__)
+
+_active_pipes = 0
+_slots_lock = Lock()
+
+
+class MediaPipeBusyError(Exception):
+    """Too many piped downloads are running; the caller should retry later."""
+
+
+class MediaPipe:
+    """
+    A running ffmpeg process whose stdout is relayed as the response body.
+
+    Obtain one with open_media_pipe(). Iterating chunks() yields the output
+    and always ends the process, including when the client disconnects.
+    """
+
+    def __init__(
+        self,
+        process: asyncio.subprocess.Process,
+        first_chunk: bytes,
+        throttle: Optional[Callable[[int], float]] = None,
+        stderr_tail: Optional[bytearray] = None,
+        stderr_task: Optional[asyncio.Task] = None,
+    ):
+        self._process = process
+        self._first_chunk = first_chunk
+        self._stderr_tail = stderr_tail if stderr_tail is not None else bytearray()
+        self._stderr_task = stderr_task
+        self._throttle = throttle
+        self._closed = False
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """Yield ffmpeg's output until it ends, then end the process."""
+        try:
+            chunk = self._first_chunk
+            while chunk:
+                yield chunk
+                if self._throttle is not None:
+                    delay = self._throttle(len(chunk))
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                chunk = await self._process.stdout.read(PIPE_CHUNK_SIZE)
+            await self._process.wait()
+            if self._process.returncode != 0:
+                # Headers are long sent; the client sees a truncated file
+                if self._stderr_task is not None:
+                    await self._stderr_task
+                message = self._stderr_tail.decode(errors="replace").strip()
+                logger.warning(
+                    f"ffmpeg exited with {self._process.returncode} while piping: "
+                    f"{message[-500:]}"
+                )
+        finally:
+            await self.close()
+
+    async def close(self):
+        """Kill ffmpeg if it is still running and free the pipe slot."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self._process.returncode is None:
+                self._process.kill()
+                await self._process.wait()
+            if self._stderr_task is not None:
+                self._stderr_task.cancel()
+        finally:
+            _release_slot()
+
+
+def _acquire_slot():
+    global _active_pipes
+    with _slots_lock:
+        if _active_pipes >= MAX_MEDIA_PIPES:
+            raise MediaPipeBusyError("Too many streamed downloads are running")
+        _active_pipes += 1
+
+
+def _release_slot():
+    global _active_pipes
+    with _slots_lock:
+        _active_pipes = max(0, _active_pipes - 1)
+
+
+async def _drain_stderr(stream: asyncio.StreamReader, tail: bytearray):
+    """Read stderr until it ends, keeping its last STDERR_TAIL_BYTES."""
+    while True:
+        chunk = await stream.read(PIPE_CHUNK_SIZE)
+        if not chunk:
+            return
+        tail += chunk
+        del tail[:-STDERR_TAIL_BYTES]
+
+
+def active_pipes() -> int:
+    """Return the number of piped downloads running."""
+    return _active_pipes
+
+
+async def open_media_pipe(
+    command: list[str], throttle: Optional[Callable[[int], float]] = None
+) -> MediaPipe:
+    """
+    Start ffmpeg and wait for its first bytes.
+
+    Waiting for output before answering lets a failure (e.g. an unavailable
+    format) still be reported as an HTTP error instead of an empty file.
+
+    Args:
+        command: ffmpeg command writing to pipe:1
+        throttle: Called with the size of every relayed chunk; returns the
+            seconds to pause before reading the next one
+
+    Raises:
+        MediaPipeBusyError: If MAX_MEDIA_PIPES pipes are running already
+        TranscodeError: If ffmpeg is missing or ends without any output
+    """
+    _acquire_slot()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        _release_slot()
+        raise TranscodeError("ffmpeg is not installed")
+    except BaseException:
+        _release_slot()
+        raise
+
+    # stderr is read all along: a full pipe would block ffmpeg mid-stream
+    stderr_tail = bytearray()
+    stderr_task = asyncio.create_task(_drain_stderr(process.stderr, stderr_tail))
+
+    async def abort():
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        stderr_task.cancel()
+        _release_slot()
+
+    try:
+        first_chunk = await asyncio.wait_for(
+            process.stdout.read(PIPE_CHUNK_SIZE), timeout=FIRST_CHUNK_TIMEOUT_SECONDS
+        )
+        if not first_chunk:
+            await process.wait()
+            await stderr_task
+            message = stderr_tail.decode(errors="replace").strip()
+            raise TranscodeError(
+                f"ffmpeg failed: {message[-500:] or process.returncode}"
+            )
+    except BaseException:
+        await abort()
+        raise
+    return MediaPipe(process, first_chunk, throttle, stderr_tail, stderr_task)
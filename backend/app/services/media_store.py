@@ -0,0 +1,325 @@
+"""
+Content-addressed store for downloaded YouTube media.
+
+Files are keyed by (video_id, format, quality), so a popular video that is
+requested again is served from disk without another extraction or ffmpeg run.
+Concurrent requests for the same key share a single download, and every user
+of a file holds a reference so it is never deleted while being served.
+Eviction is driven by the cleanup service. Playlist tracks are the exception:
+they are deleted as soon as they are in their ZIP, so a playlist does not
+take twice its size on disk.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Optional, Union
+
+from app.services.disk_usage import disk_usage
+
+MEDIA_DIR = os.path.join("temp_downloads", "media")
+MEDIA_TTL_SECONDS = 7200  # Unused files expire after 2 hours, like other temp files
+# A reference held longer than this is assumed to be leaked (e.g. by a
+# response that never completed) and no longer protects its file
+MAX_REFERENCE_SECONDS = 6 * 3600
+
+logger = logging.getLogger(__name__)
+
+MediaKey = tuple[str, str, str]
+
+
+@dataclass
+class MediaEntry:
+    key: MediaKey
+    path: str
+    size: int
+    metadata: dict
+    created_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+    refs: int = 0
+
+
+class MediaStore:
+    """
+    Reference-counted, single-flight cache of media files on disk.
+
+    Args:
+        root: Directory the media files live in
+        ttl: Seconds an unreferenced file is kept after its last use
+    """
+
+    def __init__(self, root: str = MEDIA_DIR, ttl: float = MEDIA_TTL_SECONDS):
+        self.root = root
+        self.ttl = ttl
+        self._entries: dict[MediaKey, MediaEntry] = {}
+        self._inflight: dict[MediaKey, Future] = {}
+        self._lock = Lock()
+
+    def _content_path(self, key: MediaKey, ext: str) -> str:
+        digest = hashlib.sha256("|".join(key).encode()).hexdigest()[:32]
+        return os.path.join(self.root, f"{digest}{ext}")
+
+    def _acquire_locked(self, key: MediaKey) -> Optional[MediaEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if not os.path.exists(entry.path):
+            # Removed behind our back; forget it and download again
+            del self._entries[key]
+            return None
+        entry.refs += 1
+        entry.last_used = time.time()
+        return entry
+
+    def acquire_cached(self, key: MediaKey) -> Optional[MediaEntry]:
+        """Take a reference to a stored file without producing it on a miss."""
+        with self._lock:
+            return self._acquire_locked(key)
+
+    def adopt(self, key: MediaKey, path: str, metadata: dict) -> Optional[MediaEntry]:
+        """
+        Register a file stored by a previous process, e.g. before a restart.
+
+        The file must be at the content path of key. No reference is taken.
+
+        Returns:
+            The entry for key, or None if the file does not exist
+        """
+        if os.path.abspath(path) != os.path.abspath(
+            self._content_path(key, os.path.splitext(path)[1])
+        ):
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and os.path.exists(entry.path):
+                return entry
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                return None
+            entry = MediaEntry(key=key, path=path, size=size, metadata=metadata)
+            self._entries[key] = entry
+        logger.info(f"Adopted media {key} at {path}")
+        return entry
+
+    def clear_staging(self) -> int:
+        """
+        Remove staging directories left behind by a previous process.
+
+        Must only be called before any reservation is made.
+
+        Returns:
+            Number of directories removed
+        """
+        if not os.path.isdir(self.root):
+            return 0
+        removed = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".staging-") and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+                disk_usage.forget(path)
+                removed += 1
+        return removed
+
+    def reserve(self, key: MediaKey) -> Union[MediaEntry, Future, "MediaReservation"]:
+        """
+        Claim the right to produce the file for key, unless it exists already.
+
+        Returns one of:
+            MediaEntry: The file is stored; a reference was taken
+            Future: Another caller is producing it; resolves once it is done
+                (or raises its error), after which the caller should retry
+            MediaReservation: The caller must produce the file and then call
+                commit() or fail() on the reservation
+
+        This lets the production of a file span several stages and threads,
+        e.g. a download on one pool followed by a transcode on another.
+        """
+        with self._lock:
+            entry = self._acquire_locked(key)
+            if entry is not None:
+                return entry
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            future = Future()
+            self._inflight[key] = future
+
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            staging_dir = tempfile.mkdtemp(prefix=".staging-", dir=self.root)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        return MediaReservation(self, key, future, staging_dir)
+
+    def _finish(
+        self,
+        key: MediaKey,
+        future: Future,
+        entry: Optional[MediaEntry] = None,
+        error: Optional[BaseException] = None,
+    ):
+        with self._lock:
+            if entry is not None:
+                entry.refs = 1
+                self._entries[key] = entry
+            del self._inflight[key]
+        if entry is not None:
+            future.set_result(entry)
+            logger.info(f"Stored media {key} at {entry.path} ({entry.size} bytes)")
+        else:
+            future.set_exception(error)
+
+    def release(self, entry: MediaEntry, keep: bool = True):
+        """
+        Drop a reference taken by reserve() or acquire_cached().
+
+        Args:
+            entry: The referenced file
+            keep: False deletes the file right away unless someone else
+                still holds a reference, e.g. once a playlist track has been
+                copied into its ZIP and a cached copy would only double it
+        """
+        with self._lock:
+            entry.refs = max(0, entry.refs - 1)
+            entry.last_used = time.time()
+            if not keep and entry.refs == 0 and self._entries.get(entry.key) is entry:
+                self._evict_locked(entry)
+
+    def _evict_locked(self, entry: MediaEntry) -> int:
+        self._entries.pop(entry.key, None)
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Error deleting media file {entry.path}: {e}")
+            return 0
+        disk_usage.forget(entry.path)
+        logger.info(f"Evicted media {entry.key} ({entry.size} bytes)")
+        return entry.size
+
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        """
+        Delete unreferenced files not used within the TTL, and files left in
+        the media directory that the store does not know about (e.g. from
+        before a restart). Staging directories belong to downloads in
+        progress, however long they take; clear_staging() removes the ones
+        left over at startup.
+
+        Returns:
+            Number of bytes freed
+        """
+        now = now or time.time()
+        cutoff = now - self.ttl
+        stale_reference_cutoff = now - MAX_REFERENCE_SECONDS
+        freed = 0
+        with self._lock:
+            for entry in list(self._entries.values()):
+                if entry.refs and entry.last_used < stale_reference_cutoff:
+                    logger.warning(f"Dropping stale references to media {entry.key}")
+                    entry.refs = 0
+                if entry.refs == 0 and entry.last_used < cutoff:
+                    freed += self._evict_locked(entry)
+            known = {entry.path for entry in self._entries.values()}
+            if os.path.isdir(self.root):
+                for name in os.listdir(self.root):
+                    if name.startswith(".staging-"):
+                        continue
+                    path = os.path.join(self.root, name)
+                    try:
+                        if path in known or os.path.getmtime(path) >= cutoff:
+                            continue
+                        if os.path.isdir(path):
+                            shutil.rmtree(path, ignore_errors=True)
+                        else:
+                            freed += os.path.getsize(path)
+                            os.unlink(path)
+                        disk_usage.forget(path)
+                    except OSError as e:
+                        logger.error(f"Error removing orphaned media {path}: {e}")
+        return freed
+
+    def evict_lru(self, bytes_to_free: int) -> int:
+        """
+        Delete least recently used unreferenced files until enough is freed.
+
+        Returns:
+            Number of bytes freed
+        """
+        freed = 0
+        with self._lock:
+            candidates = sorted(
+                (e for e in self._entries.values() if e.refs == 0),
+                key=lambda e: e.last_used,
+            )
+            for entry in candidates:
+                if freed >= bytes_to_free:
+                    break
+                freed += self._evict_locked(entry)
+        return freed
+
+    def stats(self) -> dict:
+        """Return the number of stored files, their size and active references."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(e.size for e in self._entries.values()),
+                "referenced": sum(1 for e in self._entries.values() if e.refs),
+            }
+
+
+class MediaReservation:
+    """
+    The exclusive right to produce one media file, obtained from reserve().
+
+    Exactly one of commit() or fail() must be called; either one removes the
+    staging directory and wakes up callers waiting for the file.
+    """
+
+    def __init__(self, store: MediaStore, key: MediaKey, future: Future, staging_dir):
+        self.store = store
+        self.key = key
+        self.staging_dir = staging_dir
+        self._future = future
+        self._finished = False
+
+    def commit(self, produced_path: str, metadata: dict) -> MediaEntry:
+        """Move the produced file into the store and take a reference to it."""
+        if self._finished:
+            raise RuntimeError(f"Reservation for {self.key} is already finished")
+        try:
+            ext = os.path.splitext(produced_path)[1]
+            path = self.store._content_path(self.key, ext)
+            os.replace(produced_path, path)
+            entry = MediaEntry(
+                key=self.key, path=path, size=os.path.getsize(path), metadata=metadata
+            )
+        except BaseException as e:
+            self.fail(e)
+            raise
+        self._finished = True
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        disk_usage.forget(self.staging_dir)
+        disk_usage.record(path, entry.size)
+        self.store._finish(self.key, self._future, entry=entry)
+        return entry
+
+    def fail(self, error: BaseException):
+        """Give up producing the file; waiting callers receive the error."""
+        if self._finished:
+            return
+        self._finished = True
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        disk_usage.forget(self.staging_dir)
+        self.store._finish(self.key, self._future, error=error)
+
+
+media_store = MediaStore()
@@ -0,0 +1,192 @@
+"""
+TTL/LRU cache for YouTube metadata extractions.
+
+Extracting metadata with yt-dlp is a network round-trip to YouTube, and users
+repeatedly open the same popular videos and playlists. Results are cached per
+normalized video or playlist ID for a limited time, the cache is bounded in
+size with least-recently-used eviction, and concurrent misses for the same key
+are coalesced so only one extraction runs while the other callers wait for it.
+"""
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+from typing import Callable, Hashable, Optional
+from urllib.parse import parse_qs, urlparse
+
+# Stream URLs inside video metadata expire after a few hours, so keep this short
+METADATA_TTL_SECONDS = 1800
+METADATA_MAX_ENTRIES = 256
+
+_VIDEO_ID_LENGTH = 11
+_VIDEO_PATH_PREFIXES = ("/shorts/", "/embed/", "/live/", "/v/")
+
+
+def _is_video_id(value: str) -> bool:
+    return len(value) == _VIDEO_ID_LENGTH and all(
+        c.isalnum() or c in "-_" for c in value
+    )
+
+
+def parse_video_id(url: str) -> Optional[str]:
+    """
+    Extract the video ID from a YouTube URL.
+
+    Examples:
+        >>> parse_video_id("https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10")
+        'dQw4w9WgXcQ'
+        >>> parse_video_id("https://youtu.be/dQw4w9WgXcQ")
+        'dQw4w9WgXcQ'
+        >>> parse_video_id("https://www.youtube.com/playlist?list=PL123") is None
+        True
+    """
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    candidate = None
+    if host == "youtu.be" or host.endswith(".youtu.be"):
+        candidate = parsed.path.lstrip("/").split("/")[0]
+    elif host == "youtube.com" or host.endswith(".youtube.com"):
+        if parsed.path == "/watch":
+            candidate = parse_qs(parsed.query).get("v", [None])[0]
+        else:
+            for prefix in _VIDEO_PATH_PREFIXES:
+                if parsed.path.startswith(prefix):
+                    candidate = parsed.path[len(prefix) :].split("/")[0]
+                    break
+    if candidate and _is_video_id(candidate):
+        return candidate
+    return None
+
+
+def parse_playlist_id(url: str) -> Optional[str]:
+    """Extract the playlist ID (the ``list`` query parameter) from a URL."""
+    playlist_id = parse_qs(urlparse(url.strip()).query).get("list", [None])[0]
+    if playlist_id and all(c.isalnum() or c in "-_" for c in playlist_id):
+        return playlist_id
+    return None
+
+
+def video_cache_key(url: str) -> tuple:
+    """Cache key for single-video metadata of a URL."""
+    video_id = parse_video_id(url)
+    return ("video", video_id) if video_id else ("video-url", url.strip())
+
+
+def playlist_cache_key(url: str) -> tuple:
+    """Cache key for flat playlist metadata of a URL."""
+    playlist_id = parse_playlist_id(url)
+    return ("playlist", playlist_id) if playlist_id else ("playlist-url", url.strip())
+
+
+class MetadataCache:
+    """
+    Size-bounded LRU cache with per-entry TTL and single-flight loading.
+
+    Args:
+        max_entries: Number of entries kept before the least recently used
+            one is evicted
+        ttl: Seconds an entry stays valid after it was loaded
+        clock: Time source, overridable for tests
+    """
+
+    def __init__(
+        self,
+        max_entries: int = METADATA_MAX_ENTRIES,
+        ttl: float = METADATA_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, dict]] = OrderedDict()
+        self._inflight: dict[Hashable, Future] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        """Return a fresh cached value, or None."""
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key: Hashable) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: dict):
+        """Store a value, evicting the least recently used entries if full."""
+        with self._lock:
+            self._put_locked(key, value)
+
+    def _put_locked(self, key: Hashable, value: dict):
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """Drop a cached value."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every cached value."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], dict]) -> dict:
+        """
+        Return the cached value for key, loading it on a miss.
+
+        If another thread is already loading the same key, wait for its result
+        instead of starting a second load. Failed loads are not cached; the
+        exception is raised in every waiting caller.
+        """
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._put_locked(key, value)
+            del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+metadata_cache = MetadataCache()
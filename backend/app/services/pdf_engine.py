@@ -0,0 +1,449 @@
+"""
+Image to PDF conversion in a single pass, without external tools.
+
+Every image becomes one page, sized from its pixel dimensions and the
+requested DPI. JPEG files are embedded byte for byte as DCTDecode streams,
+so they are neither re-encoded nor lose quality. The compressed data of an
+opaque, non-interlaced PNG is a valid Flate stream with PNG predictors and
+is embedded as it is, too. Everything else is stored losslessly as a Flate
+stream of its decoded pixels; an alpha channel becomes a soft mask.
+
+Every image is decoded once before it is written, which is also its
+validation: a file that cannot be decoded raises InvalidImageError.
+
+Encoding a page (decoding, validating and compressing its image) is the
+expensive part and independent between pages. With more than one page it
+runs on page_pool, a process pool shared by all requests and sized to the
+host's cores; only writing the encoded pages to the file happens in order.
+"""
+import multiprocessing
+import os
+import struct
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from threading import Lock
+from typing import BinaryIO, Callable, Optional
+
+from PIL import Image
+
+# zlib level for Flate streams; higher levels cost far more time than they save
+PDF_COMPRESSION_LEVEL = 6
+
+# PDF colour space of each image mode that is embedded without conversion
+COLOR_SPACES = {"L": "/DeviceGray", "RGB": "/DeviceRGB", "CMYK": "/DeviceCMYK"}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# PNG colour types whose data PDF can use as it is: greyscale, RGB, palette
+PNG_COLOR_SPACES = {0: "/DeviceGray", 2: "/DeviceRGB"}
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1}
+
+# Processes encoding pages, shared by all conversions
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 2)))
+
+
+class InvalidImageError(ValueError):
+    """
+    Input files are not images that can be decoded.
+
+    Args:
+        failures: 1-based page number and error of every page that failed
+    """
+
+    def __init__(self, failures: list[tuple[int, str]]):
+        super().__init__(
+            "; ".join(f"page {page}: {error}" for page, error in failures)
+        )
+        self.failures = failures
+
+
+@dataclass
+class EncodedImage:
+    """A page's image as PDF streams, ready to be written."""
+
+    width: int
+    height: int
+    # Dictionary entries and data of the image stream
+    entries: str
+    data: bytes
+    # Entries and data of the soft mask, for images with transparency
+    mask: Optional[tuple[str, bytes]] = None
+
+
+def _number(value: float) -> str:
+    """Format a PDF number without superfluous digits."""
+    return f"{value:.4f}".rstrip("0").rstrip(".")
+
+
+def _pixel_data(image: Image.Image) -> tuple[Image.Image, Optional[Image.Image]]:
+    """
+    Convert an image to a mode PDF can hold, splitting off its alpha.
+
+    Returns:
+        The colour image (L, RGB or CMYK) and its alpha channel, or None if
+        it is fully opaque
+    """
+    if image.mode in ("I", "F") or image.mode.startswith("I;16"):
+        # High bit depth greyscale; PDF pages hold 8 bits per component
+        image = image.convert("I").point(lambda value: value * (1 / 256))
+        return image.convert("L"), None
+    if image.mode == "1":
+        return image.convert("L"), None
+    if image.mode in COLOR_SPACES and "transparency" not in image.info:
+        return image, None
+
+    grey = image.mode in ("L", "LA") or (
+        image.mode == "P" and image.palette and image.palette.mode == "L"
+    )
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    if not has_alpha:
+        return image.convert("L" if grey else "RGB"), None
+    image = image.convert("LA" if grey else "RGBA")
+    alpha = image.getchannel("A")
+    colour = image.convert("L" if grey else "RGB")
+    if alpha.getextrema() == (255, 255):
+        return colour, None
+    return colour, alpha
+
+
+def _png_stream(data: bytes) -> Optional[tuple[str, bytes]]:
+    """
+    Extract a PNG's compressed pixel data for use as a PDF Flate stream.
+
+    Returns:
+        The stream's dictionary entries and data, or None if the PNG is
+        interlaced, has transparency or a 16-bit or low-depth greyscale or
+        RGB format, and must be decoded instead
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        return None
+    chunks = []
+    header = None
+    palette = b""
+    offset = len(PNG_SIGNATURE)
+    while offset + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[offset : offset + 8])
+        body = data[offset + 8 : offset + 8 + length]
+        offset += 12 + length
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif kind == b"PLTE":
+            palette = body
+        elif kind == b"tRNS":
+            return None
+        elif kind == b"IDAT":
+            chunks.append(body)
+        elif kind == b"IEND":
+            break
+    if header is None or not chunks:
+        return None
+    width, _, depth, color_type, _, _, interlace = header
+    if interlace or color_type not in PNG_CHANNELS:
+        return None
+    if color_type == 3:
+        if not palette:
+            return None
+        colour_space = (
+            f"[/Indexed /DeviceRGB {len(palette) // 3 - 1} <{palette.hex()}>]"
+        )
+    elif depth == 8:
+        colour_space = PNG_COLOR_SPACES[color_type]
+    else:
+        return None
+    entries = (
+        f"/ColorSpace {colour_space} /BitsPerComponent {depth} "
+        f"/Filter /FlateDecode /DecodeParms << /Predictor 15 "
+        f"/Colors {PNG_CHANNELS[color_type]} /BitsPerComponent {depth} "
+        f"/Columns {width} >>"
+    )
+    return entries, b"".join(chunks)
+
+
+def encode_image(path: str) -> EncodedImage:
+    """
+    Decode an image, validating it, and encode it as PDF image streams.
+
+    Runs in a page_pool worker, so it only takes and returns plain data.
+
+    Raises:
+        ValueError: If the file is not a decodable image
+    """
+    try:
+        image = Image.open(path)
+        # Decoding the whole image validates it
+        image.load()
+    except Exception as e:
+        raise ValueError(f"{os.path.basename(path)}: {e}") from e
+
+    with image:
+        dimensions = f"/Width {image.width} /Height {image.height}"
+        size = f"{dimensions} /BitsPerComponent 8"
+        if image.format == "PNG":
+            with open(path, "rb") as f:
+                stream = _png_stream(f.read())
+            if stream is not None:
+                # The PNG's own compressed data, undone by PNG predictors
+                entries, data = stream
+                return EncodedImage(
+                    image.width,
+                    image.height,
+                    f"/Type /XObject /Subtype /Image {dimensions} {entries}",
+                    data,
+                )
+        if image.format == "JPEG" and image.mode in COLOR_SPACES:
+            # The file is already a DCT stream; embed it untouched
+            with open(path, "rb") as f:
+                data = f.read()
+            decode = ""
+            if image.mode == "CMYK" and "adobe" in image.info:
+                # Adobe writes CMYK JPEGs inverted
+                decode = " /Decode [1 0 1 0 1 0 1 0]"
+            return EncodedImage(
+                image.width,
+                image.height,
+                f"/Type /XObject /Subtype /Image {size} "
+                f"/ColorSpace {COLOR_SPACES[image.mode]}{decode} /Filter /DCTDecode",
+                data,
+            )
+
+        colour, alpha = _pixel_data(image)
+        mask = None
+        if alpha is not None:
+            mask = (
+                f"/Type /XObject /Subtype /Image {size} "
+                f"/ColorSpace /DeviceGray /Filter /FlateDecode",
+                zlib.compress(alpha.tobytes(), PDF_COMPRESSION_LEVEL),
+            )
+        return EncodedImage(
+            image.width,
+            image.height,
+            f"/Type /XObject /Subtype /Image {size} "
+            f"/ColorSpace {COLOR_SPACES[colour.mode]} /Filter /FlateDecode",
+            zlib.compress(colour.tobytes(), PDF_COMPRESSION_LEVEL),
+            mask,
+        )
+
+
+class PageEncodingPool:
+    """
+    Process pool encoding pages for every conversion at once.
+
+    The pool has a fixed number of processes, so concurrent conversions
+    queue for them instead of oversubscribing the cores. It starts on
+    first use; its processes are spawned rather than forked, as the server
+    process runs threads.
+
+    Args:
+        max_workers: Number of processes
+        encode: Encodes one page in a worker; a module-level function, as
+            it is pickled
+    """
+
+    def __init__(
+        self,
+        max_workers: int = PDF_WORKERS,
+        encode: Callable[[str], EncodedImage] = encode_image,
+    ):
+        self.max_workers = max_workers
+        self.encode = encode
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = Lock()
+
+    def submit(self, path: str) -> Future:
+        """Encode an image on the pool; the future holds its EncodedImage."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor.submit(self.encode, path)
+
+    def shutdown(self):
+        """Stop the processes; the pool starts again on the next submit()."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    def stats(self) -> dict:
+        """Return the pool's size and whether its processes are running."""
+        return {"max_workers": self.max_workers, "running": self._executor is not None}
+
+
+page_pool = PageEncodingPool()
+
+
+class PdfImageWriter:
+    """
+    Writes a PDF with one page per image, object by object.
+
+    Pages are written as they are added, so only one encoded image is held
+    in memory at a time. close() writes the page tree and cross-reference
+    table; abort() deletes the partial file.
+
+    Args:
+        path: The PDF to create
+    """
+
+    # Object numbers of the document catalog and the page tree, which are
+    # written last because they list the pages
+    CATALOG = 1
+    PAGES = 2
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: BinaryIO = open(path, "wb")
+        self._offsets: dict[int, int] = {}
+        self._next_object = 3
+        self._pages: list[int] = []
+        # A binary comment marks the file as binary for transfer tools
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _allocate(self) -> int:
+        number = self._next_object
+        self._next_object += 1
+        return number
+
+    def _write_object(self, number: int, dictionary: str):
+        self._offsets[number] = self._file.tell()
+        self._file.write(f"{number} 0 obj\n{dictionary}\nendobj\n".encode())
+
+    def _write_stream(self, number: int, entries: str, data: bytes):
+        """Write a stream object; entries go into its dictionary."""
+        self._offsets[number] = self._file.tell()
+        self._file.write(
+            f"{number} 0 obj\n<< {entries} /Length {len(data)} >>\nstream\n".encode()
+        )
+        self._file.write(data)
+        self._file.write(b"\nendstream\nendobj\n")
+
+    def add_page(self, image: EncodedImage, dpi: int):
+        """
+        Append an encoded image as a page.
+
+        Args:
+            image: The page's image, from encode_image()
+            dpi: Resolution the page is sized for
+        """
+        entries = image.entries
+        if image.mask is not None:
+            mask = self._allocate()
+            self._write_stream(mask, *image.mask)
+            entries += f" /SMask {mask} 0 R"
+        image_object = self._allocate()
+        self._write_stream(image_object, entries, image.data)
+
+        width = _number(image.width * 72 / dpi)
+        height = _number(image.height * 72 / dpi)
+        content = self._allocate()
+        self._write_stream(
+            content, "", f"q {width} 0 0 {height} 0 0 cm /Im0 Do Q".encode()
+        )
+        page = self._allocate()
+        self._write_object(
+            page,
+            f"<< /Type /Page /Parent {self.PAGES} 0 R "
+            f"/MediaBox [0 0 {width} {height}] "
+            f"/Resources << /XObject << /Im0 {image_object} 0 R >> >> "
+            f"/Contents {content} 0 R >>",
+        )
+        self._pages.append(page)
+
+    def close(self):
+        """Write the page tree and cross-reference table and close the file."""
+        kids = " ".join(f"{page} 0 R" for page in self._pages)
+        self._write_object(
+            self.PAGES,
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self._pages)} >>",
+        )
+        self._write_object(
+            self.CATALOG, f"<< /Type /Catalog /Pages {self.PAGES} 0 R >>"
+        )
+
+        xref = self._file.tell()
+        lines = [f"xref\n0 {self._next_object}\n", "0000000000 65535 f \n"]
+        lines.extend(
+            f"{self._offsets[number]:010d} 00000 n \n"
+            for number in range(1, self._next_object)
+        )
+        lines.append(
+            f"trailer\n<< /Size {self._next_object} /Root {self.CATALOG} 0 R >>\n"
+            f"startxref\n{xref}\n%%EOF\n"
+        )
+        self._file.write("".join(lines).encode())
+        self._file.close()
+
+    def abort(self):
+        """Close and delete the partial file."""
+        self._file.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def images_to_pdf(
+    image_paths: list[str],
+    output_path: str,
+    dpi: int,
+    pool: Optional[PageEncodingPool] = page_pool,
+) -> str:
+    """
+    Write a PDF with one page per image.
+
+    With a pool of several processes and more than one image, all pages are
+    encoded on the pool at once and written in their original order as they
+    become ready.
+
+    Args:
+        image_paths: The images, in page order
+        output_path: The PDF to create
+        dpi: Resolution the pages are sized for
+        pool: Encodes the pages; None encodes them in this process
+
+    Returns:
+        output_path
+
+    Raises:
+        InvalidImageError: If images cannot be decoded, listing every page
+            that failed; no PDF is left
+    """
+    if pool is None or pool.max_workers < 2 or len(image_paths) < 2:
+        encoded = (_encode_here(path) for path in image_paths)
+    else:
+        # Submit every page before waiting for the first one
+        futures = [pool.submit(path) for path in image_paths]
+        encoded = (_result(future) for future in futures)
+
+    writer = PdfImageWriter(output_path)
+    failures = []
+    try:
+        for page, image in enumerate(encoded, start=1):
+            if isinstance(image, ValueError):
+                failures.append((page, str(image)))
+            elif not failures:
+                writer.add_page(image, dpi)
+        if failures:
+            raise InvalidImageError(failures)
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    return output_path
+
+
+def _encode_here(path: str):
+    """Encode an image in this process; a failure is returned, not raised."""
+    try:
+        return encode_image(path)
+    except ValueError as e:
+        return e
+
+
+def _result(future: Future):
+    """Wait for a pool encoding; a failure is returned, not raised."""
+    try:
+        return future.result()
+    except ValueError as e:
+        return e
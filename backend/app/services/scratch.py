@@ -0,0 +1,223 @@
+"""
+Per-request scratch workspaces with automatic teardown and accounting.
+
+A request that needs intermediate files opens a workspace, asks it for a
+path for every file it is about to write, and closes it when the response
+has been sent. Closing deletes everything the workspace handed out.
+
+Workspaces have two tiers. Files that are expected to be small are placed
+in RAM (tmpfs, /dev/shm by default) as long as the tier's budget allows;
+everything else, and every file whose size is unknown, goes to disk under
+SCRATCH_DIR. A file in RAM that turns out larger than SCRATCH_SPILL_MB once
+written is moved to disk.
+
+The disk tier lies in one of the cleanup service's temp directories: a
+workspace is registered with the temp file registry and leased while it is
+open, and its files are reported to the disk usage ledger. A workspace
+that a crash left behind is therefore expired like any other temp file.
+"""
+import logging
+import os
+import shutil
+import uuid
+from threading import Lock
+from typing import Optional
+
+from app.services.cleanup import TempFileRegistry, temp_files
+from app.services.disk_usage import disk_usage
+
+SCRATCH_DIR = "uploads"
+RAM_SCRATCH_DIR = os.getenv("SCRATCH_RAM_DIR", "/dev/shm/passthebytes-scratch")
+# Most bytes held in the RAM tier at once; 0 disables it
+SCRATCH_RAM_BYTES = int(float(os.getenv("SCRATCH_RAM_MB", "256")) * 1024**2)
+# Largest file kept in the RAM tier
+SCRATCH_SPILL_BYTES = int(float(os.getenv("SCRATCH_SPILL_MB", "16")) * 1024**2)
+
+logger = logging.getLogger(__name__)
+
+
+class Workspace:
+    """
+    Scratch directory of one request, obtained from ScratchSpace.open().
+
+    Use it as a context manager, or call close() once its files are no
+    longer needed (e.g. from a response's background task).
+    """
+
+    def __init__(self, space: "ScratchSpace", purpose: str):
+        self.workspace_id = str(uuid.uuid4())
+        self.purpose = purpose
+        self._space = space
+        self._disk_dir: Optional[str] = None
+        self._ram_dir: Optional[str] = None
+        # Bytes charged to the RAM tier per file
+        self._ram_files: dict[str, int] = {}
+        self._closed = False
+
+    @property
+    def registry_key(self) -> str:
+        return f"workspace:{self.workspace_id}"
+
+    def _directory(self, ram: bool) -> str:
+        """Create the workspace's directory on a tier on first use."""
+        if ram:
+            if self._ram_dir is None:
+                self._ram_dir = os.path.join(self._space.ram_root, self.workspace_id)
+                os.makedirs(self._ram_dir)
+            return self._ram_dir
+        if self._disk_dir is None:
+            self._disk_dir = os.path.join(self._space.disk_root, self.workspace_id)
+            os.makedirs(self._disk_dir)
+            self._space.registry.register(self._disk_dir, key=self.registry_key)
+            self._space.registry.acquire(self._disk_dir)
+        return self._disk_dir
+
+    def path(self, name: str, size_hint: Optional[int] = None) -> str:
+        """
+        Return a path for a new file in the workspace.
+
+        Args:
+            name: File name, without directories
+            size_hint: Expected size; the file is only placed in RAM if it
+                is known to be small
+
+        Returns:
+            Where to write the file
+        """
+        if self._closed:
+            raise RuntimeError("Workspace is closed")
+        name = os.path.basename(name)
+        if size_hint is not None and self._space._charge_ram(size_hint):
+            try:
+                path = os.path.join(self._directory(ram=True), name)
+            except OSError:
+                self._space._release_ram(size_hint)
+            else:
+                self._ram_files[path] = size_hint
+                return path
+        return os.path.join(self._directory(ram=False), name)
+
+    def written(self, path: str) -> str:
+        """
+        Account for a file once it has been written.
+
+        A file in RAM that is larger than the spill threshold, or than the
+        RAM tier has room for, is moved to disk.
+
+        Returns:
+            The file's path, which changes if it was moved
+        """
+        size = os.path.getsize(path)
+        charged = self._ram_files.get(path)
+        if charged is None:
+            disk_usage.record(path, size)
+            return path
+        if size <= self._space.spill_bytes and self._space._charge_ram(
+            size - charged
+        ):
+            self._ram_files[path] = size
+            return path
+        self._space._release_ram(self._ram_files.pop(path))
+        target = os.path.join(self._directory(ram=False), os.path.basename(path))
+        shutil.move(path, target)
+        disk_usage.record(target, size)
+        logger.info(f"Spilled {size} byte scratch file of {self.purpose} to disk")
+        return target
+
+    def close(self):
+        """Delete the workspace's files and return its space."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._ram_dir is not None:
+            shutil.rmtree(self._ram_dir, ignore_errors=True)
+            self._space._release_ram(sum(self._ram_files.values()))
+            self._ram_files.clear()
+        if self._disk_dir is not None:
+            shutil.rmtree(self._disk_dir, ignore_errors=True)
+            disk_usage.forget(self._disk_dir)
+            self._space.registry.discard(self.registry_key)
+            self._space.registry.release(self._disk_dir)
+
+    def __enter__(self) -> "Workspace":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ScratchSpace:
+    """
+    Hands out workspaces and keeps the RAM tier within its budget.
+
+    Args:
+        disk_root: Directory of the disk tier, inside a temp directory
+        ram_root: Directory of the RAM tier; None disables it
+        ram_bytes: Budget of the RAM tier, capped at half the free space
+            of its file system
+        spill_bytes: Largest file kept in RAM
+        registry: Expires workspaces left behind by a crash
+    """
+
+    def __init__(
+        self,
+        disk_root: str = SCRATCH_DIR,
+        ram_root: Optional[str] = RAM_SCRATCH_DIR,
+        ram_bytes: int = SCRATCH_RAM_BYTES,
+        spill_bytes: int = SCRATCH_SPILL_BYTES,
+        registry: TempFileRegistry = temp_files,
+    ):
+        self.disk_root = disk_root
+        self.ram_root = ram_root
+        self.spill_bytes = spill_bytes
+        self.registry = registry
+        self.ram_bytes = ram_bytes if ram_root else 0
+        self._ram_used = 0
+        self._lock = Lock()
+        if self.ram_bytes:
+            try:
+                os.makedirs(ram_root, exist_ok=True)
+                free = shutil.disk_usage(ram_root).free
+            except OSError as e:
+                logger.info(f"RAM scratch tier unavailable ({e}); using disk only")
+                self.ram_bytes = 0
+            else:
+                # tmpfs is often small in containers; leave room for others
+                self.ram_bytes = min(self.ram_bytes, free // 2)
+
+    def open(self, purpose: str) -> Workspace:
+        """Open a workspace; purpose is only used for logging."""
+        return Workspace(self, purpose)
+
+    def _charge_ram(self, nbytes: int) -> bool:
+        """Take nbytes of the RAM budget if they are available."""
+        if not self.ram_bytes or nbytes > self.spill_bytes:
+            return False
+        with self._lock:
+            if self._ram_used + nbytes > self.ram_bytes:
+                return False
+            self._ram_used += nbytes
+            return True
+
+    def _release_ram(self, nbytes: int):
+        with self._lock:
+            self._ram_used = max(0, self._ram_used - nbytes)
+
+    def clear_ram(self):
+        """Delete what a previous run left in the RAM tier."""
+        if not self.ram_bytes or not os.path.isdir(self.ram_root):
+            return
+        for name in os.listdir(self.ram_root):
+            shutil.rmtree(os.path.join(self.ram_root, name), ignore_errors=True)
+
+    def stats(self) -> dict:
+        """Return the RAM tier's budget and use."""
+        with self._lock:
+            return {
+                "ram_bytes": self.ram_bytes,
+                "ram_used": self._ram_used,
+                "spill_bytes": self.spill_bytes,
+            }
+
+
+scratch_space = ScratchSpace()
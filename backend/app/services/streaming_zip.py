@@ -0,0 +1,120 @@
+"""
+Append-only ZIP writer that can be streamed while it is still being built.
+
+zipfile normally seeks back to patch each local header once an entry's size
+and CRC are known. By handing it a file object without ``seek`` it falls back
+to data descriptors instead, so bytes on disk are only ever appended. A reader
+can therefore send the archive to a client as it grows, and the result is a
+valid ZIP once the central directory is written on close.
+
+The archive is built at its partial_path() and only moved to its final path
+once it is closed, so whatever is found at the final path is complete.
+"""
+import os
+import zipfile
+from threading import Lock
+
+from app.services.disk_usage import disk_usage
+
+# Media formats that are already compressed; deflating them wastes CPU
+STORED_EXTENSIONS = frozenset(
+    {".mp3", ".m4a", ".aac", ".opus", ".ogg", ".webm", ".mp4", ".mkv", ".zip"}
+)
+
+
+def partial_path(path: str) -> str:
+    """Where the archive for path is built until it is closed."""
+    return f"{path}.part"
+
+
+class _AppendOnlyFile:
+    """Write-only file wrapper without seek support."""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self._position = 0
+
+    def write(self, data) -> int:
+        written = self._fileobj.write(data)
+        self._position += written
+        return written
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        self._fileobj.flush()
+
+
+class StreamingZipWriter:
+    """
+    Build a ZIP archive one entry at a time, flushing after every entry.
+
+    Args:
+        path: Where the finished archive is moved on close()
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.partial_path = partial_path(path)
+        self._file = open(self.partial_path, "wb")
+        self._zip = zipfile.ZipFile(
+            _AppendOnlyFile(self._file), "w", compression=zipfile.ZIP_DEFLATED
+        )
+        self._names: set[str] = set()
+        self._lock = Lock()
+        self.entries = 0
+
+    def _unique_name(self, arcname: str) -> str:
+        """Avoid duplicate entries when two files share a name."""
+        if arcname not in self._names:
+            return arcname
+        stem, ext = os.path.splitext(arcname)
+        counter = 2
+        while f"{stem} ({counter}){ext}" in self._names:
+            counter += 1
+        return f"{stem} ({counter}){ext}"
+
+    def add_file(self, file_path: str, arcname: str) -> str:
+        """
+        Append a file to the archive and flush it to disk.
+
+        Already-compressed media is stored as-is; anything else is deflated.
+
+        Returns:
+            The name the entry was stored under
+        """
+        compress_type = (
+            zipfile.ZIP_STORED
+            if os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS
+            else zipfile.ZIP_DEFLATED
+        )
+        with self._lock:
+            arcname = self._unique_name(arcname)
+            self._zip.write(file_path, arcname=arcname, compress_type=compress_type)
+            self._names.add(arcname)
+            self._file.flush()
+            self.entries += 1
+            disk_usage.record(self.partial_path, self._file.tell())
+        return arcname
+
+    def close(self):
+        """Write the central directory and move the archive to its path."""
+        with self._lock:
+            self._zip.close()
+            size = self._file.tell()
+            self._file.close()
+            os.replace(self.partial_path, self.path)
+        disk_usage.forget(self.partial_path)
+        disk_usage.record(self.path, size)
+
+    def abort(self):
+        """Close the archive without keeping it."""
+        with self._lock:
+            try:
+                self._zip.close()
+            finally:
+                self._file.close()
+                if os.path.exists(self.partial_path):
+                    os.unlink(self.partial_path)
+                disk_usage.forget(self.partial_path)
@@ -0,0 +1,259 @@
+"""
+CPU-bound transcoding stage for YouTube downloads.
+
+Downloads are network-bound and transcoding to MP3 is CPU-bound. Running
+ffmpeg inline in a download worker leaves that worker idle on the network and
+then saturates a core, so neither resource can be sized on its own. Download
+workers instead hand the raw audio to this pool, whose size follows the number
+of CPUs. Each task runs ffmpeg as a single-threaded child process, so the pool
+uses real parallelism across cores while its threads only wait on ffmpeg.
+
+MP3 output always needs a full decode and re-encode. The passthrough formats
+instead copy the downloaded audio stream into a new container, which costs
+about as much as copying the file.
+"""
+import logging
+import os
+import shutil
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Event, Lock
+from typing import Optional
+
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", str(os.cpu_count() or 2)))
+
+# How often a running ffmpeg checks whether it was cancelled
+CANCEL_POLL_SECONDS = 0.5
+
+# Selectable MP3 bitrates in kbps
+MP3_BITRATES = ("128", "192", "256", "320")
+DEFAULT_MP3_BITRATE = "192"
+
+# Passthrough formats: the audio stream is copied without re-encoding. The
+# encoder is only used if the source stream does not fit the container.
+PASSTHROUGH_ENCODERS = {"m4a": "aac", "opus": "libopus"}
+AUDIO_FORMATS = ("mp3", *PASSTHROUGH_ENCODERS)
+
+logger = logging.getLogger(__name__)
+
+
+class TranscodeError(Exception):
+    """ffmpeg failed to transcode a file."""
+
+
+class TranscodeCancelled(TranscodeError):
+    """The transcode was cancelled and ffmpeg was killed."""
+
+
+def find_ffmpeg() -> str:
+    """Return the ffmpeg executable, honouring the FFMPEG_PATH override."""
+    return os.getenv("FFMPEG_PATH") or shutil.which("ffmpeg") or "ffmpeg"
+
+
+def _ffmpeg_command(source: str, target: str, *codec_options: str) -> list[str]:
+    return [
+        find_ffmpeg(),
+        "-nostdin",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-y",
+        "-i",
+        source,
+        "-vn",
+        *codec_options,
+        # One core per task; the pool size decides how many cores are used
+        "-threads",
+        "1",
+        target,
+    ]
+
+
+def encode_command(
+    source: str, target: str, encoder: str, bitrate: str = DEFAULT_MP3_BITRATE
+) -> list[str]:
+    """Build the ffmpeg command that re-encodes source at bitrate kbps."""
+    return _ffmpeg_command(source, target, "-codec:a", encoder, "-b:a", f"{bitrate}k")
+
+
+def mp3_command(
+    source: str, target: str, bitrate: str = DEFAULT_MP3_BITRATE
+) -> list[str]:
+    """Build the ffmpeg command that converts source to an MP3 at bitrate kbps."""
+    return encode_command(source, target, "libmp3lame", bitrate)
+
+
+def remux_command(source: str, target: str) -> list[str]:
+    """Build the ffmpeg command that copies the audio stream into target."""
+    return _ffmpeg_command(source, target, "-codec:a", "copy")
+
+
+def pipe_command(
+    sources: list[dict], file_format: str, bitrate: str = DEFAULT_MP3_BITRATE
+) -> list[str]:
+    """
+    Build the ffmpeg command that reads remote sources and writes to stdout.
+
+    Args:
+        sources: Selected yt-dlp formats, each with "url" and optionally
+            "http_headers"; a video and an audio source are merged
+        file_format: "mp3", "m4a", "opus" or "mp4"
+        bitrate: MP3 bitrate in kbps
+
+    Returns:
+        The command; MP4 containers are fragmented so they can be written
+        without seeking
+    """
+    command = [find_ffmpeg(), "-nostdin", "-hide_banner", "-loglevel", "error"]
+    for source in sources:
+        headers = "".join(
+            f"{name}: {value}\r\n"
+            for name, value in (source.get("http_headers") or {}).items()
+        )
+        if headers:
+            command += ["-headers", headers]
+        command += ["-i", source["url"]]
+    if len(sources) > 1:
+        command += ["-map", "0:v:0", "-map", "1:a:0"]
+
+    fragmented = "frag_keyframe+empty_moov+default_base_moof"
+    if file_format == "mp3":
+        command += ["-vn", "-codec:a", "libmp3lame", "-b:a", f"{bitrate}k"]
+        command += ["-f", "mp3"]
+    elif file_format == "opus":
+        command += ["-vn", "-codec:a", "copy", "-f", "opus"]
+    elif file_format == "m4a":
+        command += ["-vn", "-codec:a", "copy", "-movflags", fragmented, "-f", "ipod"]
+    else:
+        command += ["-codec", "copy", "-movflags", fragmented, "-f", "mp4"]
+    return [*command, "-threads", "1", "pipe:1"]
+
+
+def run_ffmpeg(command: list[str], cancel_event: Optional[Event] = None):
+    """
+    Run an ffmpeg command to completion.
+
+    Args:
+        command: The full command line
+        cancel_event: When set, ffmpeg is killed and the call is abandoned
+
+    Raises:
+        TranscodeCancelled: If cancel_event was set while ffmpeg ran
+        TranscodeError: If ffmpeg is missing or fails
+    """
+    try:
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        raise TranscodeError("ffmpeg is not installed")
+
+    while True:
+        try:
+            _, stderr = process.communicate(timeout=CANCEL_POLL_SECONDS)
+            break
+        except subprocess.TimeoutExpired:
+            if cancel_event is not None and cancel_event.is_set():
+                process.kill()
+                process.communicate()
+                raise TranscodeCancelled("Transcode cancelled")
+
+    if process.returncode != 0:
+        message = (stderr or b"").decode(errors="replace").strip()
+        raise TranscodeError(f"ffmpeg failed: {message[-500:] or process.returncode}")
+
+
+def convert_audio(
+    source: str,
+    audio_format: str = "mp3",
+    bitrate: str = DEFAULT_MP3_BITRATE,
+    cancel_event: Optional[Event] = None,
+) -> str:
+    """
+    Convert a downloaded audio or video file to audio_format, deleting the source.
+
+    MP3 is encoded at bitrate. Passthrough formats copy the source stream;
+    only if ffmpeg cannot put it into the container is it re-encoded.
+
+    Args:
+        source: Path of the raw downloaded file
+        audio_format: One of AUDIO_FORMATS
+        bitrate: Target bitrate in kbps when encoding
+        cancel_event: When set, ffmpeg is killed and the partial output deleted
+
+    Returns:
+        Path of the converted file, next to the source
+
+    Raises:
+        TranscodeError: If ffmpeg is missing, fails or is cancelled
+    """
+    stem = os.path.splitext(source)[0]
+    target = f"{stem}.{audio_format}"
+    if target == source:
+        target = f"{stem}.transcoded.{audio_format}"
+
+    try:
+        if audio_format == "mp3":
+            run_ffmpeg(mp3_command(source, target, bitrate), cancel_event)
+        else:
+            try:
+                run_ffmpeg(remux_command(source, target), cancel_event)
+            except TranscodeCancelled:
+                raise
+            except TranscodeError as e:
+                logger.warning(f"Cannot remux {source} to {audio_format}: {e}")
+                encoder = PASSTHROUGH_ENCODERS[audio_format]
+                run_ffmpeg(
+                    encode_command(source, target, encoder, bitrate), cancel_event
+                )
+    except TranscodeError:
+        if os.path.exists(target):
+            os.unlink(target)
+        raise
+
+    os.unlink(source)
+    logger.info(f"Converted {source} to {target}")
+    return target
+
+
+class TranscodePool:
+    """
+    Fixed-size pool for transcoding, independent of the download workers.
+
+    Args:
+        max_workers: Number of ffmpeg processes that run at the same time
+    """
+
+    def __init__(self, max_workers: int = TRANSCODE_WORKERS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="transcode-worker"
+        )
+        self._lock = Lock()
+        self.pending = 0
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) on the pool."""
+        with self._lock:
+            self.pending += 1
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, _future: Future):
+        with self._lock:
+            self.pending -= 1
+
+    def pressure(self) -> float:
+        """Return the queued and running tasks per worker."""
+        return self.pending / self.max_workers
+
+    def stats(self) -> dict:
+        """Return the pool's capacity and how many tasks are queued or running."""
+        return {"max_workers": self.max_workers, "pending": self.pending}
+
+
+transcode_pool = TranscodePool()
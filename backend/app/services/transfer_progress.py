@@ -0,0 +1,262 @@
+"""
+Byte-level progress of downloads, collected from yt-dlp progress hooks.
+
+yt-dlp calls its progress hooks for every chunk it receives, many times per
+second and from several download threads at once. The hooks here only update
+counters in memory; the job that owns a TransferProgress publishes a
+snapshot at a fixed rate (see PROGRESS_INTERVAL_SECONDS), so the number of
+state updates does not depend on how often the hooks fire.
+
+Every transferred byte and every finished download is also recorded in the
+process-wide throughput log, which keeps hourly totals and peaks for
+capacity planning.
+"""
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Callable, Iterable, Optional
+
+# Rate at which jobs publish their byte progress
+PROGRESS_INTERVAL_SECONDS = 1.0
+# Window over which the current transfer speed is measured
+SPEED_WINDOW_SECONDS = 5.0
+# Hours of throughput history kept for capacity planning
+THROUGHPUT_HISTORY_HOURS = 48
+
+logger = logging.getLogger(__name__)
+
+
+class ThroughputLog:
+    """
+    Hourly download volume, for sizing workers and bandwidth limits.
+
+    Every hour records the bytes received, the downloads finished with their
+    total transfer time, and the highest per-minute rate. An hour is logged
+    when it closes.
+
+    Args:
+        clock: Wall-clock time source
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._hours: deque[dict] = deque(maxlen=THROUGHPUT_HISTORY_HOURS)
+        self._minute = 0
+        self._minute_bytes = 0
+        self._lock = Lock()
+
+    def _current_hour(self, now: float) -> dict:
+        """Return the bucket for now, closing older ones; caller holds the lock."""
+        hour = int(now // 3600) * 3600
+        if not self._hours or self._hours[-1]["start"] != hour:
+            if self._hours:
+                self._log_hour(self._hours[-1])
+            self._hours.append(
+                {
+                    "start": hour,
+                    "bytes": 0,
+                    "downloads": 0,
+                    "transfer_seconds": 0.0,
+                    "peak_speed": 0.0,
+                }
+            )
+        return self._hours[-1]
+
+    def add_bytes(self, amount: int):
+        """Record bytes received by any download."""
+        now = self._clock()
+        with self._lock:
+            bucket = self._current_hour(now)
+            bucket["bytes"] += amount
+            minute = int(now // 60)
+            if minute != self._minute:
+                self._minute = minute
+                self._minute_bytes = 0
+            self._minute_bytes += amount
+            bucket["peak_speed"] = max(bucket["peak_speed"], self._minute_bytes / 60)
+
+    def add_download(self, seconds: float):
+        """Record a finished download and how long its transfer took."""
+        with self._lock:
+            bucket = self._current_hour(self._clock())
+            bucket["downloads"] += 1
+            bucket["transfer_seconds"] += seconds
+
+    def _log_hour(self, bucket: dict):
+        logger.info(
+            f"Throughput for the hour from "
+            f"{datetime.fromtimestamp(bucket['start'], timezone.utc):%Y-%m-%d %H:%M}"
+            f" UTC: {bucket['bytes']} bytes, {bucket['downloads']} downloads, "
+            f"peak {bucket['peak_speed']:.0f} B/s"
+        )
+
+    def stats(self) -> list[dict]:
+        """Return the recorded hours, oldest first."""
+        with self._lock:
+            return [
+                {
+                    "hour": datetime.fromtimestamp(
+                        bucket["start"], timezone.utc
+                    ).isoformat(),
+                    "bytes": bucket["bytes"],
+                    "downloads": bucket["downloads"],
+                    "average_speed": round(bucket["bytes"] / 3600),
+                    "peak_speed": round(bucket["peak_speed"]),
+                    "average_download_seconds": (
+                        round(bucket["transfer_seconds"] / bucket["downloads"], 1)
+                        if bucket["downloads"]
+                        else None
+                    ),
+                }
+                for bucket in self._hours
+            ]
+
+
+throughput_log = ThroughputLog()
+
+
+class _Video:
+    """Transfer state of one video; a video may consist of several files."""
+
+    def __init__(self, started: float):
+        self.started = started
+        # Received and expected bytes per file
+        self.files: dict[str, tuple[int, int]] = {}
+        self.finished = False
+
+    @property
+    def downloaded(self) -> int:
+        return sum(downloaded for downloaded, _ in self.files.values())
+
+    @property
+    def total(self) -> int:
+        return sum(max(downloaded, total) for downloaded, total in self.files.values())
+
+
+class TransferProgress:
+    """
+    Byte progress, throughput and ETA of the downloads of one job.
+
+    Args:
+        video_ids: The videos the job downloads; videos that have not
+            started yet are assumed to be as large as the average known one
+        log: Receives every transferred byte and finished download
+        clock: Monotonic time source
+    """
+
+    def __init__(
+        self,
+        video_ids: Iterable[str],
+        log: Optional[ThroughputLog] = throughput_log,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._clock = clock
+        self._log = log
+        self._expected = set(video_ids)
+        self._videos: dict[str, _Video] = {}
+        self._samples: deque[tuple[float, int]] = deque()
+        self._version = 0
+        self._published = -1
+        self._lock = Lock()
+
+    def progress_hook(self, video_id: str) -> Callable[[dict], None]:
+        """Build the yt-dlp progress hook for one video's download."""
+
+        def hook(status: dict):
+            if status.get("status") != "downloading":
+                return
+            name = status.get("tmpfilename") or status.get("filename") or ""
+            downloaded = status.get("downloaded_bytes") or 0
+            total = status.get("total_bytes") or status.get("total_bytes_estimate")
+            self._record(video_id, name, downloaded, int(total or 0))
+
+        return hook
+
+    def _record(self, video_id: str, name: str, downloaded: int, total: int):
+        now = self._clock()
+        with self._lock:
+            video = self._videos.get(video_id)
+            if video is None:
+                video = self._videos[video_id] = _Video(now)
+            received = downloaded - video.files.get(name, (0, 0))[0]
+            video.files[name] = (downloaded, total)
+            self._version += 1
+            if received > 0:
+                self._samples.append((now, received))
+        if received > 0 and self._log is not None:
+            self._log.add_bytes(received)
+
+    def finish(self, video_id: str, success: bool = True):
+        """Mark a video as done; only successful downloads are logged."""
+        with self._lock:
+            self._expected.discard(video_id)
+            video = self._videos.get(video_id)
+            if video is None or video.finished:
+                return
+            video.finished = True
+            self._version += 1
+            seconds = self._clock() - video.started
+        if success and self._log is not None:
+            self._log.add_download(seconds)
+
+    def _speed(self, now: float) -> float:
+        """Bytes per second over the speed window; caller holds the lock."""
+        cutoff = now - SPEED_WINDOW_SECONDS
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        # A job that started moments ago is measured over its lifetime
+        started = min((video.started for video in self._videos.values()), default=now)
+        window = min(SPEED_WINDOW_SECONDS, now - started)
+        received = sum(amount for _, amount in self._samples)
+        return received / window if window > 0 else 0.0
+
+    def snapshot(self) -> dict:
+        """
+        Return the job's byte progress.
+
+        Returns:
+            dict with downloaded_bytes and total_bytes (estimated while
+            videos have not started), speed in bytes/s, eta in seconds (None
+            while unknown) and the progress of every running video
+        """
+        now = self._clock()
+        with self._lock:
+            videos = self._videos.values()
+            downloaded = sum(video.downloaded for video in videos)
+            sizes = [video.total for video in videos if video.total]
+            # Videos that have not started count with the average known size
+            waiting = len(self._expected - self._videos.keys())
+            waiting_bytes = waiting * sum(sizes) // len(sizes) if sizes else 0
+            total = sum(video.total for video in videos) + waiting_bytes
+            remaining = waiting_bytes + sum(
+                video.total - video.downloaded for video in videos if not video.finished
+            )
+            speed = self._speed(now)
+            return {
+                "downloaded_bytes": downloaded,
+                "total_bytes": total,
+                "speed": round(speed),
+                "eta": round(remaining / speed) if speed > 0 and sizes else None,
+                "videos": {
+                    video_id: {
+                        "downloaded_bytes": video.downloaded,
+                        "total_bytes": video.total or None,
+                    }
+                    for video_id, video in self._videos.items()
+                    if not video.finished
+                },
+            }
+
+    def changed(self) -> bool:
+        """
+        Whether anything was recorded since the last call that returned True.
+
+        Lets the owner skip publishing snapshots of an idle job.
+        """
+        with self._lock:
+            if self._version == self._published:
+                return False
+            self._published = self._version
+            return True
@@ -1,8 +1,81 @@
 """
 Utility functions for the PassTheBytes Tools application.
 """
+import hmac
+import ipaddress
+import os
 import re
 
+from fastapi import HTTPException
+from starlette.requests import Request
+
+# Proxies whose forwarding headers are believed: loopback and the private
+# ranges of the nginx containers in front of the backend
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(network.strip())
+    for network in os.getenv(
+        "TRUSTED_PROXIES", "127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16"
+    ).split(",")
+    if network.strip()
+]
+
+
+def is_trusted_proxy(address: str) -> bool:
+    """Whether address belongs to one of the TRUSTED_PROXIES."""
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def get_client_ip(request: Request) -> str:
+    """
+    Extract the client IP address, considering proxy headers.
+
+    Forwarding headers are only believed when they come from a trusted
+    proxy. nginx appends to X-Forwarded-For, so its leftmost entries are
+    whatever the client sent; the client is the rightmost entry that is not
+    one of our proxies.
+    """
+    peer = request.client.host if request.client else None
+    if peer is None:
+        return "unknown"
+    if not is_trusted_proxy(peer):
+        return peer
+
+    forwarded_for = request.headers.get("X-Forwarded-For")
+    if forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not is_trusted_proxy(hop):
+                return hop
+        if hops:
+            # Every hop is one of ours: a client on the private network
+            return hops[0]
+
+    # Set by the proxy from the address it was connected from
+    real_ip = request.headers.get("X-Real-IP")
+    if real_ip:
+        return real_ip.strip()
+
+    return peer
+
+
+def require_admin_token(request: Request):
+    """
+    Reject a request unless it carries the admin token in X-Admin-Token.
+
+    Administrative endpoints are disabled while ADMIN_TOKEN is not set.
+
+    Raises:
+        HTTPException: 403 if the token is missing, wrong or not configured
+    """
+    expected = os.getenv("ADMIN_TOKEN")
+    provided = request.headers.get("X-Admin-Token", "")
+    if not expected or not hmac.compare_digest(provided, expected):
+        raise HTTPException(status_code=403, detail="Admin token required.")
+
 
 def sanitize_filename(filename: str, max_length: int = 255) -> str:
     """
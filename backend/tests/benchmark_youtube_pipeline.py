@@ -0,0 +1,647 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark of the YouTube pipeline.
+
+Runs the real router code (scheduler, media store, transcode pool, ZIP
+writer, artifact store and endpoints) against a stand-in for yt-dlp that
+fetches synthetic media from a local HTTP server, so throughput can be
+measured without network access and regressions show up as numbers.
+
+The local server adds a configurable latency before the first byte, caps
+the bandwidth of every connection and fails a configurable share of the
+requests. ffmpeg is replaced by a copy with a configurable CPU cost, since
+the synthetic media is not decodable.
+
+Scenarios:
+    playlist  Concurrent do_playlist_download jobs, as started by
+              /download-playlist
+    download  Concurrent POST /api/youtube/download/mp3 requests
+    listing   Concurrent POST /api/youtube/playlist-info/stream requests
+
+Every scenario reports jobs/min, time to first byte (for playlist jobs: to
+the first finished video), peak disk usage of temp_downloads and peak RSS.
+
+Usage:
+    python tests/benchmark_youtube_pipeline.py --scenario all --jobs 8
+    python tests/benchmark_youtube_pipeline.py --scenario playlist \\
+        --videos 10 --bandwidth 2000000 --failure-rate 0.1 --json
+
+Worker pool sizes are read at import, so set DOWNLOAD_WORKERS and
+TRANSCODE_WORKERS in the environment to benchmark other sizes.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator, Optional
+from urllib.parse import parse_qs, urlparse
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import yt_dlp  # noqa: E402
+
+from app.routers import youtube_downloader  # noqa: E402
+from app.services.jobs import job_registry  # noqa: E402
+from app.services.metadata_cache import metadata_cache  # noqa: E402
+
+SCENARIOS = ("playlist", "download", "listing")
+CHUNK_SIZE = 16 * 1024
+SAMPLE_INTERVAL_SECONDS = 0.05
+
+
+@dataclass
+class BenchmarkConfig:
+    """Workload and network conditions of a benchmark run."""
+
+    jobs: int = 4
+    videos: int = 5
+    video_size: int = 2 * 1024 * 1024
+    # Seconds before the first byte of every media request
+    latency: float = 0.05
+    # Bytes per second of every media connection; 0 is unlimited
+    bandwidth: int = 0
+    # Share of media requests answered with an HTTP error
+    failure_rate: float = 0.0
+    # Seconds every metadata extraction takes
+    extract_latency: float = 0.02
+    # Seconds of CPU the stand-in transcode spends per MiB
+    transcode_cost: float = 0.01
+    seed: int = 0
+
+
+@dataclass
+class ScenarioResult:
+    """Measurements of one scenario."""
+
+    scenario: str
+    jobs: int
+    failed_jobs: int
+    seconds: float
+    jobs_per_minute: float
+    ttfb_p50: Optional[float]
+    ttfb_p95: Optional[float]
+    peak_disk_bytes: int
+    peak_rss_bytes: int
+    details: dict = field(default_factory=dict)
+
+
+def video_id(prefix: str, job: int, index: int) -> str:
+    """Return a valid 11-character video ID for a synthetic video."""
+    return f"{prefix[0]}{job:04d}x{index:05d}"
+
+
+class SyntheticMediaServer:
+    """
+    Local HTTP server of synthetic media files.
+
+    GET /media/<video_id>.webm returns config.video_size bytes after
+    config.latency seconds, paced to config.bandwidth, or an HTTP 503 for
+    config.failure_rate of the requests.
+    """
+
+    def __init__(self, config: BenchmarkConfig):
+        self.config = config
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.config.failure_rate
+            self.failures += fail
+            return fail
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                config = server.config
+                time.sleep(config.latency)
+                if server._should_fail():
+                    self.send_error(503, "Synthetic failure")
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/webm")
+                self.send_header("Content-Length", str(config.video_size))
+                self.end_headers()
+                block = bytes(CHUNK_SIZE)
+                started = time.monotonic()
+                sent = 0
+                while sent < config.video_size:
+                    size = min(CHUNK_SIZE, config.video_size - sent)
+                    self.wfile.write(block[:size])
+                    sent += size
+                    if config.bandwidth:
+                        ahead = sent / config.bandwidth - (time.monotonic() - started)
+                        if ahead > 0:
+                            time.sleep(ahead)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class SyntheticYoutubeDL:
+    """
+    Stand-in for yt_dlp.YoutubeDL that serves a synthetic catalog.
+
+    Playlist URLs (list=<id>) list the videos of the catalog's playlist;
+    video URLs (v=<id>) download the media from the local server, calling
+    the progress hooks like yt-dlp does. Set catalog, server and config on
+    the class before use.
+    """
+
+    catalog: dict[str, list[dict]] = {}
+    server: Optional[SyntheticMediaServer] = None
+    config = BenchmarkConfig()
+
+    def __init__(self, params: Optional[dict] = None):
+        self.params = params or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def extract_info(self, url: str, download: bool = True, process: bool = True):
+        time.sleep(self.config.extract_latency)
+        query = parse_qs(urlparse(url).query)
+        if "list=" in url:
+            entries = self.catalog[query["list"][0]]
+            info = {"_type": "playlist", "title": query["list"][0]}
+            info["entries"] = self._paged(entries) if not process else list(entries)
+            return info
+        info = self.video_info(query["v"][0])
+        if download:
+            return self.process_ie_result(info, download=True)
+        return info
+
+    def _paged(self, entries: list[dict]) -> Iterator[dict]:
+        """Yield entries in pages, like yt-dlp paging through a playlist."""
+        for start in range(0, len(entries), 100):
+            if start:
+                time.sleep(self.config.extract_latency)
+            yield from entries[start : start + 100]
+
+    @staticmethod
+    def video_info(video_id: str) -> dict:
+        return {
+            "id": video_id,
+            "title": f"Synthetic {video_id}",
+            "duration": 180,
+            "ext": "webm",
+        }
+
+    def process_ie_result(self, info: dict, download: bool = True) -> dict:
+        if not download:
+            return info
+        outtmpl = self.params.get("outtmpl", "%(title)s.%(ext)s")
+        path = outtmpl.replace("%(title)s", info["title"]).replace("%(ext)s", "webm")
+        self._download(f"{self.server.url}/media/{info['id']}.webm", path)
+        for postprocessor in self.params.get("postprocessors", []):
+            if postprocessor["key"] == "FFmpegExtractAudio":
+                codec = postprocessor["preferredcodec"]
+                synthetic_convert(path, f"{os.path.splitext(path)[0]}.{codec}")
+        return {**info, "ext": "webm"}
+
+    def _download(self, url: str, path: str):
+        hooks = self.params.get("progress_hooks", [])
+        tmpfilename = f"{path}.part"
+        started = time.monotonic()
+        downloaded = 0
+        try:
+            with urllib.request.urlopen(url) as response:
+                total = int(response.headers.get("Content-Length") or 0)
+                with open(tmpfilename, "wb") as f:
+                    while chunk := response.read(CHUNK_SIZE):
+                        f.write(chunk)
+                        downloaded += len(chunk)
+                        status = {
+                            "status": "downloading",
+                            "tmpfilename": tmpfilename,
+                            "filename": path,
+                            "downloaded_bytes": downloaded,
+                            "total_bytes": total,
+                            "elapsed": time.monotonic() - started,
+                        }
+                        for hook in hooks:
+                            hook(status)
+        except urllib.error.HTTPError as e:
+            raise yt_dlp.utils.DownloadError(f"ERROR: HTTP Error {e.code}: {e.reason}")
+        os.replace(tmpfilename, path)
+        finished = {
+            "status": "finished",
+            "filename": path,
+            "downloaded_bytes": downloaded,
+            "total_bytes": downloaded,
+            "elapsed": time.monotonic() - started,
+        }
+        for hook in hooks:
+            hook(finished)
+
+
+def synthetic_convert(source: str, target: str):
+    """Stand-in for ffmpeg: spend the configured CPU time, then move the file."""
+    cost = SyntheticYoutubeDL.config.transcode_cost * os.path.getsize(source) / 2**20
+    deadline = time.process_time() + cost
+    while time.process_time() < deadline:
+        pass
+    os.replace(source, target)
+
+
+def synthetic_convert_audio(
+    source: str, audio_format: str = "mp3", bitrate: str = "192", cancel_event=None
+) -> str:
+    target = f"{os.path.splitext(source)[0]}.{audio_format}"
+    synthetic_convert(source, target)
+    return target
+
+
+class ResourceSampler:
+    """Samples the disk usage of a directory and the process RSS."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.peak_disk = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _disk_usage(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                with contextlib.suppress(OSError):
+                    total += os.path.getsize(os.path.join(root, name))
+        return total
+
+    @staticmethod
+    def _rss() -> int:
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        import resource
+
+        # Peak of the whole process; the best available without /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def sample(self):
+        self.peak_disk = max(self.peak_disk, self._disk_usage())
+        self.peak_rss = max(self.peak_rss, self._rss())
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(SAMPLE_INTERVAL_SECONDS)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+        # Short runs may end between two samples
+        self.sample()
+        return False
+
+
+@contextlib.contextmanager
+def synthetic_environment(config: BenchmarkConfig) -> Iterator[SyntheticMediaServer]:
+    """
+    Point the router at the synthetic extractor and server in a scratch dir.
+
+    Rate limits are disabled so that the endpoints can be driven at full
+    speed. Everything is restored on exit.
+    """
+    server = SyntheticMediaServer(config)
+    server.start()
+    workdir = tempfile.mkdtemp(prefix="yt-benchmark-")
+    previous_dir = os.getcwd()
+    patches = [
+        (youtube_downloader.yt_dlp, "YoutubeDL", SyntheticYoutubeDL),
+        (youtube_downloader, "convert_audio", synthetic_convert_audio),
+        (youtube_downloader.limiter, "enabled", False),
+    ]
+    originals = [(target, name, getattr(target, name)) for target, name, _ in patches]
+    SyntheticYoutubeDL.server = server
+    SyntheticYoutubeDL.config = config
+    SyntheticYoutubeDL.catalog = {}
+    try:
+        for target, name, value in patches:
+            setattr(target, name, value)
+        os.chdir(workdir)
+        metadata_cache.clear()
+        yield server
+    finally:
+        os.chdir(previous_dir)
+        for target, name, value in originals:
+            setattr(target, name, value)
+        metadata_cache.clear()
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def add_playlist(playlist_id: str, video_ids: list[str]):
+    SyntheticYoutubeDL.catalog[playlist_id] = [
+        {"id": vid, "title": f"Synthetic {vid}", "duration": 180} for vid in video_ids
+    ]
+
+
+def percentile(values: list[float], share: float) -> Optional[float]:
+    if not values:
+        return None
+    if len(values) == 1:
+        return round(values[0], 3)
+    quantiles = statistics.quantiles(values, n=100, method="inclusive")
+    return round(quantiles[int(share * 100) - 1], 3)
+
+
+def run_concurrently(count: int, fn: Callable[[int], Optional[float]]):
+    """Run fn(0..count-1) in threads; return the results and the wall time."""
+    results: list = [None] * count
+
+    def run(index: int):
+        try:
+            results[index] = fn(index)
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.monotonic() - started
+
+
+def make_result(
+    scenario: str,
+    results: list,
+    seconds: float,
+    sampler: ResourceSampler,
+    **details,
+) -> ScenarioResult:
+    ttfbs = [r for r in results if isinstance(r, float)]
+    return ScenarioResult(
+        scenario=scenario,
+        jobs=len(results),
+        failed_jobs=len(results) - len(ttfbs),
+        seconds=round(seconds, 3),
+        jobs_per_minute=round(len(results) / seconds * 60, 1) if seconds else 0.0,
+        ttfb_p50=percentile(ttfbs, 0.5),
+        ttfb_p95=percentile(ttfbs, 0.95),
+        peak_disk_bytes=sampler.peak_disk,
+        peak_rss_bytes=sampler.peak_rss,
+        details=details,
+    )
+
+
+def bench_playlist(config: BenchmarkConfig) -> ScenarioResult:
+    """Run config.jobs playlist jobs of config.videos videos at once."""
+    with synthetic_environment(config) as server, ResourceSampler(".") as sampler:
+        for job in range(config.jobs):
+            ids = [video_id("playlist", job, i) for i in range(config.videos)]
+            add_playlist(f"PLbench{job:04d}", ids)
+
+        def run_job(job: int) -> Optional[float]:
+            job_id = f"00000000-0000-0000-0000-{job:012d}"
+            playlist_id = f"PLbench{job:04d}"
+            url = f"https://www.youtube.com/playlist?list={playlist_id}"
+            video_ids = [v["id"] for v in SyntheticYoutubeDL.catalog[playlist_id]]
+            started = time.monotonic()
+            worker = threading.Thread(
+                target=youtube_downloader.do_playlist_download,
+                args=(url, video_ids, job_id, f"bench-{job}"),
+            )
+            worker.start()
+            first_video = None
+            while worker.is_alive():
+                state = job_registry.get(job_id) or {}
+                if first_video is None and state.get("current", 0) >= 1:
+                    first_video = time.monotonic() - started
+                worker.join(SAMPLE_INTERVAL_SECONDS)
+            state = job_registry.get(job_id) or {}
+            job_registry.remove(job_id)
+            if state.get("status") != "complete":
+                return None
+            if first_video is None:
+                first_video = time.monotonic() - started
+            return first_video
+
+        results, seconds = run_concurrently(config.jobs, run_job)
+    videos = config.jobs * config.videos
+    return make_result(
+        "playlist",
+        results,
+        seconds,
+        sampler,
+        videos_per_second=round(videos / seconds, 2),
+        media_requests=server.requests,
+        media_failures=server.failures,
+    )
+
+
+def bench_download(config: BenchmarkConfig) -> ScenarioResult:
+    """Run config.jobs single-video MP3 downloads at once."""
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with synthetic_environment(config) as server, ResourceSampler(".") as sampler:
+
+        def run_download(job: int) -> Optional[float]:
+            client = TestClient(app)
+            url = f"https://www.youtube.com/watch?v={video_id('download', job, 0)}"
+            started = time.monotonic()
+            with client.stream(
+                "POST", "/api/youtube/download/mp3", json={"url": url}
+            ) as response:
+                if response.status_code != 200:
+                    return None
+                ttfb = None
+                for _ in response.iter_bytes():
+                    if ttfb is None:
+                        ttfb = time.monotonic() - started
+            return ttfb
+
+        results, seconds = run_concurrently(config.jobs, run_download)
+    return make_result(
+        "download",
+        results,
+        seconds,
+        sampler,
+        media_requests=server.requests,
+        media_failures=server.failures,
+    )
+
+
+def bench_listing(config: BenchmarkConfig) -> ScenarioResult:
+    """Stream config.jobs playlist listings of config.videos entries at once."""
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with synthetic_environment(config), ResourceSampler(".") as sampler:
+        for job in range(config.jobs):
+            ids = [video_id("listing", job, i) for i in range(config.videos)]
+            add_playlist(f"PLlist{job:05d}", ids)
+
+        def run_listing(job: int) -> Optional[float]:
+            client = TestClient(app)
+            url = f"https://www.youtube.com/playlist?list=PLlist{job:05d}"
+            started = time.monotonic()
+            ttfb = None
+            videos = 0
+            with client.stream(
+                "POST", "/api/youtube/playlist-info/stream", json={"url": url}
+            ) as response:
+                for line in response.iter_lines():
+                    if ttfb is None:
+                        ttfb = time.monotonic() - started
+                    record = json.loads(line)
+                    if record["type"] == "error":
+                        return None
+                    videos += record["type"] == "video"
+            return ttfb if videos == min(config.videos, 100) else None
+
+        results, seconds = run_concurrently(config.jobs, run_listing)
+    return make_result("listing", results, seconds, sampler)
+
+
+BENCHMARKS = {
+    "playlist": bench_playlist,
+    "download": bench_download,
+    "listing": bench_listing,
+}
+
+
+def run_benchmarks(config: BenchmarkConfig, scenarios) -> list[ScenarioResult]:
+    """Run the given scenarios one after the other."""
+    return [BENCHMARKS[scenario](config) for scenario in scenarios]
+
+
+def print_report(results: list[ScenarioResult]):
+    header = (
+        f"{'scenario':<10}{'jobs':>6}{'failed':>8}{'jobs/min':>10}"
+        f"{'ttfb p50':>10}{'ttfb p95':>10}{'disk MiB':>10}{'rss MiB':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        ttfb50 = f"{r.ttfb_p50:.3f}" if r.ttfb_p50 is not None else "-"
+        ttfb95 = f"{r.ttfb_p95:.3f}" if r.ttfb_p95 is not None else "-"
+        print(
+            f"{r.scenario:<10}{r.jobs:>6}{r.failed_jobs:>8}{r.jobs_per_minute:>10.1f}"
+            f"{ttfb50:>10}{ttfb95:>10}{r.peak_disk_bytes / 2**20:>10.1f}"
+            f"{r.peak_rss_bytes / 2**20:>9.1f}"
+        )
+        if r.details:
+            print(f"{'':<10}{r.details}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    defaults = BenchmarkConfig()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scenario", choices=(*SCENARIOS, "all"), default="all", help="What to run"
+    )
+    parser.add_argument("--jobs", type=int, default=defaults.jobs)
+    parser.add_argument(
+        "--videos", type=int, default=defaults.videos, help="Videos per playlist"
+    )
+    parser.add_argument(
+        "--video-size", type=int, default=defaults.video_size, help="Bytes"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=defaults.latency, help="Seconds to TTFB"
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=int,
+        default=defaults.bandwidth,
+        help="Bytes/s per connection, 0 for unlimited",
+    )
+    parser.add_argument("--failure-rate", type=float, default=defaults.failure_rate)
+    parser.add_argument(
+        "--extract-latency", type=float, default=defaults.extract_latency
+    )
+    parser.add_argument(
+        "--transcode-cost",
+        type=float,
+        default=defaults.transcode_cost,
+        help="CPU seconds per MiB",
+    )
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--json", action="store_true", help="Print JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show app logs")
+    args = parser.parse_args(argv)
+    if not args.verbose:
+        for name in ("", "audit"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+    config = BenchmarkConfig(
+        jobs=args.jobs,
+        videos=args.videos,
+        video_size=args.video_size,
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        failure_rate=args.failure_rate,
+        extract_latency=args.extract_latency,
+        transcode_cost=args.transcode_cost,
+        seed=args.seed,
+    )
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    results = run_benchmarks(config, scenarios)
+    if args.json:
+        print(
+            json.dumps(
+                {"config": asdict(config), "results": [asdict(r) for r in results]},
+                indent=2,
+            )
+        )
+    else:
+        print_report(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
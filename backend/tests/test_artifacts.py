@@ -0,0 +1,149 @@
+import os
+import time
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.artifacts import ArtifactStore, artifact_store, merge_ranges
+from app.services.jobs import job_registry
+
+
+def write_file(directory, name: str, content: bytes) -> str:
+    path = os.path.join(str(directory), name)
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+class TestArtifactStore:
+    """Test the leased artifact registry"""
+
+    def test_merge_ranges(self):
+        """Test that overlapping and adjacent ranges are merged"""
+        assert merge_ranges([(50, 100), (0, 10), (10, 20), (15, 40)]) == [
+            (0, 40),
+            (50, 100),
+        ]
+
+    def test_artifact_survives_until_lease_expires(self, tmp_path):
+        """Test that an artifact can be fetched repeatedly within its lease"""
+        store = ArtifactStore(lease_seconds=60)
+        path = write_file(tmp_path, "song.mp3", b"x" * 100)
+        artifact = store.publish(path, "song.mp3", "audio/mpeg")
+
+        assert store.get(artifact.artifact_id) is artifact
+        assert store.get(artifact.artifact_id) is artifact
+        assert store.expire() == 0
+        assert os.path.exists(path)
+
+        assert store.expire(now=time.time() + 120) == 100
+        assert store.get(artifact.artifact_id) is None
+        assert not os.path.exists(path)
+
+    def test_full_delivery_shortens_lease(self, tmp_path):
+        """Test that the lease is cut to the grace period once fully sent"""
+        store = ArtifactStore(lease_seconds=3600, completed_grace_seconds=0)
+        path = write_file(tmp_path, "song.mp3", b"x" * 100)
+        artifact = store.publish(path, "song.mp3", "audio/mpeg")
+
+        store.record_sent(artifact.artifact_id, 0, 60)
+        assert not artifact.fully_sent
+        assert store.get(artifact.artifact_id) is artifact
+
+        store.record_sent(artifact.artifact_id, 50, 100)
+        assert artifact.fully_sent
+        assert store.get(artifact.artifact_id) is None
+        assert not os.path.exists(path)
+
+    def test_borrowed_files_are_released_not_deleted(self, tmp_path):
+        """Test that an artifact over a shared file only calls its callback"""
+        store = ArtifactStore(lease_seconds=0)
+        path = write_file(tmp_path, "song.mp3", b"x" * 10)
+        released = []
+        store.publish(
+            path,
+            "song.mp3",
+            "audio/mpeg",
+            on_delete=lambda: released.append(True),
+            owns_file=False,
+        )
+
+        assert store.expire() == 0
+        assert released == [True]
+        assert os.path.exists(path)
+
+
+class TestArtifactEndpoints:
+    """Test re-downloading and resuming artifacts over HTTP"""
+
+    def test_range_requests_resume_download(self, tmp_path):
+        """Test that a download can be completed with a Range request"""
+        client = TestClient(app)
+        content = bytes(range(256)) * 40
+        path = write_file(tmp_path, "song.mp3", content)
+        artifact = artifact_store.publish(path, "song.mp3", "audio/mpeg")
+        url = f"/api/youtube/artifacts/{artifact.artifact_id}"
+
+        partial = client.get(url, headers={"Range": "bytes=0-999"})
+        assert partial.status_code == 206
+        assert partial.content == content[:1000]
+        assert partial.headers["accept-ranges"] == "bytes"
+        assert not artifact.fully_sent
+
+        rest = client.get(
+            url,
+            headers={"Range": "bytes=1000-", "If-Range": partial.headers["etag"]},
+        )
+        assert rest.status_code == 206
+        assert partial.content + rest.content == content
+        assert artifact.fully_sent
+
+        # Still downloadable during the grace period
+        again = client.get(url)
+        assert again.status_code == 200
+        assert again.content == content
+        artifact_store.remove(artifact.artifact_id)
+
+    def test_stale_if_range_sends_whole_file(self, tmp_path):
+        """Test that a mismatching If-Range falls back to the full file"""
+        client = TestClient(app)
+        path = write_file(tmp_path, "song.mp3", b"x" * 500)
+        artifact = artifact_store.publish(path, "song.mp3", "audio/mpeg")
+
+        response = client.get(
+            f"/api/youtube/artifacts/{artifact.artifact_id}",
+            headers={"Range": "bytes=100-", "If-Range": '"stale"'},
+        )
+        assert response.status_code == 200
+        assert len(response.content) == 500
+        artifact_store.remove(artifact.artifact_id)
+
+    def test_unknown_artifact(self):
+        """Test that unknown and malformed artifact IDs are rejected"""
+        client = TestClient(app)
+        assert client.get(f"/api/youtube/artifacts/{uuid.uuid4()}").status_code == 404
+        assert client.get("/api/youtube/artifacts/not-a-uuid").status_code == 400
+
+    def test_download_zip_can_be_repeated(self):
+        """Test that /download-zip no longer deletes the ZIP after one send"""
+        client = TestClient(app)
+        job_id = str(uuid.uuid4())
+        zip_name = f"playlist_{job_id}.zip"
+        os.makedirs("temp_downloads", exist_ok=True)
+        zip_path = write_file("temp_downloads", zip_name, b"PK" + b"z" * 100)
+        job_registry.set(job_id, {"status": "complete", "zip_name": zip_name})
+
+        url = f"/api/youtube/download-zip/?filename={zip_name}"
+        first = client.get(url)
+        second = client.get(url, headers={"Range": "bytes=50-"})
+
+        assert first.status_code == 200
+        assert second.status_code == 206
+        assert second.content == first.content[50:]
+        assert "content-location" in first.headers
+        assert os.path.exists(zip_path)
+
+        artifact_store.remove(first.headers["x-artifact-id"])
+        assert not os.path.exists(zip_path)
+        assert job_registry.get(job_id) is None
@@ -0,0 +1,147 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.bandwidth import (
+    BandwidthGovernor,
+    TokenBucket,
+    _Meter,
+    bandwidth_governor,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTokenBucket:
+    """Test the debt-based token bucket"""
+
+    def test_debt_is_repaid_at_the_rate(self):
+        """Test that overspending returns the time until back in budget"""
+        clock = FakeClock()
+        bucket = TokenBucket(100, clock=clock)
+
+        assert bucket.consume(100) == 0
+        assert bucket.consume(50) == 0.5
+        clock.now = 0.5
+        assert bucket.consume(0) == 0
+
+    def test_unlimited(self):
+        """Test that a rate of 0 never asks to wait"""
+        assert TokenBucket(0).consume(10**9) == 0
+
+
+class TestMeter:
+    """Test the utilization meter"""
+
+    def test_memory_is_bounded_by_the_window(self):
+        """Test that old chunks are dropped as new ones are counted"""
+        meter = _Meter()
+        for tick in range(10_000):
+            meter.add(tick / 100, 10)
+
+        # 100 chunks a second over the last five seconds
+        assert len(meter._buckets) <= 6
+        assert meter.rate(99.99) == 10 * 100 * 5 / 5
+
+
+class TestBandwidthGovernor:
+    """Test the shared bandwidth budget"""
+
+    def test_job_share_caps_a_single_job(self):
+        """Test that one job is held to its share of the global limit"""
+        governor = BandwidthGovernor(limit=1000, job_share=0.5)
+
+        # The job's burst is half of the global one
+        assert governor.consume(500, "job") == 0
+        assert governor.consume(250, "job") > 0
+        # Another job still has budget of its own
+        assert governor.consume(250, "other") == 0
+
+    def test_global_limit_applies_across_jobs(self):
+        """Test that jobs together cannot exceed the global limit"""
+        governor = BandwidthGovernor(limit=1000, job_share=1.0)
+        governor.consume(1000, "a")
+        assert governor.consume(500, "b") > 0
+
+    def test_hook_charges_per_file_deltas(self):
+        """Test that the hook counts each file's new bytes once"""
+        sleeps = []
+        governor = BandwidthGovernor(limit=1000, job_share=1.0, sleep=sleeps.append)
+        hook = governor.progress_hook("job")
+
+        for status, name, received in [
+            ("downloading", "v.part", 600),
+            ("downloading", "v.part", 900),
+            ("downloading", "a.part", 600),
+            ("finished", "a.part", 600),
+        ]:
+            hook(
+                {"status": status, "tmpfilename": name, "downloaded_bytes": received}
+            )
+
+        assert governor.stats()["used"] == round(1500 / 5)
+        assert len(sleeps) == 1
+        assert 0.4 < sleeps[0] <= 0.5
+
+    def test_cancel_ends_a_pause(self):
+        """Test that a cancelled download is not held back"""
+        governor = BandwidthGovernor(limit=10, job_share=1.0)
+        cancel = threading.Event()
+        cancel.set()
+        hook = governor.progress_hook("job", cancel)
+        # Would otherwise sleep for about 100 seconds
+        hook({"status": "downloading", "filename": "v", "downloaded_bytes": 1000})
+
+    def test_configure_at_runtime(self):
+        """Test that new limits apply to existing buckets"""
+        governor = BandwidthGovernor(limit=1000, job_share=0.5)
+        governor.consume(500, "job")
+        governor.configure(limit=0)
+
+        assert governor.consume(10**9, "job") == 0
+        stats = governor.stats()
+        assert stats["limit"] == 0
+        assert stats["utilization"] is None
+        assert stats["active_jobs"] == 1
+
+
+class TestBandwidthEndpoints:
+    """Test reporting and changing the bandwidth budget"""
+
+    def test_report(self):
+        """Test that utilization is reported without job IDs"""
+        response = TestClient(app).get("/api/youtube/bandwidth")
+        assert response.status_code == 200
+        assert set(response.json()) >= {"limit", "used", "utilization"}
+
+    def test_change_requires_admin_token(self, monkeypatch):
+        """Test that only the admin can change the limits"""
+        client = TestClient(app)
+        url = "/api/youtube/bandwidth"
+        monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+        assert client.put(url, json={"limit": 1}).status_code == 403
+
+        monkeypatch.setenv("ADMIN_TOKEN", "secret")
+        wrong = client.put(url, json={"limit": 1}, headers={"X-Admin-Token": "x"})
+        assert wrong.status_code == 403
+
+        previous = bandwidth_governor.stats()
+        response = client.put(
+            url,
+            json={"limit": 5_000_000, "job_share": 0.25},
+            headers={"X-Admin-Token": "secret"},
+        )
+        assert response.status_code == 200
+        assert response.json()["job_limit"] == 1_250_000
+        invalid = client.put(
+            url, json={"job_share": 2}, headers={"X-Admin-Token": "secret"}
+        )
+        assert invalid.status_code == 422
+        bandwidth_governor.configure(previous["limit"], previous["job_share"])
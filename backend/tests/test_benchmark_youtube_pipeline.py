@@ -0,0 +1,37 @@
+import yt_dlp
+
+from app.routers import youtube_downloader
+from tests.benchmark_youtube_pipeline import BenchmarkConfig, run_benchmarks
+
+
+class TestBenchmarkHarness:
+    """Smoke test the offline pipeline benchmark on a tiny workload"""
+
+    def test_all_scenarios_complete(self):
+        """Test that every scenario runs end to end and restores the router"""
+        config = BenchmarkConfig(
+            jobs=2, videos=2, video_size=64 * 1024, latency=0, extract_latency=0
+        )
+        youtube_dl = yt_dlp.YoutubeDL
+
+        results = run_benchmarks(config, ("playlist", "download", "listing"))
+
+        assert [r.scenario for r in results] == ["playlist", "download", "listing"]
+        for result in results:
+            assert result.failed_jobs == 0
+            assert result.jobs_per_minute > 0
+            assert result.ttfb_p50 is not None
+        assert results[0].peak_disk_bytes > 0
+        assert youtube_downloader.yt_dlp.YoutubeDL is youtube_dl
+        assert youtube_downloader.limiter.enabled
+
+    def test_failures_are_counted(self):
+        """Test that failing media requests show up as failed jobs"""
+        config = BenchmarkConfig(
+            jobs=2, videos=1, video_size=1024, latency=0, failure_rate=1.0
+        )
+
+        (result,) = run_benchmarks(config, ("download",))
+
+        assert result.failed_jobs == 2
+        assert result.details["media_failures"] == 2
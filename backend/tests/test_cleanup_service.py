@@ -6,12 +6,10 @@ from pathlib import Path
 import pytest
 
 from app.services.cleanup import (
-    check_disk_space_available,
+    DiskSpaceUnavailable,
     cleanup_temporary_files,
     get_directory_size,
-    get_total_disk_usage,
-    MAX_DIR_SIZE_GB,
-    DISK_USAGE_THRESHOLD,
+    reserve_disk_space,
 )
 
 
@@ -94,81 +92,6 @@ class TestCleanupService:
             finally:
                 cleanup_module.TEMP_DIRS = original_temp_dirs
 
-    def test_get_total_disk_usage(self):
-        """Test getting total disk usage across all temp directories"""
-        with tempfile.TemporaryDirectory() as temp_dir1, \
-             tempfile.TemporaryDirectory() as temp_dir2:
-            import app.services.cleanup as cleanup_module
-
-            original_temp_dirs = cleanup_module.TEMP_DIRS
-            cleanup_module.TEMP_DIRS = [temp_dir1, temp_dir2]
-
-            try:
-                # Create files in both directories
-                temp_path1 = Path(temp_dir1)
-                file1 = temp_path1 / "test1.txt"
-                file1.write_text("x" * 1024)  # 1KB
-
-                temp_path2 = Path(temp_dir2)
-                file2 = temp_path2 / "test2.txt"
-                file2.write_text("x" * 2048)  # 2KB
-
-                total_bytes, max_bytes = get_total_disk_usage()
-
-                # Should be sum of both files
-                assert total_bytes == 1024 + 2048
-                # Max should be 25GB in bytes
-                assert max_bytes == int(MAX_DIR_SIZE_GB * (1024**3))
-
-            finally:
-                cleanup_module.TEMP_DIRS = original_temp_dirs
-
-    def test_check_disk_space_available_under_threshold(self):
-        """Test that check_disk_space_available returns True when under threshold"""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            import app.services.cleanup as cleanup_module
-
-            original_temp_dirs = cleanup_module.TEMP_DIRS
-            cleanup_module.TEMP_DIRS = [temp_dir]
-
-            try:
-                # Create a small file (well under threshold)
-                temp_path = Path(temp_dir)
-                small_file = temp_path / "small.txt"
-                small_file.write_text("x" * 1024)  # 1KB
-
-                # Should have plenty of space
-                assert check_disk_space_available() is True
-
-            finally:
-                cleanup_module.TEMP_DIRS = original_temp_dirs
-
-    def test_check_disk_space_available_over_threshold(self):
-        """Test that check_disk_space_available returns False when over threshold"""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            import app.services.cleanup as cleanup_module
-
-            original_temp_dirs = cleanup_module.TEMP_DIRS
-            original_max_dir_size = cleanup_module.MAX_DIR_SIZE_GB
-            
-            # Temporarily set a very small max size for testing
-            cleanup_module.TEMP_DIRS = [temp_dir]
-            cleanup_module.MAX_DIR_SIZE_GB = 0.000001  # ~1KB
-
-            try:
-                # Create a file larger than threshold
-                temp_path = Path(temp_dir)
-                large_file = temp_path / "large.txt"
-                # Create file larger than 90% of 1KB
-                large_file.write_text("x" * 2048)  # 2KB
-
-                # Should be over threshold
-                assert check_disk_space_available() is False
-
-            finally:
-                cleanup_module.TEMP_DIRS = original_temp_dirs
-                cleanup_module.MAX_DIR_SIZE_GB = original_max_dir_size
-
     def test_cleanup_handles_nonexistent_directory(self):
         """Test that cleanup handles non-existent directories gracefully"""
         import app.services.cleanup as cleanup_module
@@ -190,3 +113,212 @@ class TestCleanupService:
                 shutil.rmtree(test_dir)
         finally:
             cleanup_module.TEMP_DIRS = original_temp_dirs
+
+
+class TestDiskReservation:
+    """Test admission by reserving disk space"""
+
+    @pytest.fixture(autouse=True)
+    def small_limits(self, tmp_path, monkeypatch):
+        import app.services.cleanup as cleanup_module
+        from app.services.disk_usage import DiskUsageLedger
+
+        monkeypatch.setattr(cleanup_module, "TEMP_DIRS", [str(tmp_path)])
+        monkeypatch.setattr(cleanup_module, "MAX_DIR_SIZE_GB", 1000 / 1024**3)
+        monkeypatch.setattr(cleanup_module, "DISK_USAGE_THRESHOLD", 1.0)
+        monkeypatch.setattr(cleanup_module, "CLIENT_DISK_QUOTA_GB", 600 / 1024**3)
+        monkeypatch.setattr(cleanup_module, "disk_usage", DiskUsageLedger())
+
+    def test_usage_matches_the_files_after_reconcile(self, tmp_path, monkeypatch):
+        """Test that the ledger adds up the files of every temp directory"""
+        import app.services.cleanup as cleanup_module
+        from app.services.cleanup import reconcile_disk_usage
+
+        first, second = tmp_path / "uploads", tmp_path / "temp_downloads"
+        first.mkdir()
+        second.mkdir()
+        monkeypatch.setattr(cleanup_module, "TEMP_DIRS", [str(first), str(second)])
+        (first / "test1.txt").write_text("x" * 1024)
+        (second / "test2.txt").write_text("x" * 2048)
+
+        assert reconcile_disk_usage() == 1024 + 2048
+        assert cleanup_module.disk_usage.usage(cleanup_module.TEMP_DIRS) == 3072
+
+        # Files written behind the ledger's back are found by the next run
+        (second / "test3.txt").write_text("x" * 512)
+        assert reconcile_disk_usage() == 3072 + 512
+
+    def test_admitted_under_the_limit(self, tmp_path):
+        """Test that a request fitting next to the stored files is admitted"""
+        (tmp_path / "small.txt").write_text("x" * 100)
+
+        reservation = reserve_disk_space("a", 500)
+        reservation.release()
+
+    def test_refused_over_the_limit(self, tmp_path):
+        """Test that stored files over the limit refuse every request"""
+        (tmp_path / "large.txt").write_text("x" * 2048)
+
+        with pytest.raises(DiskSpaceUnavailable) as excinfo:
+            reserve_disk_space("a", 1)
+        assert excinfo.value.quota_exceeded is False
+
+    def test_reservations_fill_the_service_limit(self):
+        """Test that admission fails once reservations use up the storage"""
+        reserve_disk_space("a", 500)
+        reserve_disk_space("b", 500)
+
+        with pytest.raises(DiskSpaceUnavailable) as excinfo:
+            reserve_disk_space("c", 1)
+        assert excinfo.value.quota_exceeded is False
+
+    def test_client_quota_exceeded(self):
+        """Test that a client over its quota is told so"""
+        reservation = reserve_disk_space("a", 500)
+
+        with pytest.raises(DiskSpaceUnavailable) as excinfo:
+            reserve_disk_space("a", 200)
+        assert excinfo.value.quota_exceeded is True
+
+        reservation.release()
+        reserve_disk_space("a", 200)
+
+
+class TestTempFileRegistry:
+    """Test expiry and eviction through the temp file registry"""
+
+    def test_expires_in_deadline_order(self, tmp_path):
+        """Test that only entries whose deadline passed are deleted"""
+        from app.services.cleanup import TempFileRegistry
+
+        registry = TempFileRegistry()
+        now = time.time()
+        early = tmp_path / "early.bin"
+        early.write_bytes(b"x" * 10)
+        late = tmp_path / "late.bin"
+        late.write_bytes(b"x" * 20)
+        registry.register(str(late), expires_at=now + 100)
+        registry.register(str(early), expires_at=now + 10)
+
+        assert registry.expire(now=now + 50) == 10
+        assert not early.exists()
+        assert late.exists()
+
+    def test_rescheduled_entry_expires_at_its_new_deadline(self, tmp_path):
+        """Test that an outdated deadline in the heap is ignored"""
+        from app.services.cleanup import TempFileRegistry
+
+        registry = TempFileRegistry()
+        now = time.time()
+        path = tmp_path / "file.bin"
+        path.write_bytes(b"x")
+        key = registry.register(str(path), expires_at=now + 10)
+        registry.reschedule(key, now + 100)
+
+        assert registry.expire(now=now + 50) == 0
+        assert path.exists()
+        assert registry.expire(now=now + 150) == 1
+
+    def test_owner_takes_over_an_adopted_file(self, tmp_path):
+        """Test that a file adopted by reconcile expires only with its owner"""
+        import os
+
+        from app.services.cleanup import TempFileRegistry
+
+        registry = TempFileRegistry()
+        now = time.time()
+        path = tmp_path / "playlist.zip"
+        path.write_bytes(b"x" * 10)
+        os.utime(path, (now, now))
+        assert registry.reconcile([str(tmp_path)]) == 1
+
+        registry.register(str(path), expires_at=now + 10**6, key="artifact:1")
+        assert registry.expire(now=now + 10**5) == 0
+        assert path.exists()
+        assert registry.stats()["entries"] == 1
+
+    def test_leased_entries_survive_expiry_and_eviction(self, tmp_path):
+        """Test that a file being read is deleted only after its lease ends"""
+        from app.services.cleanup import TempFileRegistry
+
+        registry = TempFileRegistry()
+        now = time.time()
+        leased = tmp_path / "leased.bin"
+        leased.write_bytes(b"x" * 10)
+        other = tmp_path / "other.bin"
+        other.write_bytes(b"x" * 10)
+        registry.register(str(leased), expires_at=now + 10)
+        registry.register(str(other), expires_at=now + 20)
+
+        with registry.lease(str(leased)):
+            assert registry.expire(now=now + 15) == 0
+            assert registry.evict(10) == 10
+            assert leased.exists()
+            assert not other.exists()
+
+        assert registry.expire(now=now + 15) == 10
+        assert not leased.exists()
+
+    def test_reconcile_adopts_nested_directories(self, tmp_path):
+        """Test that unregistered directories are adopted and expire whole"""
+        from app.services.cleanup import TEMP_FILE_TTL_SECONDS, TempFileRegistry
+
+        registry = TempFileRegistry()
+        job_dir = tmp_path / "temp" / "job"
+        job_dir.mkdir(parents=True)
+        (job_dir / "part.webm").write_bytes(b"x" * 30)
+        media = tmp_path / "temp" / "media"
+        media.mkdir()
+
+        assert registry.reconcile([str(tmp_path / "temp")], skip=[str(media)]) == 1
+        assert registry.stats()["bytes"] == 30
+        assert registry.expire(now=time.time() + TEMP_FILE_TTL_SECONDS + 1) == 30
+        assert not job_dir.exists()
+        assert media.exists()
+
+    def test_reconcile_leaves_zips_of_unfinished_jobs(self, tmp_path, monkeypatch):
+        """Test that a job's partial ZIP is not adopted while the job runs"""
+        import app.services.cleanup as cleanup_module
+        from app.services.cleanup import (
+            TEMP_FILE_TTL_SECONDS,
+            TempFileRegistry,
+            reconcile_temp_files,
+        )
+        from app.services.jobs import JobRegistry
+
+        registry = TempFileRegistry()
+        jobs = JobRegistry()
+        jobs.set("running", {"status": "processing", "zip_name": "Mix_running.zip"})
+        jobs.set("failed", {"status": "error", "zip_name": "Mix_failed.zip"})
+        monkeypatch.setattr(cleanup_module, "TEMP_DIRS", [str(tmp_path)])
+        monkeypatch.setattr(cleanup_module, "temp_files", registry)
+        monkeypatch.setattr(cleanup_module, "job_registry", jobs)
+        building = tmp_path / "Mix_running.zip.part"
+        building.write_bytes(b"x" * 10)
+        leftover = tmp_path / "Mix_failed.zip.part"
+        leftover.write_bytes(b"x" * 10)
+
+        assert reconcile_temp_files() == 1
+        assert registry.expire(now=time.time() + TEMP_FILE_TTL_SECONDS + 1) == 10
+        assert building.exists()
+        assert not leftover.exists()
+
+    def test_artifact_being_sent_is_not_expired(self, tmp_path):
+        """Test that an artifact's lease on its file defers its deletion"""
+        from app.services.artifacts import ArtifactStore
+        from app.services.cleanup import TempFileRegistry
+
+        registry = TempFileRegistry()
+        store = ArtifactStore(lease_seconds=0, registry=registry)
+        path = tmp_path / "playlist.zip"
+        path.write_bytes(b"x" * 10)
+        artifact = store.publish(str(path), "playlist.zip", "application/zip")
+
+        with registry.lease(str(path)):
+            assert store.get(artifact.artifact_id) is None
+            assert registry.expire() == 0
+            assert path.exists()
+
+        assert registry.expire() == 10
+        assert not path.exists()
+        assert store.stats()["artifacts"] == 0
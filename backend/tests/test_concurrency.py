@@ -0,0 +1,110 @@
+from app.services.concurrency import AdaptiveConcurrency, is_throttling_error
+
+MB = 1024 * 1024
+
+
+def make_controller(**kwargs):
+    """Return a controller and the list of limits it applied."""
+    applied = []
+    controller = AdaptiveConcurrency(apply=applied.append, **kwargs)
+    return controller, applied
+
+
+class TestAdaptiveConcurrency:
+    """Test the AIMD download concurrency controller"""
+
+    def test_additive_increase_while_backlogged(self):
+        """Test that the limit grows by about one per limit downloads"""
+        controller, applied = make_controller(max_limit=8, initial_limit=2)
+        assert applied == [2]
+
+        for _ in range(2):
+            controller.record_download(4 * MB, 2)
+        assert controller.limit == 2
+        controller.record_download(4 * MB, 2)
+        assert controller.limit == 3
+        assert applied == [2, 3]
+
+    def test_no_increase_without_waiting_downloads(self):
+        """Test that an idle scheduler does not inflate the limit"""
+        controller, _ = make_controller(
+            max_limit=8, initial_limit=2, is_backlogged=lambda: False
+        )
+        for _ in range(10):
+            controller.record_download(4 * MB, 2)
+        assert controller.limit == 2
+        assert controller.decisions()[-1]["reason"] == "hold"
+
+    def test_limit_stays_within_bounds(self):
+        """Test that the limit never exceeds max_limit or drops below one"""
+        controller, _ = make_controller(max_limit=3, initial_limit=3)
+        for _ in range(20):
+            controller.record_download(4 * MB, 2)
+        assert controller.limit == 3
+        for _ in range(5):
+            controller.record_error("HTTP Error 429: Too Many Requests")
+        assert controller.limit == 1
+
+    def test_throttling_halves_the_limit(self):
+        """Test that extractor throttling causes a multiplicative decrease"""
+        controller, applied = make_controller(max_limit=8, initial_limit=8)
+
+        controller.record_error("Video unavailable")
+        assert controller.limit == 8
+        controller.record_error("ERROR: HTTP Error 429: Too Many Requests")
+        assert controller.limit == 4
+        assert applied[-1] == 4
+        assert controller.decisions()[-1]["reason"] == "throttled"
+
+    def test_cpu_pressure_decreases_the_limit(self):
+        """Test that a transcode backlog lowers the download limit"""
+        controller, _ = make_controller(
+            max_limit=8, initial_limit=8, cpu_pressure=lambda: 3.0
+        )
+        controller.record_download(4 * MB, 2)
+        assert controller.limit == 6
+        assert controller.decisions()[-1]["reason"] == "cpu_saturated"
+
+    def test_bandwidth_drop_decreases_the_limit(self):
+        """Test that falling per-download bandwidth lowers the limit"""
+        controller, _ = make_controller(max_limit=8, initial_limit=6)
+        controller.record_download(10 * MB, 1)
+        for _ in range(5):
+            controller.record_download(1 * MB, 1)
+        assert controller.limit < 6
+        assert "bandwidth_saturated" in {
+            d["reason"] for d in controller.decisions()
+        }
+
+    def test_progress_hook_reports_finished_transfers(self):
+        """Test that only finished yt-dlp transfers are counted"""
+        controller, _ = make_controller(max_limit=8, initial_limit=2)
+        controller.progress_hook({"status": "downloading", "downloaded_bytes": 1})
+        assert controller.decisions() == []
+        controller.progress_hook(
+            {"status": "finished", "downloaded_bytes": 4 * MB, "elapsed": 2}
+        )
+        assert controller.stats()["bandwidth"] == 2 * MB
+
+    def test_throttling_markers(self):
+        """Test the recognition of throttling errors"""
+        assert is_throttling_error("HTTP Error 429: Too Many Requests")
+        assert is_throttling_error("Sign in to confirm you're not a bot")
+        assert not is_throttling_error("Private video")
+
+
+class TestConcurrencyEndpoint:
+    """Test the concurrency report"""
+
+    def test_report(self):
+        """Test that the controller state and decisions are exposed"""
+        from fastapi.testclient import TestClient
+
+        from app.main import app
+
+        response = TestClient(app).get("/api/youtube/concurrency")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["controller"]["limit"] >= 1
+        assert "concurrency_limit" in body["scheduler"]
+        assert isinstance(body["decisions"], list)
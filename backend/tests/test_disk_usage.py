@@ -0,0 +1,147 @@
+import os
+
+from app.services import disk_usage as disk_usage_module
+from app.services.artifacts import ArtifactStore
+from app.services.disk_usage import DiskUsageLedger
+from app.services.streaming_zip import StreamingZipWriter
+
+
+def write(path, size: int) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return str(path)
+
+
+class TestDiskUsageLedger:
+    """Test the running disk usage total"""
+
+    def test_usage_is_built_once_then_looked_up(self, tmp_path, monkeypatch):
+        """Test that only the first lookup walks the directories"""
+        write(tmp_path / "a" / "one.bin", 100)
+        write(tmp_path / "a" / "nested" / "two.bin", 50)
+        ledger = DiskUsageLedger()
+
+        assert ledger.usage([str(tmp_path / "a")]) == 150
+
+        def no_walk(*args, **kwargs):
+            raise AssertionError("directories walked again")
+
+        monkeypatch.setattr(disk_usage_module.os, "walk", no_walk)
+        assert ledger.usage([str(tmp_path / "a")]) == 150
+
+    def test_record_and_forget(self, tmp_path):
+        """Test that reported writes and deletions adjust the total"""
+        directory = tmp_path / "temp"
+        directory.mkdir()
+        ledger = DiskUsageLedger()
+        ledger.usage([str(directory)])
+
+        path = write(directory / "file.bin", 10)
+        ledger.record(path)
+        ledger.record(path, 30)
+        assert ledger.usage([str(directory)]) == 30
+
+        staged = write(directory / "staging" / "part.bin", 5)
+        ledger.record(staged)
+        ledger.forget(str(directory / "staging"))
+        ledger.forget(path)
+        assert ledger.usage([str(directory)]) == 0
+
+    def test_files_outside_the_directories_are_ignored(self, tmp_path):
+        """Test that only files in the accounted directories are counted"""
+        (tmp_path / "temp").mkdir()
+        ledger = DiskUsageLedger()
+        ledger.usage([str(tmp_path / "temp")])
+
+        ledger.record(write(tmp_path / "temp-other" / "file.bin", 10))
+        assert ledger.usage([str(tmp_path / "temp")]) == 0
+
+    def test_reconcile_corrects_drift(self, tmp_path):
+        """Test that unreported files are picked up by reconciliation"""
+        directory = tmp_path / "temp"
+        directory.mkdir()
+        ledger = DiskUsageLedger()
+        ledger.usage([str(directory)])
+        write(directory / "unreported.bin", 64)
+
+        assert ledger.usage([str(directory)]) == 0
+        assert ledger.reconcile() == 64
+        assert ledger.stats()["last_drift"] == 64
+        assert ledger.usage([str(directory)]) == 64
+
+
+class TestLedgerReporting:
+    """Test that the file-producing services report to the ledger"""
+
+    def test_artifacts_and_zips_are_reported(self, tmp_path, monkeypatch):
+        """Test that publishing, zipping and deleting keep the ledger current"""
+        temp = tmp_path / "temp"
+        temp.mkdir()
+        ledger = DiskUsageLedger()
+        ledger.usage([str(temp)])
+        monkeypatch.setattr("app.services.artifacts.disk_usage", ledger)
+        monkeypatch.setattr("app.services.streaming_zip.disk_usage", ledger)
+
+        # The source is outside the accounted directory
+        source = write(tmp_path / "media" / "song.mp3", 1000)
+        writer = StreamingZipWriter(str(temp / "mix.zip"))
+        writer.add_file(source, "song.mp3")
+        writer.close()
+        zip_size = os.path.getsize(temp / "mix.zip")
+
+        store = ArtifactStore()
+        artifact = store.publish(str(temp / "mix.zip"), "mix.zip", "x/zip")
+        assert ledger.usage([str(temp)]) == zip_size
+        assert ledger.reconcile() == zip_size
+
+        store.remove(artifact.artifact_id)
+        assert ledger.usage([str(temp)]) == 0
+
+
+class TestDiskReservations:
+    """Test reserving storage at admission"""
+
+    def make_ledger(self, tmp_path, stored: int = 0) -> DiskUsageLedger:
+        directory = tmp_path / "temp"
+        directory.mkdir()
+        if stored:
+            write(directory / "stored.bin", stored)
+        ledger = DiskUsageLedger()
+        ledger.usage([str(directory)])
+        return ledger
+
+    def test_concurrent_reservations_cannot_overrun_the_limit(self, tmp_path):
+        """Test that reservations count against the limit until settled"""
+        ledger = self.make_ledger(tmp_path, stored=40)
+
+        first = ledger.reserve("a", 40, limit=100, client_limit=1000)
+        assert first is not None
+        assert ledger.reserve("b", 40, limit=100, client_limit=1000) is None
+        assert ledger.reserved() == 40
+
+        first.release()
+        assert ledger.reserve("b", 40, limit=100, client_limit=1000) is not None
+
+    def test_client_quota(self, tmp_path):
+        """Test that one client cannot take more than its quota"""
+        ledger = self.make_ledger(tmp_path)
+
+        assert ledger.reserve("a", 60, limit=1000, client_limit=100) is not None
+        assert ledger.reserve("a", 60, limit=1000, client_limit=100) is None
+        assert ledger.reserve("b", 60, limit=1000, client_limit=100) is not None
+        assert ledger.client_usage("a") == 60
+
+    def test_settled_reservation_only_charges_the_quota(self, tmp_path):
+        """Test that settling swaps the estimate for the size that was kept"""
+        ledger = self.make_ledger(tmp_path)
+        reservation = ledger.reserve("a", 80, limit=1000, client_limit=100)
+
+        reservation.settle(30)
+        assert ledger.reserved() == 0
+        assert ledger.client_usage("a") == 30
+        assert ledger.stats()["reservations"] == 1
+
+        reservation.release()
+        assert ledger.client_usage("a") == 0
+        assert ledger.stats()["reservations"] == 0
@@ -0,0 +1,139 @@
+import threading
+import time
+
+from app.services.download_scheduler import DownloadScheduler
+
+
+class TestDownloadScheduler:
+    """Test the process-wide download scheduler"""
+
+    def test_runs_tasks_and_returns_results(self):
+        """Test that submitted work runs and its result is delivered"""
+        scheduler = DownloadScheduler(max_workers=2)
+        future = scheduler.submit("client", lambda a, b: a * b, 6, 7)
+        assert future.result(timeout=2) == 42
+        scheduler.shutdown()
+
+    def test_exceptions_are_propagated(self):
+        """Test that a failing task fails its future"""
+        scheduler = DownloadScheduler(max_workers=1)
+
+        def fail():
+            raise ValueError("boom")
+
+        future = scheduler.submit("client", fail)
+        assert isinstance(future.exception(timeout=2), ValueError)
+        scheduler.shutdown()
+
+    def test_fair_round_robin_across_clients(self):
+        """Test that a client with many tasks cannot starve another client"""
+        scheduler = DownloadScheduler(max_workers=1)
+        gate = threading.Event()
+        order = []
+
+        # Occupy the only worker so the queue builds up
+        blocker = scheduler.submit("heavy", gate.wait)
+        time.sleep(0.05)
+        heavy = [scheduler.submit("heavy", order.append, f"h{i}") for i in range(4)]
+        light = [scheduler.submit("light", order.append, f"l{i}") for i in range(2)]
+        gate.set()
+        for future in [blocker, *heavy, *light]:
+            future.result(timeout=2)
+
+        assert order == ["h0", "l0", "h1", "l1", "h2", "h3"]
+        scheduler.shutdown()
+
+    def test_worker_budget_is_respected(self):
+        """Test that no more than max_workers tasks run at once"""
+        scheduler = DownloadScheduler(max_workers=2)
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def work():
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+
+        futures = [scheduler.submit(f"c{i % 3}", work) for i in range(9)]
+        for future in futures:
+            future.result(timeout=5)
+        assert peak == 2
+        scheduler.shutdown()
+
+    def test_concurrency_limit_can_change_at_runtime(self):
+        """Test that the global limit caps running tasks and can be raised"""
+        scheduler = DownloadScheduler(max_workers=4)
+        scheduler.set_concurrency_limit(1)
+        gate = threading.Event()
+        started = []
+
+        def work(name):
+            started.append(name)
+            gate.wait(timeout=2)
+
+        futures = [scheduler.submit("client", work, i) for i in range(3)]
+        time.sleep(0.1)
+        assert len(started) == 1
+        assert scheduler.is_backlogged()
+
+        scheduler.set_concurrency_limit(10)
+        time.sleep(0.1)
+        assert len(started) == 3
+        assert scheduler.stats()["concurrency_limit"] == 4
+        gate.set()
+        for future in futures:
+            future.result(timeout=2)
+        assert not scheduler.is_backlogged()
+        scheduler.shutdown()
+
+    def test_job_limit(self):
+        """Test that a job cannot use more workers than its limit"""
+        scheduler = DownloadScheduler(max_workers=4)
+        scheduler.set_job_limit("job", 1)
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def work():
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+
+        futures = [scheduler.submit("c", work, job_id="job") for _ in range(4)]
+        for future in futures:
+            future.result(timeout=5)
+        assert peak == 1
+        scheduler.shutdown()
+
+    def test_queue_position_and_cancel(self):
+        """Test queue positions under round-robin and cancelling queued work"""
+        scheduler = DownloadScheduler(max_workers=1)
+        gate = threading.Event()
+        scheduler.submit("a", gate.wait)
+        time.sleep(0.05)
+        a1 = scheduler.submit("a", lambda: None)
+        a2 = scheduler.submit("a", lambda: None)
+        b1 = scheduler.submit("b", lambda: None)
+
+        # Dispatch order is a1, b1, a2
+        assert scheduler.queue_position(a1) == 0
+        assert scheduler.queue_position(b1) == 1
+        assert scheduler.queue_position(a2) == 2
+        assert scheduler.stats()["queued"] == 3
+
+        assert a1.cancel()
+        gate.set()
+        b1.result(timeout=2)
+        a2.result(timeout=2)
+        assert a1.cancelled()
+        assert scheduler.queue_position(a2) is None
+        scheduler.shutdown()
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.executors import (
+    BlockingWorkPool,
+    WorkPoolBusyError,
+    WorkPoolTimeoutError,
+)
+
+
+class TestBlockingWorkPool:
+    """Test the bounded pools used for blocking work in async endpoints"""
+
+    def test_returns_result(self):
+        """Test that the result of the blocking call is returned"""
+        pool = BlockingWorkPool("test", max_workers=1, timeout=5)
+        assert asyncio.run(pool.run(lambda a, b: a + b, 2, 3)) == 5
+
+    def test_event_loop_stays_responsive(self):
+        """Test that other coroutines run while blocking work is in progress"""
+        pool = BlockingWorkPool("test", max_workers=1, timeout=5)
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.02)
+
+        async def scenario():
+            await asyncio.gather(pool.run(time.sleep, 0.3), ticker())
+
+        started = time.monotonic()
+        asyncio.run(scenario())
+        # All ticks happened long before the blocking call finished
+        assert ticks[-1] - started < 0.25
+
+    def test_concurrency_cap(self):
+        """Test that no more than max_workers calls run at once"""
+        pool = BlockingWorkPool("test", max_workers=2, timeout=5)
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def work():
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+
+        async def scenario():
+            await asyncio.gather(*(pool.run(work) for _ in range(6)))
+
+        asyncio.run(scenario())
+        assert peak == 2
+
+    def test_busy_error_when_no_slot_frees_up(self):
+        """Test that callers give up when every slot stays taken"""
+        pool = BlockingWorkPool("test", max_workers=1, timeout=5, queue_timeout=0.05)
+
+        async def scenario():
+            first = asyncio.create_task(pool.run(time.sleep, 0.3))
+            await asyncio.sleep(0.01)
+            with pytest.raises(WorkPoolBusyError):
+                await pool.run(time.sleep, 0)
+            await first
+
+        asyncio.run(scenario())
+
+    def test_timeout_keeps_slot_until_work_finishes(self):
+        """Test that a timed-out call still counts against the cap"""
+        pool = BlockingWorkPool("test", max_workers=1, timeout=0.05)
+
+        async def scenario():
+            with pytest.raises(WorkPoolTimeoutError):
+                await pool.run(time.sleep, 0.3)
+            assert pool.stats()["active"] == 1
+            await asyncio.sleep(0.4)
+            assert pool.stats()["active"] == 0
+
+        asyncio.run(scenario())
+
+    def test_stream_yields_items_and_errors(self):
+        """Test that streamed items arrive in order and errors propagate"""
+        pool = BlockingWorkPool("test", max_workers=1, timeout=5)
+
+        def produce():
+            yield 1
+            yield 2
+            raise ValueError("boom")
+
+        async def scenario():
+            items = []
+            with pytest.raises(ValueError):
+                async for item in pool.stream(produce):
+                    items.append(item)
+            return items
+
+        assert asyncio.run(scenario()) == [1, 2]
+
+    def test_stream_stops_when_consumer_stops(self):
+        """Test that the thread stops producing once the consumer goes away"""
+        pool = BlockingWorkPool("test", max_workers=1, timeout=5)
+        produced = []
+
+        def produce():
+            for i in range(100):
+                produced.append(i)
+                time.sleep(0.01)
+                yield i
+
+        async def scenario():
+            stream = pool.stream(produce)
+            async for item in stream:
+                if item == 2:
+                    break
+            await stream.aclose()
+            await asyncio.sleep(0.1)
+            # The slot is free again once the thread stopped
+            return await pool.run(lambda: "free")
+
+        assert asyncio.run(scenario()) == "free"
+        assert len(produced) < 10
@@ -0,0 +1,218 @@
+import os
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.jobs import JobRegistry, job_registry
+
+
+class TestJobRegistry:
+    """Test the in-process job registry"""
+
+    def test_get_unknown_job(self):
+        """Test that unknown jobs return None"""
+        registry = JobRegistry()
+        assert registry.get("missing") is None
+
+    def test_set_and_get(self):
+        """Test that a published state can be read back"""
+        registry = JobRegistry()
+        registry.set("job", {"status": "initializing", "current": 0, "total": 3})
+        assert registry.get("job") == {
+            "status": "initializing",
+            "current": 0,
+            "total": 3,
+        }
+
+    def test_snapshots_are_not_mutated(self):
+        """Test that a snapshot handed to a reader never changes afterwards"""
+        registry = JobRegistry()
+        registry.set("job", {"status": "processing", "current": 1})
+        snapshot = registry.get("job")
+        registry.update("job", current=2)
+        assert snapshot["current"] == 1
+        assert registry.get("job")["current"] == 2
+        assert registry.get("job")["status"] == "processing"
+
+    def test_remove(self):
+        """Test that removed jobs are forgotten"""
+        registry = JobRegistry()
+        registry.set("job", {"status": "complete"})
+        registry.remove("job")
+        assert registry.get("job") is None
+
+    def test_prune_only_removes_old_finished_jobs(self):
+        """Test that pruning keeps running jobs and recent results"""
+        registry = JobRegistry()
+        registry.set("old-done", {"status": "complete"})
+        registry.set("old-running", {"status": "processing"})
+        registry.set("new-done", {"status": "error"})
+        registry._updated_at["old-done"] = time.time() - 7201
+        registry._updated_at["old-running"] = time.time() - 7201
+
+        assert registry.prune() == 1
+        assert registry.get("old-done") is None
+        assert registry.get("old-running") is not None
+        assert registry.get("new-done") is not None
+
+    def test_sqlite_persistence(self):
+        """Test that jobs survive a registry restart when SQLite is enabled"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, "jobs.db")
+            registry = JobRegistry(db_path)
+            registry.set("job", {"status": "processing", "current": 2, "total": 5})
+            registry.set("gone", {"status": "complete"})
+            registry.remove("gone")
+
+            reloaded = JobRegistry(db_path)
+            assert reloaded.get("job") == {
+                "status": "processing",
+                "current": 2,
+                "total": 5,
+            }
+            assert reloaded.get("gone") is None
+
+    def test_transient_update_is_not_persisted(self):
+        """Test that an update with persist=False is published but not stored"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, "jobs.db")
+            registry = JobRegistry(db_path)
+            registry.set("job", {"status": "processing"})
+            registry.update("job", persist=False, transfer={"downloaded_bytes": 5})
+
+            assert registry.get("job")["transfer"] == {"downloaded_bytes": 5}
+            assert JobRegistry(db_path).get("job") == {"status": "processing"}
+
+    def test_checkpoints_survive_restart_until_finished(self):
+        """Test that a checkpoint is reloaded and dropped once the job ends"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, "jobs.db")
+            registry = JobRegistry(db_path)
+            registry.set("job", {"status": "processing"})
+            registry.set("done", {"status": "complete"})
+            registry.save_checkpoint("job", {"finished": {"a": True}})
+
+            reloaded = JobRegistry(db_path)
+            assert reloaded.durable
+            assert reloaded.get_checkpoint("job") == {"finished": {"a": True}}
+            assert reloaded.interrupted_jobs() == ["job"]
+            # The checkpoint is private and not part of the published state
+            assert reloaded.get("job") == {"status": "processing"}
+
+            reloaded.set("job", {"status": "complete"})
+            assert reloaded.get_checkpoint("job") is None
+            assert JobRegistry(db_path).get_checkpoint("job") is None
+
+
+class TestJobCancellation:
+    """Test cancellation requests and abandonment tracking"""
+
+    def test_request_cancel_sets_event(self):
+        """Test that cancelling a running job sets its cancel event"""
+        registry = JobRegistry()
+        registry.set("job", {"status": "processing"})
+        event = registry.cancel_event("job")
+
+        assert registry.request_cancel("job") is True
+        assert event.is_set()
+
+    def test_finished_and_unknown_jobs_cannot_be_cancelled(self):
+        """Test that cancelling has no effect once a job is over"""
+        registry = JobRegistry()
+        registry.set("job", {"status": "complete"})
+
+        assert registry.request_cancel("job") is False
+        assert registry.request_cancel("missing") is False
+        assert not registry.cancel_event("job").is_set()
+
+    def test_watching(self):
+        """Test that polling counts as following a job"""
+        registry = JobRegistry()
+        registry.set("job", {"status": "processing"})
+        since = time.time()
+
+        assert not registry.is_watched_since("job", since)
+        time.sleep(0.01)
+        registry.touch("job")
+        assert registry.is_watched_since("job", since)
+
+
+class TestProgressEndpoint:
+    """Test that the progress endpoint reads from the registry"""
+
+    def test_progress_served_from_registry(self):
+        """Test that a registered job is returned without any progress file"""
+        client = TestClient(app)
+        job_id = "11111111-1111-1111-1111-111111111111"
+        job_registry.set(job_id, {"status": "processing", "current": 1, "total": 2})
+        try:
+            response = client.get(f"/api/youtube/playlist-download-progress/{job_id}")
+            assert response.status_code == 200
+            assert response.json() == {
+                "status": "processing",
+                "current": 1,
+                "total": 2,
+            }
+        finally:
+            job_registry.remove(job_id)
+
+
+class TestJobSubscriptions:
+    """Test push delivery of job updates to subscribers"""
+
+    def test_subscriber_receives_state_and_events(self):
+        """Test that published states and events reach an asyncio subscriber"""
+        import asyncio
+        import threading
+
+        registry = JobRegistry()
+
+        async def scenario():
+            queue = registry.subscribe("job")
+            producer = threading.Thread(
+                target=lambda: (
+                    registry.notify("job", "video", {"video_id": "abc"}),
+                    registry.set("job", {"status": "complete"}),
+                )
+            )
+            producer.start()
+            producer.join()
+            first = await asyncio.wait_for(queue.get(), timeout=1)
+            second = await asyncio.wait_for(queue.get(), timeout=1)
+            registry.unsubscribe("job", queue)
+            return first, second
+
+        first, second = asyncio.run(scenario())
+        assert first == ("video", {"video_id": "abc"})
+        assert second == ("progress", {"status": "complete"})
+        assert registry._subscribers == {}
+
+    def test_event_stream_for_finished_job(self):
+        """Test that the SSE endpoint sends the final state and closes"""
+        client = TestClient(app)
+        job_id = "22222222-2222-2222-2222-222222222222"
+        job_registry.set(job_id, {"status": "complete", "zip_name": "a.zip"})
+        try:
+            response = client.get(
+                f"/api/youtube/playlist-download-progress/{job_id}/events"
+            )
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            assert response.text == (
+                'event: progress\ndata: {"status": "complete", "zip_name": "a.zip"}\n\n'
+            )
+        finally:
+            job_registry.remove(job_id)
+
+    def test_event_stream_unknown_job(self):
+        """Test that the SSE endpoint rejects unknown and malformed job IDs"""
+        client = TestClient(app)
+        response = client.get(
+            "/api/youtube/playlist-download-progress/"
+            "00000000-0000-0000-0000-000000000000/events"
+        )
+        assert response.status_code == 404
+        response = client.get("/api/youtube/playlist-download-progress/bad/events")
+        assert response.status_code == 400
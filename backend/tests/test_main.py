@@ -37,4 +37,24 @@ def test_cors_headers():
     """Test CORS headers are present"""
     response = client.options("/")
     # Should have CORS headers or at least not fail
-    assert response.status_code in [200, 405]
\ No newline at end of file
+    assert response.status_code in [200, 405]
+def test_admin_stats_require_admin_token(monkeypatch):
+    """Test that service stats are only reported to the admin"""
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    assert client.get("/api/admin/stats").status_code == 403
+
+    response = client.get("/api/admin/stats", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) == {
+        "disk_usage",
+        "temp_files",
+        "artifacts",
+        "media_store",
+        "metadata_cache",
+        "scratch",
+        "page_pool",
+        "work_pools",
+    }
+    assert data["page_pool"]["max_workers"] >= 1
+    assert [pool["name"] for pool in data["work_pools"]] == ["info", "playlist-info"]
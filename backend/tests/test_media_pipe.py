@@ -0,0 +1,99 @@
+import asyncio
+import sys
+
+import pytest
+
+from app.services import media_pipe
+from app.services.media_pipe import (
+    MediaPipeBusyError,
+    active_pipes,
+    open_media_pipe,
+)
+from app.services.transcoder import TranscodeError
+
+
+def python_command(code: str) -> list[str]:
+    return [sys.executable, "-c", code]
+
+
+async def read_all(pipe) -> bytes:
+    return b"".join([chunk async for chunk in pipe.chunks()])
+
+
+class TestMediaPipe:
+    """Test relaying ffmpeg output to a response"""
+
+    def test_relays_output_and_releases_slot(self):
+        """Test that all output is relayed and the slot is freed at the end"""
+        command = python_command(
+            "import sys; sys.stdout.buffer.write(b'a' * 200000)"
+        )
+
+        async def scenario():
+            pipe = await open_media_pipe(command)
+            assert active_pipes() == 1
+            return await read_all(pipe)
+
+        assert asyncio.run(scenario()) == b"a" * 200000
+        assert active_pipes() == 0
+
+    def test_failure_before_output_is_raised(self):
+        """Test that a command failing without output reports its stderr"""
+        command = python_command(
+            "import sys; sys.stderr.write('Requested format is not available');"
+            "sys.exit(1)"
+        )
+
+        with pytest.raises(TranscodeError, match="not available"):
+            asyncio.run(open_media_pipe(command))
+        assert active_pipes() == 0
+
+    def test_busy_when_all_slots_are_taken(self, monkeypatch):
+        """Test that pipes beyond MAX_MEDIA_PIPES are refused"""
+        monkeypatch.setattr(media_pipe, "MAX_MEDIA_PIPES", 1)
+        command = python_command(
+            "import sys, time; sys.stdout.buffer.write(b'a');"
+            "sys.stdout.flush(); time.sleep(30)"
+        )
+
+        async def scenario():
+            pipe = await open_media_pipe(command)
+            try:
+                with pytest.raises(MediaPipeBusyError):
+                    await open_media_pipe(command)
+            finally:
+                await pipe.close()
+
+        asyncio.run(scenario())
+        assert active_pipes() == 0
+
+    def test_throttle_is_charged_per_chunk(self):
+        """Test that every relayed byte is charged to the throttle"""
+        charged = []
+        command = python_command(
+            "import sys; sys.stdout.buffer.write(b'a' * 100000)"
+        )
+
+        def throttle(amount):
+            charged.append(amount)
+            return 0.0
+
+        async def scenario():
+            return await read_all(await open_media_pipe(command, throttle))
+
+        assert len(asyncio.run(scenario())) == 100000
+        assert sum(charged) == 100000
+
+    def test_verbose_stderr_does_not_stall_output(self, monkeypatch):
+        """Test that a full stderr pipe never blocks the relayed output"""
+        monkeypatch.setattr(media_pipe, "FIRST_CHUNK_TIMEOUT_SECONDS", 5)
+        command = python_command(
+            "import sys; sys.stderr.write('x' * 1000000); sys.stderr.flush();"
+            "sys.stdout.buffer.write(b'a' * 1000)"
+        )
+
+        async def scenario():
+            return await read_all(await open_media_pipe(command))
+
+        assert asyncio.run(scenario()) == b"a" * 1000
+        assert active_pipes() == 0
@@ -0,0 +1,225 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from app.services.media_store import MediaEntry, MediaReservation, MediaStore
+
+KEY = ("dQw4w9WgXcQ", "mp3", "192")
+
+
+def make_producer(content: bytes = b"audio", calls: list = None, gate=None):
+    """Return a producer writing content into the staging directory."""
+
+    def produce(staging_dir):
+        if calls is not None:
+            calls.append(staging_dir)
+        if gate is not None:
+            gate.wait(timeout=2)
+        path = os.path.join(staging_dir, "Some title.mp3")
+        with open(path, "wb") as f:
+            f.write(content)
+        return path, {"title": "Some title"}
+
+    return produce
+
+
+def acquire(store: MediaStore, key, producer) -> MediaEntry:
+    """Take a reference to the file for key, producing it on a miss."""
+    while True:
+        claim = store.reserve(key)
+        if isinstance(claim, MediaEntry):
+            return claim
+        if isinstance(claim, Future):
+            claim.result()
+            continue
+        try:
+            path, metadata = producer(claim.staging_dir)
+        except BaseException as e:
+            claim.fail(e)
+            raise
+        return claim.commit(path, metadata)
+
+
+class TestMediaStore:
+    """Test the content-addressed media store"""
+
+    def test_miss_produces_and_hit_reuses(self, tmp_path):
+        """Test that a stored file is served again without producing it"""
+        store = MediaStore(root=str(tmp_path))
+        calls = []
+
+        first = acquire(store, KEY, make_producer(calls=calls))
+        second = acquire(store, KEY, make_producer(calls=calls))
+
+        assert len(calls) == 1
+        assert first is second
+        assert first.refs == 2
+        assert first.metadata == {"title": "Some title"}
+        assert first.path.endswith(".mp3")
+        with open(first.path, "rb") as f:
+            assert f.read() == b"audio"
+        # The staging directory is cleaned up
+        assert not os.path.exists(calls[0])
+
+    def test_keys_are_distinct(self, tmp_path):
+        """Test that different formats of the same video are stored apart"""
+        store = MediaStore(root=str(tmp_path))
+        mp3 = acquire(store, KEY, make_producer(b"mp3"))
+        mp4 = acquire(store, ("dQw4w9WgXcQ", "mp4", "best"), make_producer(b"mp4"))
+        assert mp3.path != mp4.path
+
+    def test_concurrent_requests_share_one_download(self, tmp_path):
+        """Test that simultaneous misses for one key are coalesced"""
+        store = MediaStore(root=str(tmp_path))
+        calls = []
+        gate = threading.Event()
+        results = []
+
+        def worker():
+            results.append(acquire(store, KEY, make_producer(calls=calls, gate=gate)))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        assert isinstance(store.reserve(KEY), Future)
+        gate.set()
+        for thread in threads:
+            thread.join(timeout=2)
+
+        assert len(calls) == 1
+        assert len({id(entry) for entry in results}) == 1
+        assert results[0].refs == 4
+
+    def test_failures_are_not_cached(self, tmp_path):
+        """Test that a failed download is retried by the next request"""
+        store = MediaStore(root=str(tmp_path))
+
+        def fail(staging_dir):
+            raise RuntimeError("download failed")
+
+        with pytest.raises(RuntimeError):
+            acquire(store, KEY, fail)
+
+        entry = acquire(store, KEY, make_producer())
+        assert os.path.exists(entry.path)
+
+    def test_referenced_files_are_never_evicted(self, tmp_path):
+        """Test that eviction skips files that are being served"""
+        store = MediaStore(root=str(tmp_path), ttl=0)
+        entry = acquire(store, KEY, make_producer())
+
+        assert store.evict_lru(10**9) == 0
+        assert store.evict_expired(now=time.time() + 10) == 0
+        assert os.path.exists(entry.path)
+
+        store.release(entry)
+        assert store.evict_expired(now=time.time() + 10) == entry.size
+        assert not os.path.exists(entry.path)
+        assert store.acquire_cached(KEY) is None
+
+    def test_release_without_keeping_deletes_unshared_file(self, tmp_path):
+        """Test that a file handed off is only deleted once nobody uses it"""
+        store = MediaStore(root=str(tmp_path))
+        entry = acquire(store, KEY, make_producer())
+        acquire(store, KEY, make_producer())
+
+        store.release(entry, keep=False)
+        assert os.path.exists(entry.path)
+        store.release(entry, keep=False)
+        assert not os.path.exists(entry.path)
+        assert store.acquire_cached(KEY) is None
+
+    def test_evict_lru_frees_oldest_first(self, tmp_path):
+        """Test that LRU eviction removes the least recently used file"""
+        store = MediaStore(root=str(tmp_path))
+        old = acquire(store, ("aaaaaaaaaaa", "mp3", "192"), make_producer(b"x" * 10))
+        new = acquire(store, ("bbbbbbbbbbb", "mp3", "192"), make_producer(b"y" * 10))
+        store.release(old)
+        time.sleep(0.01)
+        store.release(new)
+
+        assert store.evict_lru(5) == 10
+        assert not os.path.exists(old.path)
+        assert os.path.exists(new.path)
+
+    def test_orphaned_files_expire(self, tmp_path):
+        """Test that files unknown to the store are removed once expired"""
+        store = MediaStore(root=str(tmp_path), ttl=60)
+        orphan = tmp_path / "leftover.mp3"
+        orphan.write_bytes(b"old")
+        old = time.time() - 3600
+        os.utime(orphan, (old, old))
+
+        assert store.evict_expired() == 3
+        assert not orphan.exists()
+
+    def test_expiry_keeps_downloads_in_progress(self, tmp_path):
+        """Test that a long download's staging directory is not swept away"""
+        store = MediaStore(root=str(tmp_path), ttl=60)
+        claim = store.reserve(KEY)
+        old = time.time() - 3600
+        os.utime(claim.staging_dir, (old, old))
+
+        store.evict_expired()
+        assert os.path.isdir(claim.staging_dir)
+        path, metadata = make_producer()(claim.staging_dir)
+        assert os.path.exists(claim.commit(path, metadata).path)
+
+    def test_missing_file_is_downloaded_again(self, tmp_path):
+        """Test that a file deleted behind the store's back is re-produced"""
+        store = MediaStore(root=str(tmp_path))
+        entry = acquire(store, KEY, make_producer())
+        store.release(entry)
+        os.unlink(entry.path)
+
+        calls = []
+        acquire(store, KEY, make_producer(calls=calls))
+        assert len(calls) == 1
+
+    def test_reservation_spans_stages(self, tmp_path):
+        """Test that a reservation can be committed from another thread"""
+        store = MediaStore(root=str(tmp_path))
+        claim = store.reserve(KEY)
+        assert isinstance(store.reserve(KEY), Future)
+
+        path, metadata = make_producer()(claim.staging_dir)
+        committed = []
+        thread = threading.Thread(
+            target=lambda: committed.append(claim.commit(path, metadata))
+        )
+        thread.start()
+        thread.join(timeout=2)
+
+        assert store.acquire_cached(KEY) is committed[0]
+        assert not os.path.exists(claim.staging_dir)
+
+    def test_failed_reservation_wakes_waiters(self, tmp_path):
+        """Test that waiters receive the error of a failed reservation"""
+        store = MediaStore(root=str(tmp_path))
+        claim = store.reserve(KEY)
+        waiting = store.reserve(KEY)
+
+        claim.fail(RuntimeError("download failed"))
+
+        assert isinstance(waiting.exception(timeout=1), RuntimeError)
+        assert isinstance(store.reserve(KEY), MediaReservation)
+
+    def test_adopt_registers_files_from_a_previous_process(self, tmp_path):
+        """Test that a stored file can be registered again after a restart"""
+        entry = acquire(MediaStore(root=str(tmp_path)), KEY, make_producer())
+        staging = tmp_path / ".staging-leftover"
+        staging.mkdir()
+
+        store = MediaStore(root=str(tmp_path))
+        assert store.clear_staging() == 1
+        assert not staging.exists()
+        assert store.adopt(KEY, str(tmp_path / "elsewhere.mp3"), {}) is None
+        adopted = store.adopt(KEY, entry.path, {"title": "Some title"})
+
+        assert adopted.refs == 0
+        assert store.reserve(KEY) is adopted
+        assert adopted.refs == 1
@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+
+from app.services.metadata_cache import (
+    MetadataCache,
+    parse_playlist_id,
+    parse_video_id,
+    playlist_cache_key,
+    video_cache_key,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestKeyNormalization:
+    """Test URL normalization to video and playlist IDs"""
+
+    @pytest.mark.parametrize(
+        "url",
+        [
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+            "https://youtube.com/watch?v=dQw4w9WgXcQ&t=42s",
+            "https://m.youtube.com/watch?feature=share&v=dQw4w9WgXcQ",
+            "https://youtu.be/dQw4w9WgXcQ?si=abc",
+            "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+            "https://www.youtube.com/embed/dQw4w9WgXcQ",
+        ],
+    )
+    def test_video_urls_share_a_key(self, url):
+        """Test that different URL spellings of a video map to one key"""
+        assert parse_video_id(url) == "dQw4w9WgXcQ"
+        assert video_cache_key(url) == ("video", "dQw4w9WgXcQ")
+
+    def test_unparseable_video_url_falls_back_to_url(self):
+        """Test that URLs without a video ID are keyed by URL"""
+        url = "https://www.youtube.com/@channel"
+        assert parse_video_id(url) is None
+        assert video_cache_key(url) == ("video-url", url)
+
+    def test_playlist_key(self):
+        """Test that playlist URLs are keyed by their list ID"""
+        url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLabc_123"
+        assert parse_playlist_id(url) == "PLabc_123"
+        assert playlist_cache_key(url) == ("playlist", "PLabc_123")
+        assert playlist_cache_key(
+            "https://www.youtube.com/playlist?list=PLabc_123"
+        ) == ("playlist", "PLabc_123")
+
+
+class TestMetadataCache:
+    """Test the TTL/LRU metadata cache"""
+
+    def test_hit_after_load(self):
+        """Test that a loaded value is served without calling the loader again"""
+        cache = MetadataCache()
+        calls = []
+        loader = lambda: calls.append(1) or {"title": "x"}  # noqa: E731
+        assert cache.get_or_load("k", loader) == {"title": "x"}
+        assert cache.get_or_load("k", loader) == {"title": "x"}
+        assert len(calls) == 1
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after the TTL"""
+        clock = FakeClock()
+        cache = MetadataCache(ttl=60, clock=clock)
+        cache.put("k", {"v": 1})
+        clock.now += 59
+        assert cache.get("k") == {"v": 1}
+        clock.now += 2
+        assert cache.get("k") is None
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = MetadataCache(max_entries=2)
+        cache.put("a", {"v": "a"})
+        cache.put("b", {"v": "b"})
+        cache.get("a")  # "b" is now least recently used
+        cache.put("c", {"v": "c"})
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+
+    def test_failed_loads_are_not_cached(self):
+        """Test that a failed load raises and the next call retries"""
+        cache = MetadataCache()
+
+        def failing():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            cache.get_or_load("k", failing)
+        assert cache.get_or_load("k", lambda: {"ok": True}) == {"ok": True}
+
+    def test_concurrent_misses_are_coalesced(self):
+        """Test that concurrent misses for one key run a single load"""
+        cache = MetadataCache()
+        calls = []
+        started = threading.Event()
+
+        def slow_loader():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return {"title": "shared"}
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.get_or_load("k", slow_loader))
+            )
+            for _ in range(5)
+        ]
+        threads[0].start()
+        started.wait(timeout=1)
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == [{"title": "shared"}] * 5
@@ -107,3 +107,50 @@ class TestAuditLogging:
         response = client.get("/api/png-to-pdf/info")
         assert response.status_code == 200
         # Audit logging happens in background, just verify no errors
+
+
+class TestClientIp:
+    """Test which address a request is attributed to."""
+
+    @staticmethod
+    def make_request(peer: str, headers: dict):
+        from starlette.requests import Request
+
+        return Request(
+            {
+                "type": "http",
+                "client": (peer, 1234),
+                "headers": [
+                    (name.lower().encode(), value.encode())
+                    for name, value in headers.items()
+                ],
+            }
+        )
+
+    def test_forwarded_for_is_ignored_from_untrusted_peer(self):
+        """Test that a client connecting directly cannot pick its address."""
+        from app.utils import get_client_ip
+
+        request = self.make_request("203.0.113.7", {"X-Forwarded-For": "1.2.3.4"})
+        assert get_client_ip(request) == "203.0.113.7"
+
+    def test_spoofed_forwarded_for_entries_are_skipped(self):
+        """Test that the rightmost hop before our proxies is the client."""
+        from app.utils import get_client_ip
+
+        # Client sent "1.2.3.4"; both nginx hops appended their peer
+        request = self.make_request(
+            "172.18.0.3",
+            {
+                "X-Forwarded-For": "1.2.3.4, 203.0.113.7, 172.18.0.1",
+                "X-Real-IP": "172.18.0.1",
+            },
+        )
+        assert get_client_ip(request) == "203.0.113.7"
+
+    def test_real_ip_without_forwarded_for(self):
+        """Test that X-Real-IP from a trusted proxy is used."""
+        from app.utils import get_client_ip
+
+        request = self.make_request("127.0.0.1", {"X-Real-IP": "203.0.113.7"})
+        assert get_client_ip(request) == "203.0.113.7"
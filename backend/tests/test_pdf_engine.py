@@ -0,0 +1,158 @@
+import io
+import os
+import time
+
+import pytest
+from PIL import Image
+from pypdf import PdfReader
+
+from app.services.pdf_engine import (
+    InvalidImageError,
+    PageEncodingPool,
+    encode_image,
+    images_to_pdf,
+)
+
+
+def save(image: Image.Image, path, fmt: str) -> str:
+    image.save(path, format=fmt)
+    return str(path)
+
+
+def slow_encode(path: str):
+    """Encode a page slowly, recording when the worker started and ended."""
+    start = time.monotonic()
+    time.sleep(0.5)
+    encoded = encode_image(path)
+    with open(f"{path}.window", "w") as f:
+        f.write(f"{start} {time.monotonic()}")
+    return encoded
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = PageEncodingPool(max_workers=2)
+    yield pool
+    pool.shutdown()
+
+
+class TestImagesToPdf:
+    """Test the in-process image to PDF engine"""
+
+    def test_one_page_per_image_sized_by_dpi(self, tmp_path):
+        """Test that pages follow the image order and the requested DPI"""
+        first = save(Image.new("RGB", (300, 150), "red"), tmp_path / "a.png", "PNG")
+        second = save(Image.new("L", (150, 300)), tmp_path / "b.jpg", "JPEG")
+        output = images_to_pdf([first, second], str(tmp_path / "out.pdf"), 150)
+
+        reader = PdfReader(output, strict=True)
+        assert len(reader.pages) == 2
+        assert [float(v) for v in reader.pages[0].mediabox] == [0, 0, 144, 72]
+        assert [float(v) for v in reader.pages[1].mediabox] == [0, 0, 72, 144]
+
+    def test_jpeg_is_embedded_unchanged(self, tmp_path):
+        """Test that JPEG data is copied into the PDF as a DCT stream"""
+        path = save(Image.new("RGB", (64, 64), "blue"), tmp_path / "a.jpg", "JPEG")
+        output = images_to_pdf([path], str(tmp_path / "out.pdf"), 300)
+
+        image = PdfReader(output).pages[0]["/Resources"]["/XObject"]["/Im0"]
+        assert image["/Filter"] == "/DCTDecode"
+        with open(path, "rb") as f:
+            assert image.get_data() == f.read()
+
+    def test_opaque_png_data_is_passed_through(self, tmp_path):
+        """Test that an opaque PNG's compressed data is embedded as it is"""
+        original = Image.effect_noise((40, 30), 64).convert("RGB")
+        path = save(original, tmp_path / "a.png", "PNG")
+        output = images_to_pdf([path], str(tmp_path / "out.pdf"), 300)
+
+        image = PdfReader(output).pages[0]["/Resources"]["/XObject"]["/Im0"]
+        assert image["/DecodeParms"]["/Predictor"] == 15
+        assert image.get_data() == original.tobytes()
+
+    def test_png_is_lossless_with_alpha_mask(self, tmp_path):
+        """Test that PNG pixels survive and transparency becomes a soft mask"""
+        original = Image.new("RGBA", (20, 10), (10, 20, 30, 255))
+        original.putpixel((0, 0), (200, 100, 50, 0))
+        path = save(original, tmp_path / "a.png", "PNG")
+        output = images_to_pdf([path], str(tmp_path / "out.pdf"), 300)
+
+        image = PdfReader(output).pages[0]["/Resources"]["/XObject"]["/Im0"]
+        assert image["/Filter"] == "/FlateDecode"
+        assert image.get_data() == original.convert("RGB").tobytes()
+        assert image["/SMask"].get_object().get_data() == original.getchannel(
+            "A"
+        ).tobytes()
+
+    def test_invalid_image_leaves_no_pdf(self, tmp_path):
+        """Test that an undecodable file is reported and the PDF removed"""
+        valid = save(Image.new("RGB", (8, 8)), tmp_path / "a.png", "PNG")
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 64)).save(buffer, format="PNG")
+        truncated = tmp_path / "b.png"
+        truncated.write_bytes(buffer.getvalue()[:60])
+
+        with pytest.raises(InvalidImageError, match="b.png"):
+            images_to_pdf([valid, str(truncated)], str(tmp_path / "out.pdf"), 300)
+        assert not os.path.exists(tmp_path / "out.pdf")
+
+
+class TestParallelEncoding:
+    """Test encoding pages on a process pool"""
+
+    def test_pages_keep_their_order(self, tmp_path, pool):
+        """Test that pages encoded in parallel are written in input order"""
+        paths = [
+            save(Image.new("RGB", (10 + i, 10), "red"), tmp_path / f"{i}.png", "PNG")
+            for i in range(6)
+        ]
+        output = images_to_pdf(paths, str(tmp_path / "out.pdf"), 72, pool)
+
+        reader = PdfReader(output, strict=True)
+        widths = [float(page.mediabox.width) for page in reader.pages]
+        assert widths == [10 + i for i in range(6)]
+        assert pool.stats() == {"max_workers": 2, "running": True}
+
+    def test_pages_are_encoded_concurrently(self, tmp_path):
+        """Test that all pages are submitted before the first is awaited"""
+        paths = [
+            save(Image.new("RGB", (8, 8)), tmp_path / f"{i}.png", "PNG")
+            for i in range(4)
+        ]
+        slow = PageEncodingPool(max_workers=4, encode=slow_encode)
+        try:
+            images_to_pdf(paths, str(tmp_path / "out.pdf"), 72, slow)
+        finally:
+            slow.shutdown()
+
+        windows = []
+        for path in paths:
+            with open(f"{path}.window") as f:
+                windows.append([float(value) for value in f.read().split()])
+        # Every page's encoding overlapped with every other page's
+        latest_start = max(start for start, _ in windows)
+        earliest_end = min(end for _, end in windows)
+        assert latest_start < earliest_end
+
+    def test_every_failed_page_is_reported(self, tmp_path, pool):
+        """Test that all undecodable pages are listed with their page number"""
+        valid = save(Image.new("RGB", (8, 8)), tmp_path / "a.png", "PNG")
+        broken = tmp_path / "b.png"
+        broken.write_bytes(b"not an image")
+        other = tmp_path / "c.jpg"
+        other.write_bytes(b"neither")
+
+        paths = [str(broken), valid, str(other)]
+        with pytest.raises(InvalidImageError) as info:
+            images_to_pdf(paths, str(tmp_path / "out.pdf"), 300, pool)
+        assert [page for page, _ in info.value.failures] == [1, 3]
+        assert "b.png" in info.value.failures[0][1]
+        assert "c.jpg" in info.value.failures[1][1]
+        assert not os.path.exists(tmp_path / "out.pdf")
+
+    def test_single_page_is_encoded_in_process(self, tmp_path):
+        """Test that a one-page document does not start the pool"""
+        path = save(Image.new("RGB", (8, 8)), tmp_path / "a.png", "PNG")
+        idle = PageEncodingPool(max_workers=1)
+        images_to_pdf([path], str(tmp_path / "out.pdf"), 300, idle)
+        assert idle.stats()["running"] is False
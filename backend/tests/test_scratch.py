@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from app.services.cleanup import TempFileRegistry
+from app.services.disk_usage import DiskUsageLedger
+from app.services.scratch import ScratchSpace
+
+
+@pytest.fixture
+def space(tmp_path, monkeypatch):
+    """Scratch space with both tiers in a temporary directory"""
+    from app.services import scratch
+
+    ledger = DiskUsageLedger()
+    ledger.usage([str(tmp_path / "disk")])
+    monkeypatch.setattr(scratch, "disk_usage", ledger)
+    (tmp_path / "disk").mkdir()
+    registry = TempFileRegistry()
+    space = ScratchSpace(
+        disk_root=str(tmp_path / "disk"),
+        ram_root=str(tmp_path / "ram"),
+        ram_bytes=100,
+        spill_bytes=50,
+        registry=registry,
+    )
+    return space, registry, ledger
+
+
+def write(path: str, size: int) -> str:
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return path
+
+
+class TestScratchSpace:
+    """Test per-request scratch workspaces"""
+
+    def test_small_files_go_to_ram(self, space, tmp_path):
+        """Test that files are placed by their expected size"""
+        space, _, _ = space
+        with space.open("test") as workspace:
+            small = workspace.path("small.bin", 10)
+            large = workspace.path("large.bin", 80)
+            unknown = workspace.path("unknown.bin")
+
+        assert small.startswith(str(tmp_path / "ram"))
+        assert large.startswith(str(tmp_path / "disk"))
+        assert unknown.startswith(str(tmp_path / "disk"))
+
+    def test_ram_budget_is_shared(self, space, tmp_path):
+        """Test that the RAM tier falls back to disk once its budget is used"""
+        space, _, _ = space
+        first = space.open("first")
+        second = space.open("second")
+
+        assert first.path("a.bin", 50).startswith(str(tmp_path / "ram"))
+        assert first.path("b.bin", 40).startswith(str(tmp_path / "ram"))
+        assert second.path("c.bin", 20).startswith(str(tmp_path / "disk"))
+
+        first.close()
+        assert space.stats()["ram_used"] == 0
+        assert second.path("d.bin", 20).startswith(str(tmp_path / "ram"))
+        second.close()
+
+    def test_oversized_file_spills_to_disk(self, space, tmp_path):
+        """Test that a RAM file larger than the threshold is moved to disk"""
+        space, _, ledger = space
+        with space.open("test") as workspace:
+            path = write(workspace.path("page.pdf", 10), 70)
+            moved = workspace.written(path)
+
+            assert moved.startswith(str(tmp_path / "disk"))
+            assert not os.path.exists(path)
+            assert ledger.usage([str(tmp_path / "disk")]) == 70
+            assert space.stats()["ram_used"] == 0
+
+    def test_close_deletes_and_accounts(self, space, tmp_path):
+        """Test that teardown removes both tiers and their accounting"""
+        space, registry, ledger = space
+        workspace = space.open("test")
+        disk_file = workspace.written(write(workspace.path("out.pdf"), 30))
+        ram_file = workspace.written(write(workspace.path("in.png", 10), 10))
+
+        assert registry.leased(os.path.dirname(disk_file))
+        assert registry.stats()["entries"] == 1
+
+        workspace.close()
+        assert not os.path.exists(os.path.dirname(disk_file))
+        assert not os.path.exists(os.path.dirname(ram_file))
+        assert ledger.usage([str(tmp_path / "disk")]) == 0
+        assert registry.stats() == {**registry.stats(), "entries": 0, "leases": 0}
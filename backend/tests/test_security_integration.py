@@ -71,7 +71,8 @@ class TestPngToPdfSecurity:
             # If successful, verify dangerous characters are removed
             assert response.status_code == 200
             content_disp = response.headers.get("content-disposition", "")
-            assert ";" not in content_disp
+            # The header itself separates its parameters with ";"
+            assert ";" not in content_disp.split("filename=", 1)[1]
             assert "rm" in content_disp or "file" in content_disp  # Should have sanitized parts
 
     def test_normal_filename_preserved(self):
@@ -0,0 +1,160 @@
+import io
+import os
+import tempfile
+import threading
+import time
+import zipfile
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.artifacts import artifact_store
+from app.services.jobs import job_registry
+from app.services.streaming_zip import StreamingZipWriter
+
+
+def write_file(directory: str, name: str, content: bytes) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+class TestStreamingZipWriter:
+    """Test the append-only ZIP writer"""
+
+    def test_builds_valid_archive(self):
+        """Test that entries written one by one form a valid ZIP"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            zip_path = os.path.join(temp_dir, "out.zip")
+            writer = StreamingZipWriter(zip_path)
+            writer.add_file(write_file(temp_dir, "a.mp3", b"a" * 1000), "a.mp3")
+            writer.add_file(write_file(temp_dir, "b.txt", b"b" * 1000), "b.txt")
+            writer.close()
+
+            with zipfile.ZipFile(zip_path) as zipf:
+                assert zipf.testzip() is None
+                assert zipf.read("a.mp3") == b"a" * 1000
+                assert zipf.getinfo("a.mp3").compress_type == zipfile.ZIP_STORED
+                assert zipf.getinfo("b.txt").compress_type == zipfile.ZIP_DEFLATED
+
+    def test_only_appends(self):
+        """Test that bytes already on disk never change as entries are added"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            zip_path = os.path.join(temp_dir, "out.zip")
+            writer = StreamingZipWriter(zip_path)
+            writer.add_file(write_file(temp_dir, "a.mp3", b"first"), "a.mp3")
+            with open(writer.partial_path, "rb") as f:
+                prefix = f.read()
+            writer.add_file(write_file(temp_dir, "b.mp3", b"second"), "b.mp3")
+            writer.close()
+            with open(zip_path, "rb") as f:
+                assert f.read().startswith(prefix)
+
+    def test_duplicate_names_are_renamed(self):
+        """Test that two videos with the same title both end up in the ZIP"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            zip_path = os.path.join(temp_dir, "out.zip")
+            writer = StreamingZipWriter(zip_path)
+            path = write_file(temp_dir, "song.mp3", b"x")
+            assert writer.add_file(path, "song.mp3") == "song.mp3"
+            assert writer.add_file(path, "song.mp3") == "song (2).mp3"
+            writer.close()
+            with zipfile.ZipFile(zip_path) as zipf:
+                assert zipf.namelist() == ["song.mp3", "song (2).mp3"]
+
+    def test_abort_removes_archive(self):
+        """Test that an aborted archive is deleted"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            zip_path = os.path.join(temp_dir, "out.zip")
+            writer = StreamingZipWriter(zip_path)
+            writer.abort()
+            assert not os.path.exists(zip_path)
+            assert not os.path.exists(writer.partial_path)
+
+    def test_archive_appears_only_when_closed(self):
+        """Test that the final path never holds an unfinished archive"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            zip_path = os.path.join(temp_dir, "out.zip")
+            writer = StreamingZipWriter(zip_path)
+            writer.add_file(write_file(temp_dir, "a.mp3", b"a"), "a.mp3")
+            assert not os.path.exists(zip_path)
+            writer.close()
+            assert not os.path.exists(writer.partial_path)
+            with zipfile.ZipFile(zip_path) as zipf:
+                assert zipf.namelist() == ["a.mp3"]
+
+
+class TestZipStreamEndpoint:
+    """Test streaming a playlist ZIP while it is being built"""
+
+    def test_stream_follows_growing_archive(self):
+        """Test that the stream delivers entries added after it started"""
+        client = TestClient(app)
+        job_id = "33333333-3333-3333-3333-333333333333"
+        zip_name = f"playlist_{job_id}.zip"
+        os.makedirs("temp_downloads", exist_ok=True)
+        zip_path = os.path.join("temp_downloads", zip_name)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            writer = StreamingZipWriter(zip_path)
+            writer.add_file(write_file(temp_dir, "one.mp3", b"1" * 5000), "one.mp3")
+            job_registry.set(job_id, {"status": "processing", "zip_name": zip_name})
+
+            def finish_job():
+                time.sleep(0.3)
+                writer.add_file(write_file(temp_dir, "two.mp3", b"2" * 5000), "two.mp3")
+                job_registry.set(job_id, {"status": "processing", "zip_name": zip_name})
+                time.sleep(0.3)
+                writer.close()
+                job_registry.set(job_id, {"status": "complete", "zip_name": zip_name})
+
+            producer = threading.Thread(target=finish_job)
+            producer.start()
+            try:
+                response = client.get(f"/api/youtube/download-zip-stream/{job_id}")
+            finally:
+                producer.join()
+
+        assert response.status_code == 200
+        with zipfile.ZipFile(io.BytesIO(response.content)) as zipf:
+            assert zipf.namelist() == ["one.mp3", "two.mp3"]
+            assert zipf.read("two.mp3") == b"2" * 5000
+        # The archive and job are cleaned up once fully sent
+        assert not os.path.exists(zip_path)
+        assert job_registry.get(job_id) is None
+
+    def test_stream_unknown_job(self):
+        """Test that unknown jobs are rejected"""
+        client = TestClient(app)
+        response = client.get(
+            "/api/youtube/download-zip-stream/00000000-0000-0000-0000-000000000000"
+        )
+        assert response.status_code == 404
+
+    def test_download_rejects_unfinished_archive(self):
+        """Test that /download-zip/ does not serve a ZIP the job is writing"""
+        client = TestClient(app)
+        job_id = "66666666-6666-6666-6666-666666666666"
+        zip_name = f"playlist_{job_id}.zip"
+        os.makedirs("temp_downloads", exist_ok=True)
+        zip_path = os.path.join("temp_downloads", zip_name)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            writer = StreamingZipWriter(zip_path)
+            writer.add_file(write_file(temp_dir, "one.mp3", b"1"), "one.mp3")
+            job_registry.set(job_id, {"status": "processing", "zip_name": zip_name})
+            try:
+                response = client.get(f"/api/youtube/download-zip/?filename={zip_name}")
+                assert response.status_code == 404
+
+                # Moved into place, but the job has not published it yet
+                writer.close()
+                response = client.get(f"/api/youtube/download-zip/?filename={zip_name}")
+                assert response.status_code == 404
+                assert artifact_store.find_by_path(os.path.abspath(zip_path)) is None
+            finally:
+                writer.abort()
+                job_registry.remove(job_id)
+                if os.path.exists(zip_path):
+                    os.unlink(zip_path)
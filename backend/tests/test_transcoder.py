@@ -0,0 +1,210 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from app.services import transcoder
+from app.services.transcoder import (
+    TranscodeCancelled,
+    TranscodeError,
+    TranscodePool,
+    convert_audio,
+    pipe_command,
+    run_ffmpeg,
+)
+
+
+class TestMp3Conversion:
+    """Test the ffmpeg MP3 conversion"""
+
+    def test_converts_and_removes_source(self, monkeypatch, tmp_path):
+        """Test that the MP3 is written next to the source, which is deleted"""
+        source = tmp_path / "song.webm"
+        source.write_bytes(b"raw")
+        commands = []
+
+        def fake_run(cmd, cancel_event=None):
+            commands.append(cmd)
+            with open(cmd[-1], "wb") as f:
+                f.write(b"mp3")
+
+        monkeypatch.setattr(transcoder, "run_ffmpeg", fake_run)
+
+        target = convert_audio(str(source), "mp3", "128")
+
+        assert target == str(tmp_path / "song.mp3")
+        assert not source.exists()
+        assert commands[0][commands[0].index("-b:a") + 1] == "128k"
+        assert commands[0][commands[0].index("-threads") + 1] == "1"
+
+    def test_mp3_source_gets_a_new_name(self, monkeypatch, tmp_path):
+        """Test that an MP3 source is not overwritten in place"""
+        source = tmp_path / "song.mp3"
+        source.write_bytes(b"raw")
+        monkeypatch.setattr(transcoder, "run_ffmpeg", lambda cmd, cancel_event: None)
+
+        assert convert_audio(str(source), "mp3").endswith("song.transcoded.mp3")
+
+    def test_failure_keeps_source_and_removes_partial_output(
+        self, monkeypatch, tmp_path
+    ):
+        """Test that a failed transcode leaves no partial MP3 behind"""
+        source = tmp_path / "song.webm"
+        source.write_bytes(b"raw")
+
+        def fail(cmd, cancel_event=None):
+            with open(cmd[-1], "wb") as f:
+                f.write(b"partial")
+            raise TranscodeError("ffmpeg failed: Invalid data")
+
+        monkeypatch.setattr(transcoder, "run_ffmpeg", fail)
+
+        with pytest.raises(TranscodeError, match="Invalid data"):
+            convert_audio(str(source), "mp3")
+        assert source.exists()
+        assert not (tmp_path / "song.mp3").exists()
+
+
+class TestPassthrough:
+    """Test remuxing audio without re-encoding"""
+
+    def test_copies_the_audio_stream(self, monkeypatch, tmp_path):
+        """Test that passthrough formats copy the stream instead of encoding"""
+        source = tmp_path / "song.webm"
+        source.write_bytes(b"raw")
+        commands = []
+
+        def fake_run(cmd, cancel_event=None):
+            commands.append(cmd)
+            with open(cmd[-1], "wb") as f:
+                f.write(b"opus")
+
+        monkeypatch.setattr(transcoder, "run_ffmpeg", fake_run)
+
+        target = convert_audio(str(source), "opus")
+
+        assert target == str(tmp_path / "song.opus")
+        assert not source.exists()
+        assert len(commands) == 1
+        assert commands[0][commands[0].index("-codec:a") + 1] == "copy"
+
+    def test_falls_back_to_encoding(self, monkeypatch, tmp_path):
+        """Test that a stream that does not fit the container is re-encoded"""
+        source = tmp_path / "song.webm"
+        source.write_bytes(b"raw")
+        codecs = []
+
+        def fake_run(cmd, cancel_event=None):
+            codecs.append(cmd[cmd.index("-codec:a") + 1])
+            if codecs[-1] == "copy":
+                raise TranscodeError("ffmpeg failed: codec not supported")
+            with open(cmd[-1], "wb") as f:
+                f.write(b"m4a")
+
+        monkeypatch.setattr(transcoder, "run_ffmpeg", fake_run)
+
+        assert convert_audio(str(source), "m4a", "128").endswith("song.m4a")
+        assert codecs == ["copy", "aac"]
+
+    def test_cancelled_remux_is_not_retried(self, monkeypatch, tmp_path):
+        """Test that cancelling a remux does not start an encode"""
+        source = tmp_path / "song.webm"
+        source.write_bytes(b"raw")
+        calls = []
+
+        def cancelled(cmd, cancel_event=None):
+            calls.append(cmd)
+            raise TranscodeCancelled("Transcode cancelled")
+
+        monkeypatch.setattr(transcoder, "run_ffmpeg", cancelled)
+
+        with pytest.raises(TranscodeCancelled):
+            convert_audio(str(source), "m4a")
+        assert len(calls) == 1
+        assert source.exists()
+
+
+class TestPipeCommand:
+    """Test the ffmpeg command for piped downloads"""
+
+    def test_merges_video_and_audio_into_fragmented_mp4(self):
+        """Test that two sources are mapped and written as fragmented MP4"""
+        sources = [
+            {"url": "https://video", "http_headers": {"User-Agent": "ua"}},
+            {"url": "https://audio"},
+        ]
+        command = pipe_command(sources, "mp4")
+
+        assert command[command.index("-headers") + 1] == "User-Agent: ua\r\n"
+        assert "https://video" in command and "https://audio" in command
+        assert ["-map", "0:v:0", "-map", "1:a:0"] == command[
+            command.index("-map") : command.index("-map") + 4
+        ]
+        assert "empty_moov" in command[command.index("-movflags") + 1]
+        assert command[-1] == "pipe:1"
+
+    def test_mp3_is_encoded_at_bitrate(self):
+        """Test that MP3 output is encoded and other audio is copied"""
+        mp3 = pipe_command([{"url": "https://audio"}], "mp3", "320")
+        opus = pipe_command([{"url": "https://audio"}], "opus")
+
+        assert mp3[mp3.index("-b:a") + 1] == "320k"
+        assert opus[opus.index("-codec:a") + 1] == "copy"
+        assert "-map" not in mp3
+
+
+class TestRunFfmpeg:
+    """Test running and cancelling the ffmpeg child process"""
+
+    def test_failure_reports_stderr(self):
+        """Test that a failing process is reported with its error output"""
+        command = [
+            sys.executable,
+            "-c",
+            "import sys; sys.stderr.write('Invalid data'); sys.exit(1)",
+        ]
+        with pytest.raises(TranscodeError, match="Invalid data"):
+            run_ffmpeg(command)
+
+    def test_missing_binary(self, tmp_path):
+        """Test that a missing ffmpeg binary is reported clearly"""
+        with pytest.raises(TranscodeError, match="not installed"):
+            run_ffmpeg([str(tmp_path / "no-ffmpeg")])
+
+    def test_cancel_kills_process(self):
+        """Test that setting the cancel event kills a running process"""
+        cancel = threading.Event()
+        threading.Timer(0.2, cancel.set).start()
+        started = time.monotonic()
+
+        with pytest.raises(TranscodeCancelled):
+            run_ffmpeg([sys.executable, "-c", "import time; time.sleep(30)"], cancel)
+        assert time.monotonic() - started < 5
+
+
+class TestTranscodePool:
+    """Test the CPU-sized transcode pool"""
+
+    def test_concurrency_is_capped(self):
+        """Test that no more than max_workers transcodes run at once"""
+        pool = TranscodePool(max_workers=2)
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def work():
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+
+        futures = [pool.submit(work) for _ in range(6)]
+        for future in futures:
+            future.result(timeout=2)
+
+        assert peak == 2
+        assert pool.stats() == {"max_workers": 2, "pending": 0}
@@ -0,0 +1,112 @@
+from app.services.transfer_progress import ThroughputLog, TransferProgress
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def chunk(name: str, downloaded: int, total: int) -> dict:
+    return {
+        "status": "downloading",
+        "tmpfilename": name,
+        "downloaded_bytes": downloaded,
+        "total_bytes": total,
+    }
+
+
+class TestTransferProgress:
+    """Test byte progress collected from yt-dlp progress hooks"""
+
+    def test_bytes_of_several_files_add_up(self):
+        """Test that the video and audio files of one download are summed"""
+        progress = TransferProgress(["a"], log=None, clock=FakeClock())
+        hook = progress.progress_hook("a")
+        hook(chunk("video.part", 600, 1000))
+        hook(chunk("video.part", 1000, 1000))
+        hook(chunk("audio.part", 200, 500))
+
+        snapshot = progress.snapshot()
+        assert snapshot["downloaded_bytes"] == 1200
+        assert snapshot["total_bytes"] == 1500
+        assert snapshot["videos"]["a"] == {
+            "downloaded_bytes": 1200,
+            "total_bytes": 1500,
+        }
+
+    def test_speed_and_eta(self):
+        """Test that waiting videos count with the average size in the ETA"""
+        clock = FakeClock()
+        progress = TransferProgress(["a", "b"], log=None, clock=clock)
+        hook = progress.progress_hook("a")
+        hook(chunk("a.part", 0, 1000))
+        clock.now = 2.0
+        hook(chunk("a.part", 400, 1000))
+
+        snapshot = progress.snapshot()
+        assert snapshot["speed"] == 200
+        # 600 bytes left of "a" and an estimated 1000 for "b"
+        assert snapshot["total_bytes"] == 2000
+        assert snapshot["eta"] == 8
+
+    def test_finished_videos_leave_the_running_list(self):
+        """Test that finished and failed videos no longer count as remaining"""
+        progress = TransferProgress(["a", "b"], log=None, clock=FakeClock())
+        progress.progress_hook("a")(chunk("a.part", 100, 100))
+        progress.finish("a")
+        progress.finish("b", success=False)
+
+        snapshot = progress.snapshot()
+        assert snapshot["videos"] == {}
+        assert snapshot["total_bytes"] == 100
+
+    def test_changed_coalesces_updates(self):
+        """Test that many hook calls are reported as a single change"""
+        progress = TransferProgress(["a"], log=None, clock=FakeClock())
+        hook = progress.progress_hook("a")
+        for downloaded in range(0, 1000, 10):
+            hook(chunk("a.part", downloaded, 1000))
+
+        assert progress.changed() is True
+        assert progress.changed() is False
+        hook({"status": "finished", "downloaded_bytes": 1000})
+        assert progress.changed() is False
+
+
+class TestThroughputLog:
+    """Test the hourly throughput history"""
+
+    def test_hourly_buckets(self):
+        """Test that bytes, downloads and the peak rate are kept per hour"""
+        clock = FakeClock(3600 * 10)
+        log = ThroughputLog(clock=clock)
+        log.add_bytes(6000)
+        log.add_download(4.0)
+        clock.now += 60
+        log.add_bytes(600)
+        clock.now += 3600
+        log.add_bytes(60)
+
+        first, second = log.stats()
+        assert first["hour"] == "1970-01-01T10:00:00+00:00"
+        assert first["bytes"] == 6600
+        assert first["downloads"] == 1
+        assert first["average_download_seconds"] == 4.0
+        assert first["peak_speed"] == 100
+        assert second["bytes"] == 60
+
+    def test_progress_feeds_the_log(self):
+        """Test that transferred bytes and successful downloads are logged"""
+        log = ThroughputLog(clock=FakeClock())
+        progress = TransferProgress(["a", "b"], log=log, clock=FakeClock())
+        progress.progress_hook("a")(chunk("a.part", 500, 500))
+        progress.progress_hook("b")(chunk("b.part", 100, 500))
+        progress.finish("a")
+        progress.finish("b", success=False)
+
+        (hour,) = log.stats()
+        assert hour["bytes"] == 600
+        assert hour["downloads"] == 1
@@ -1,3 +1,6 @@
+import asyncio
+from functools import partial
+
 import pytest
 from app.routers.youtube_downloader import calculate_thread_count
 
@@ -73,6 +76,35 @@ class TestYoutubeDownloaderEndpoints:
         assert response.status_code == 400
         assert "Invalid format" in response.json()["detail"]
 
+    def test_download_invalid_bitrate(self):
+        """Test download with an unsupported MP3 bitrate"""
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        client = TestClient(app)
+        response = client.post(
+            "/api/youtube/download/mp3?bitrate=999",
+            json={"url": "https://youtube.com/watch"},
+        )
+        assert response.status_code == 400
+        assert "Invalid bitrate" in response.json()["detail"]
+
+    def test_playlist_download_rejects_unknown_audio_format(self):
+        """Test that playlist jobs only accept the supported audio formats"""
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        client = TestClient(app)
+        response = client.post(
+            "/api/youtube/download-playlist",
+            json={
+                "url": "https://www.youtube.com/playlist?list=PL1",
+                "video_ids": ["dQw4w9WgXcQ"],
+                "audio_format": "flac",
+            },
+        )
+        assert response.status_code == 422
+
     def test_playlist_download_requires_video_ids(self):
         """Test that playlist download requires video IDs"""
         from fastapi.testclient import TestClient
@@ -132,3 +164,941 @@ class TestYoutubeDownloaderEndpoints:
         # Since that file doesn't exist, we get 404
         assert response.status_code == 404
         assert "Zip file not found" in response.json()["detail"]
+
+    def test_playlist_jobs_are_scheduled_per_connecting_client(self, monkeypatch):
+        """Test that a spoofed X-Forwarded-For does not earn a new fair share"""
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.routers import youtube_downloader
+        from app.services.jobs import job_registry
+
+        jobs = []
+        # The endpoint allows three jobs an hour per client
+        monkeypatch.setattr(youtube_downloader.limiter, "enabled", False)
+        monkeypatch.setattr(
+            youtube_downloader,
+            "do_playlist_download",
+            lambda url, video_ids, job_id, client_id, *args, **kwargs: jobs.append(
+                (job_id, client_id, kwargs["reservation"])
+            ),
+        )
+
+        client = TestClient(app)
+        for spoofed in ("1.1.1.1", "2.2.2.2"):
+            response = client.post(
+                "/api/youtube/download-playlist",
+                json={
+                    "url": "https://www.youtube.com/playlist?list=PL1",
+                    "video_ids": ["dQw4w9WgXcQ"],
+                },
+                headers={"X-Forwarded-For": spoofed},
+            )
+            assert response.status_code == 200
+
+        assert [client_id for _, client_id, _ in jobs] == ["testclient"] * 2
+        for job_id, _, reservation in jobs:
+            reservation.release()
+            job_registry.remove(job_id)
+
+
+class FakeYoutubeDL:
+    """Stand-in for yt_dlp.YoutubeDL that records extractions"""
+
+    extractions = []
+
+    def __init__(self, opts=None):
+        self.opts = opts or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def extract_info(self, url, download=False):
+        FakeYoutubeDL.extractions.append(url)
+        return {"id": "dQw4w9WgXcQ", "title": "Cached video", "thumbnail": "t.jpg"}
+
+
+class TestMetadataCaching:
+    """Test that repeated metadata requests are served from the cache"""
+
+    def test_info_extracts_once_per_video(self, monkeypatch):
+        """Test that /info for the same video in different URL forms extracts once"""
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.routers import youtube_downloader
+        from app.services.metadata_cache import metadata_cache
+
+        monkeypatch.setattr(youtube_downloader.yt_dlp, "YoutubeDL", FakeYoutubeDL)
+        FakeYoutubeDL.extractions = []
+        metadata_cache.clear()
+
+        client = TestClient(app)
+        for url in [
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+            "https://youtu.be/dQw4w9WgXcQ",
+        ]:
+            response = client.post("/api/youtube/info", json={"url": url})
+            assert response.status_code == 200
+            assert response.json() == {"title": "Cached video", "thumbnail": "t.jpg"}
+
+        assert len(FakeYoutubeDL.extractions) == 1
+        metadata_cache.clear()
+
+
+class TestSingleExtraction:
+    """Test that downloads reuse one metadata extraction"""
+
+    def test_download_single_video_extracts_once(self, monkeypatch, tmp_path):
+        """Test that the duration check and download share one extraction"""
+        from app.routers import youtube_downloader
+        from app.services.metadata_cache import metadata_cache
+
+        processed = []
+
+        class DownloadingYoutubeDL(FakeYoutubeDL):
+            def extract_info(self, url, download=False):
+                assert download is False
+                return {**super().extract_info(url), "duration": 60}
+
+            def process_ie_result(self, info, download=True):
+                processed.append(info)
+                return info
+
+        monkeypatch.setattr(
+            youtube_downloader.yt_dlp, "YoutubeDL", DownloadingYoutubeDL
+        )
+        FakeYoutubeDL.extractions = []
+        metadata_cache.clear()
+
+        result = youtube_downloader.download_single_video("dQw4w9WgXcQ", str(tmp_path))
+
+        assert result == {
+            "success": True,
+            "video_id": "dQw4w9WgXcQ",
+            "title": "Cached video",
+        }
+        assert len(FakeYoutubeDL.extractions) == 1
+        assert len(processed) == 1
+        metadata_cache.clear()
+
+    def test_download_single_video_rejects_long_video(self, monkeypatch, tmp_path):
+        """Test that over-limit videos fail before any download starts"""
+        from app.routers import youtube_downloader
+        from app.services.metadata_cache import metadata_cache
+
+        class LongVideoYoutubeDL(FakeYoutubeDL):
+            def extract_info(self, url, download=False):
+                return {**super().extract_info(url), "duration": 3 * 3600}
+
+            def process_ie_result(self, info, download=True):
+                raise AssertionError("Download must not start")
+
+        monkeypatch.setattr(youtube_downloader.yt_dlp, "YoutubeDL", LongVideoYoutubeDL)
+        metadata_cache.clear()
+
+        result = youtube_downloader.download_single_video("dQw4w9WgXcQ", str(tmp_path))
+
+        assert result["success"] is False
+        assert "exceeds" in result["error"]
+        metadata_cache.clear()
+
+    def test_partition_by_duration(self):
+        """Test that flat listing durations reject over-limit videos up front"""
+        from app.routers.youtube_downloader import partition_by_duration
+
+        playlist_info = {
+            "entries": [
+                {"id": "short000001", "title": "Short", "duration": 300},
+                {"id": "long0000001", "title": "Long", "duration": 9000},
+                {"id": "unknown0001", "title": "Unknown", "duration": None},
+            ]
+        }
+        accepted, rejected = partition_by_duration(
+            ["short000001", "long0000001", "unknown0001", "missing0001"],
+            playlist_info,
+        )
+        assert accepted == ["short000001", "unknown0001", "missing0001"]
+        assert [r["video_id"] for r in rejected] == ["long0000001"]
+        assert rejected[0]["title"] == "Long"
+
+
+class TestMediaStoreIntegration:
+    """Test that playlist videos are served from the media store"""
+
+    @pytest.fixture
+    def pipeline(self, monkeypatch, tmp_path):
+        """Fake the download and transcode stages around a temporary store"""
+        import os
+
+        from app.routers import youtube_downloader
+        from app.services.media_store import MediaStore
+
+        downloads = []
+
+        def fake_download(video_id, temp_dir, max_duration=7200, **options):
+            assert options["extract_audio"] is False
+            downloads.append(video_id)
+            with open(os.path.join(temp_dir, f"Song {video_id}.webm"), "wb") as f:
+                f.write(b"raw audio")
+            return {"success": True, "video_id": video_id, "title": f"Song {video_id}"}
+
+        def fake_convert(source, audio_format="mp3", bitrate="192", cancel_event=None):
+            target = f"{os.path.splitext(source)[0]}.{audio_format}"
+            os.replace(source, target)
+            return target
+
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(
+            youtube_downloader, "media_store", MediaStore(root=str(tmp_path / "media"))
+        )
+        monkeypatch.setattr(youtube_downloader, "download_single_video", fake_download)
+        monkeypatch.setattr(youtube_downloader, "convert_audio", fake_convert)
+        return downloads
+
+    def test_playlist_video_is_downloaded_once(self, pipeline):
+        """Test that a second job reuses the stored MP3 of a video"""
+        from app.routers import youtube_downloader
+
+        downloaded = youtube_downloader.download_playlist_video("dQw4w9WgXcQ")
+        assert downloaded["raw_path"].endswith(".webm")
+        first = youtube_downloader.transcode_playlist_video(downloaded)
+        second = youtube_downloader.download_playlist_video("dQw4w9WgXcQ")
+
+        assert pipeline == ["dQw4w9WgXcQ"]
+        assert first["media"] is second["media"]
+        assert first["media"].path.endswith(".mp3")
+        assert first["title"] == "Song dQw4w9WgXcQ"
+
+    def test_request_cannot_be_starved_by_waiting_playlist_worker(
+        self, monkeypatch, pipeline
+    ):
+        """Test that a single download and a playlist video share a key safely"""
+        import asyncio
+        import os
+        from threading import Event
+
+        from app.routers import youtube_downloader
+        from app.services.download_scheduler import DownloadScheduler
+
+        def fake_download_media(url, file_format, temp_dir, **options):
+            path = os.path.join(temp_dir, "Song.webm")
+            with open(path, "wb") as f:
+                f.write(b"raw audio")
+            return path, "Song"
+
+        scheduler = DownloadScheduler(max_workers=1)
+        monkeypatch.setattr(youtube_downloader, "download_scheduler", scheduler)
+        monkeypatch.setattr(youtube_downloader, "download_media", fake_download_media)
+        monkeypatch.setattr(youtube_downloader, "DOWNLOAD_TIMEOUT_SECONDS", 5)
+        key = youtube_downloader.media_key("dQw4w9WgXcQ", "mp3", "192")
+
+        async def scenario():
+            # The only worker is busy while a playlist video of the key queues
+            gate = Event()
+            scheduler.submit("busy", gate.wait)
+            playlist = scheduler.submit(
+                "playlist", youtube_downloader.download_playlist_video, "dQw4w9WgXcQ"
+            )
+            request = asyncio.ensure_future(
+                youtube_downloader.acquire_media("client", key, "https://youtu.be/x")
+            )
+            await asyncio.sleep(0.1)
+            gate.set()
+            result = await asyncio.wrap_future(playlist)
+            if "reservation" in result:
+                await asyncio.to_thread(
+                    youtube_downloader.transcode_playlist_video, result
+                )
+            return await request
+
+        try:
+            entry = asyncio.run(scenario())
+        finally:
+            scheduler.shutdown()
+        assert entry.key == key
+        assert os.path.exists(entry.path)
+
+    def test_failed_playlist_video_keeps_its_result(self, monkeypatch, tmp_path):
+        """Test that a failed download reports the downloader's result"""
+        from app.routers import youtube_downloader
+        from app.services.media_store import MediaReservation, MediaStore
+
+        def fake_download(video_id, temp_dir, max_duration=7200, **options):
+            return {"success": False, "video_id": video_id, "error": "Too long"}
+
+        store = MediaStore(root=str(tmp_path))
+        monkeypatch.setattr(youtube_downloader, "media_store", store)
+        monkeypatch.setattr(youtube_downloader, "download_single_video", fake_download)
+
+        result = youtube_downloader.download_playlist_video("dQw4w9WgXcQ")
+        assert result["success"] is False
+        assert result["error"] == "Too long"
+        # The failed download does not block the next attempt
+        assert isinstance(
+            store.reserve(("dQw4w9WgXcQ", "mp3", "192")), MediaReservation
+        )
+
+    def test_playlist_job_pipelines_download_and_transcode(
+        self, monkeypatch, pipeline
+    ):
+        """Test that a job downloads, transcodes and zips every video"""
+        import os
+        import zipfile
+
+        from app.routers import youtube_downloader
+        from app.services.jobs import job_registry
+
+        monkeypatch.setattr(
+            youtube_downloader,
+            "extract_playlist_info",
+            lambda url: {"title": "Mix", "entries": []},
+        )
+        job_id = "44444444-4444-4444-4444-444444444444"
+        video_ids = ["aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"]
+
+        youtube_downloader.do_playlist_download(
+            "https://www.youtube.com/playlist?list=PL1", video_ids, job_id
+        )
+
+        state = job_registry.get(job_id)
+        assert state["status"] == "complete"
+        assert state["successful"] == 3
+        zip_path = os.path.join("temp_downloads", state["zip_name"])
+        with zipfile.ZipFile(zip_path) as archive:
+            assert sorted(archive.namelist()) == [
+                f"Song {video_id}.mp3" for video_id in video_ids
+            ]
+        assert sorted(pipeline) == video_ids
+
+        # The ZIP is published as a leased artifact that takes the job with it
+        from app.services.artifacts import artifact_store
+
+        artifact_store.remove(state["artifact_id"])
+        assert not os.path.exists(zip_path)
+        assert job_registry.get(job_id) is None
+
+    def test_playlist_job_publishes_byte_progress(self, monkeypatch, pipeline):
+        """Test that bytes reported by the download hooks reach the job state"""
+        import os
+
+        from app.routers import youtube_downloader
+        from app.services.jobs import job_registry
+
+        def fake_download(video_id, temp_dir, max_duration=7200, **options):
+            options["progress_hook"](
+                {
+                    "status": "downloading",
+                    "tmpfilename": "song.webm.part",
+                    "downloaded_bytes": 9,
+                    "total_bytes": 9,
+                }
+            )
+            with open(os.path.join(temp_dir, f"Song {video_id}.webm"), "wb") as f:
+                f.write(b"raw audio")
+            return {"success": True, "video_id": video_id, "title": "Song"}
+
+        published = []
+        publish = job_registry.set
+        monkeypatch.setattr(
+            job_registry,
+            "set",
+            lambda job_id, state: published.append(state) or publish(job_id, state),
+        )
+        monkeypatch.setattr(youtube_downloader, "download_single_video", fake_download)
+        monkeypatch.setattr(
+            youtube_downloader,
+            "extract_playlist_info",
+            lambda url: {"title": "Mix", "entries": []},
+        )
+        job_id = "12121212-1212-1212-1212-121212121212"
+
+        youtube_downloader.do_playlist_download(
+            "https://www.youtube.com/playlist?list=PL1", ["aaaaaaaaaaa"], job_id
+        )
+
+        transfers = [state["transfer"] for state in published if "transfer" in state]
+        assert transfers[-1]["downloaded_bytes"] == 9
+        assert transfers[-1]["total_bytes"] == 9
+        job_registry.remove(job_id)
+
+    def test_passthrough_playlist_job(self, monkeypatch, pipeline):
+        """Test that a passthrough job zips remuxed files and drops them after"""
+        import os
+        import zipfile
+
+        from app.routers import youtube_downloader
+        from app.services.jobs import job_registry
+
+        monkeypatch.setattr(
+            youtube_downloader,
+            "extract_playlist_info",
+            lambda url: {"title": "Mix", "entries": []},
+        )
+        job_id = "99999999-9999-9999-9999-999999999999"
+
+        youtube_downloader.do_playlist_download(
+            "https://www.youtube.com/playlist?list=PL1",
+            ["aaaaaaaaaaa"],
+            job_id,
+            audio_format="opus",
+        )
+
+        state = job_registry.get(job_id)
+        zip_path = os.path.join("temp_downloads", state["zip_name"])
+        with zipfile.ZipFile(zip_path) as archive:
+            assert archive.namelist() == ["Song aaaaaaaaaaa.opus"]
+        # The stored track is deleted once it is in the ZIP
+        store = youtube_downloader.media_store
+        assert store.acquire_cached(("aaaaaaaaaaa", "opus", "copy")) is None
+        assert store.acquire_cached(("aaaaaaaaaaa", "mp3", "192")) is None
+
+        from app.services.artifacts import artifact_store
+
+        artifact_store.remove(state["artifact_id"])
+
+    def test_resumed_job_continues_from_checkpoint(self, monkeypatch, pipeline):
+        """Test that a resumed job only downloads the unfinished videos"""
+        import os
+        import zipfile
+
+        from app.routers import youtube_downloader
+        from app.services.jobs import job_registry
+
+        monkeypatch.setattr(
+            youtube_downloader,
+            "extract_playlist_info",
+            lambda url: {"title": "Mix", "entries": []},
+        )
+        # A video finished before the restart, stored by the previous process
+        downloaded = youtube_downloader.download_playlist_video("aaaaaaaaaaa")
+        stored = youtube_downloader.transcode_playlist_video(downloaded)["media"]
+        job_id = "88888888-8888-8888-8888-888888888888"
+        video_ids = ["aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"]
+        job_registry.set(job_id, {"status": "resumed"})
+        job_registry.save_checkpoint(
+            job_id,
+            {
+                "url": "https://www.youtube.com/playlist?list=PL1",
+                "video_ids": video_ids,
+                "client_id": "anonymous",
+                "finished": {
+                    "aaaaaaaaaaa": {
+                        "success": True,
+                        "title": "Song aaaaaaaaaaa",
+                        "path": stored.path,
+                    },
+                    "bbbbbbbbbbb": {
+                        "success": False,
+                        "title": "Unknown",
+                        "error": "Video unavailable",
+                    },
+                },
+            },
+        )
+        del pipeline[:]
+
+        youtube_downloader.do_playlist_download(
+            "https://www.youtube.com/playlist?list=PL1",
+            video_ids,
+            job_id,
+            resumed=True,
+        )
+
+        state = job_registry.get(job_id)
+        assert pipeline == ["ccccccccccc"]
+        assert state["status"] == "complete"
+        assert (state["successful"], state["failed"]) == (2, 1)
+        assert state["failed_videos"][0]["error"] == "Video unavailable"
+        zip_path = os.path.join("temp_downloads", state["zip_name"])
+        with zipfile.ZipFile(zip_path) as archive:
+            assert sorted(archive.namelist()) == [
+                "Song aaaaaaaaaaa.mp3",
+                "Song ccccccccccc.mp3",
+            ]
+        assert job_registry.get_checkpoint(job_id) is None
+
+        from app.services.artifacts import artifact_store
+
+        artifact_store.remove(state["artifact_id"])
+
+
+class TestPlaylistResume:
+    """Test resuming interrupted playlist jobs on startup"""
+
+    def test_resume_playlist_jobs(self, monkeypatch, tmp_path):
+        """Test that checkpointed jobs resume and others are marked failed"""
+        import threading
+
+        from app.routers import youtube_downloader
+        from app.services.jobs import JobRegistry
+
+        registry = JobRegistry(str(tmp_path / "jobs.db"))
+        registry.set("with-checkpoint", {"status": "processing", "current": 1})
+        registry.save_checkpoint(
+            "with-checkpoint",
+            {
+                "url": "https://www.youtube.com/playlist?list=PL1",
+                "video_ids": ["aaaaaaaaaaa"],
+                "client_id": "203.0.113.7",
+                "finished": {},
+            },
+        )
+        registry.set("without-checkpoint", {"status": "initializing"})
+        registry.set("finished", {"status": "complete"})
+
+        calls = []
+        reserved = []
+        ran = threading.Event()
+
+        def fake_job(url, video_ids, job_id, client_id, *formats, **options):
+            calls.append((url, video_ids, job_id, client_id, options["resumed"]))
+            assert options["reservation"] is reserved[0][2]
+            ran.set()
+
+        def fake_reserve(client_id, nbytes):
+            reserved.append((client_id, nbytes, object()))
+            return reserved[-1][2]
+
+        monkeypatch.setattr(youtube_downloader, "job_registry", registry)
+        monkeypatch.setattr(youtube_downloader, "do_playlist_download", fake_job)
+        monkeypatch.setattr(youtube_downloader, "reserve_disk_space", fake_reserve)
+
+        async def scenario():
+            resumed = await youtube_downloader.resume_playlist_jobs()
+            await asyncio.gather(*youtube_downloader._resumed_jobs)
+            return resumed
+
+        assert asyncio.run(scenario()) == 1
+        assert ran.wait(timeout=5)
+        assert calls == [
+            (
+                "https://www.youtube.com/playlist?list=PL1",
+                ["aaaaaaaaaaa"],
+                "with-checkpoint",
+                "203.0.113.7",
+                True,
+            )
+        ]
+        # The job is charged to the client that started it
+        assert [(client_id, nbytes > 0) for client_id, nbytes, _ in reserved] == [
+            ("203.0.113.7", True)
+        ]
+        assert registry.get("with-checkpoint")["status"] == "resumed"
+        assert registry.get("with-checkpoint")["current"] == 1
+        assert registry.get("without-checkpoint")["status"] == "error"
+        assert registry.get("finished")["status"] == "complete"
+
+    def test_job_that_no_longer_fits_is_failed(self, monkeypatch, tmp_path):
+        """Test that a job is not resumed without storage for it"""
+        from app.routers import youtube_downloader
+        from app.services.cleanup import DiskSpaceUnavailable
+        from app.services.jobs import JobRegistry
+
+        registry = JobRegistry(str(tmp_path / "jobs.db"))
+        registry.set("job", {"status": "processing"})
+        registry.save_checkpoint(
+            "job",
+            {
+                "url": "https://www.youtube.com/playlist?list=PL1",
+                "video_ids": ["aaaaaaaaaaa"],
+                "client_id": "203.0.113.7",
+                "finished": {},
+            },
+        )
+
+        def refuse(client_id, nbytes):
+            raise DiskSpaceUnavailable("No room")
+
+        def fake_job(*args, **kwargs):
+            raise AssertionError("The job must not run")
+
+        monkeypatch.setattr(youtube_downloader, "job_registry", registry)
+        monkeypatch.setattr(youtube_downloader, "do_playlist_download", fake_job)
+        monkeypatch.setattr(youtube_downloader, "reserve_disk_space", refuse)
+
+        assert asyncio.run(youtube_downloader.resume_playlist_jobs()) == 0
+        assert registry.get("job")["status"] == "error"
+
+    def test_nothing_to_resume_without_durable_registry(self):
+        """Test that an in-memory registry never resumes jobs"""
+        from app.routers import youtube_downloader
+
+        assert asyncio.run(youtube_downloader.resume_playlist_jobs()) == 0
+
+
+class TestStreamedPlaylistListing:
+    """Test the NDJSON playlist listing"""
+
+    @staticmethod
+    def read_records(response):
+        import json
+
+        return [json.loads(line) for line in response.text.splitlines() if line]
+
+    @pytest.fixture
+    def lazy_playlist(self, monkeypatch):
+        """Fake a playlist whose entries are produced lazily"""
+        from app.routers import youtube_downloader
+        from app.services.metadata_cache import metadata_cache
+
+        consumed = []
+
+        def entries():
+            for i in range(10):
+                consumed.append(i)
+                yield {"id": f"video{i:06d}", "title": f"Video {i}", "duration": 60}
+
+        class LazyYoutubeDL(FakeYoutubeDL):
+            def extract_info(self, url, download=False, process=True):
+                assert process is False
+                if "watch" in url:
+                    playlist_url = "https://www.youtube.com/playlist?list=PL1"
+                    return {"_type": "url", "url": playlist_url}
+                return {"_type": "playlist", "title": "Mix", "entries": entries()}
+
+        monkeypatch.setattr(youtube_downloader.yt_dlp, "YoutubeDL", LazyYoutubeDL)
+        metadata_cache.clear()
+        yield consumed
+        metadata_cache.clear()
+
+    def test_streams_one_page(self, lazy_playlist):
+        """Test that a page is streamed without reading the whole playlist"""
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        client = TestClient(app)
+        response = client.post(
+            "/api/youtube/playlist-info/stream?offset=2&limit=3",
+            json={"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL1"},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        records = self.read_records(response)
+        assert records[0] == {
+            "type": "playlist",
+            "title": "Mix",
+            "offset": 2,
+            "limit": 3,
+        }
+        assert [r["id"] for r in records[1:-1]] == [
+            "video000002",
+            "video000003",
+            "video000004",
+        ]
+        assert records[-1] == {"type": "end", "count": 3, "next_offset": 5}
+        # One entry past the page is read to detect the next page, no more
+        assert lazy_playlist == [0, 1, 2, 3, 4, 5]
+
+    def test_complete_listing_is_cached(self, lazy_playlist):
+        """Test that a complete first page serves later pages from the cache"""
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        client = TestClient(app)
+        url = "https://www.youtube.com/playlist?list=PL1"
+        first = client.post("/api/youtube/playlist-info/stream", json={"url": url})
+        assert self.read_records(first)[-1]["next_offset"] is None
+
+        del lazy_playlist[:]
+        second = client.post(
+            "/api/youtube/playlist-info/stream?offset=8", json={"url": url}
+        )
+        assert [r["id"] for r in self.read_records(second)[1:-1]] == [
+            "video000008",
+            "video000009",
+        ]
+        assert lazy_playlist == []
+
+    def test_errors_are_streamed(self, monkeypatch):
+        """Test that an extraction error ends the stream with an error record"""
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.routers import youtube_downloader
+        from app.services.metadata_cache import metadata_cache
+
+        class FailingYoutubeDL(FakeYoutubeDL):
+            def extract_info(self, url, download=False, process=True):
+                raise RuntimeError("unavailable")
+
+        monkeypatch.setattr(youtube_downloader.yt_dlp, "YoutubeDL", FailingYoutubeDL)
+        metadata_cache.clear()
+
+        client = TestClient(app)
+        response = client.post(
+            "/api/youtube/playlist-info/stream",
+            json={"url": "https://www.youtube.com/playlist?list=PL2"},
+        )
+        records = self.read_records(response)
+        assert records[-1]["type"] == "error"
+        assert "unavailable" in records[-1]["detail"]
+
+
+class TestPlaylistCancellation:
+    """Test cancelling running playlist jobs"""
+
+    def test_cancellation_hook_aborts_download(self):
+        """Test that the progress hook raises once cancelled"""
+        import threading
+
+        import yt_dlp
+
+        from app.routers.youtube_downloader import cancellation_hook
+
+        cancel = threading.Event()
+        hook = cancellation_hook(cancel)
+        hook({"status": "downloading"})
+        cancel.set()
+        with pytest.raises(yt_dlp.utils.DownloadCancelled):
+            hook({"status": "downloading"})
+
+    def test_cancel_stops_job_and_releases_resources(self, monkeypatch, tmp_path):
+        """Test that cancelling drops queued videos and deletes the partial ZIP"""
+        import os
+        import threading
+        import time
+
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.routers import youtube_downloader
+        from app.services.jobs import job_registry
+        from app.services.media_store import MediaStore
+
+        started = []
+
+        def blocking_download(video_id, temp_dir, max_duration=7200, **options):
+            started.append(video_id)
+            cancel_event = options["cancel_event"]
+            while not cancel_event.is_set():
+                time.sleep(0.01)
+            return {"success": False, "video_id": video_id, "error": "cancelled"}
+
+        store = MediaStore(root=str(tmp_path / "media"))
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(youtube_downloader, "media_store", store)
+        monkeypatch.setattr(
+            youtube_downloader, "download_single_video", blocking_download
+        )
+        monkeypatch.setattr(
+            youtube_downloader,
+            "extract_playlist_info",
+            lambda url: {"title": "Mix", "entries": []},
+        )
+        job_id = "55555555-5555-5555-5555-555555555555"
+        video_ids = [f"video{i:06d}" for i in range(8)]
+        job_registry.set(job_id, {"status": "initializing"})
+
+        job = threading.Thread(
+            target=youtube_downloader.do_playlist_download,
+            args=("https://www.youtube.com/playlist?list=PL1", video_ids, job_id),
+        )
+        job.start()
+        deadline = time.monotonic() + 5
+        while not started and time.monotonic() < deadline:
+            time.sleep(0.01)
+        zip_path = os.path.join("temp_downloads", job_registry.get(job_id)["zip_name"])
+        assert os.path.exists(f"{zip_path}.part")
+
+        client = TestClient(app)
+        response = client.post(f"/api/youtube/playlist-download/{job_id}/cancel")
+        assert response.json() == {"job_id": job_id, "status": "cancelling"}
+        job.join(timeout=10)
+
+        state = job_registry.get(job_id)
+        assert state["status"] == "cancelled"
+        assert not os.path.exists(zip_path)
+        assert not os.path.exists(f"{zip_path}.part")
+        # Only the videos that were already running were started
+        assert len(started) < len(video_ids)
+        deadline = time.monotonic() + 5
+        while store._entries or store._inflight:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        # Cancelling again reports the final state
+        again = client.post(f"/api/youtube/playlist-download/{job_id}/cancel")
+        assert again.json()["status"] == "cancelled"
+        job_registry.remove(job_id)
+
+    def test_cancel_unknown_job(self):
+        """Test that unknown and malformed job IDs are rejected"""
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        client = TestClient(app)
+        base = "/api/youtube/playlist-download"
+        unknown = client.post(f"{base}/00000000-0000-0000-0000-000000000000/cancel")
+        assert unknown.status_code == 404
+        assert client.post(f"{base}/not-a-uuid/cancel").status_code == 400
+
+    def test_abandoned_job_is_cancelled(self, monkeypatch):
+        """Test that a job nobody follows after a disconnect is cancelled"""
+        import asyncio
+        import time
+
+        from app.routers import youtube_downloader
+        from app.services.jobs import job_registry
+
+        monkeypatch.setattr(youtube_downloader, "ABANDONED_JOB_GRACE_SECONDS", 0)
+        watched = "66666666-6666-6666-6666-666666666666"
+        abandoned = "77777777-7777-7777-7777-777777777777"
+        for job_id in (watched, abandoned):
+            job_registry.set(job_id, {"status": "processing"})
+        since = time.time()
+        time.sleep(0.01)
+        job_registry.touch(watched)
+
+        async def scenario():
+            await youtube_downloader.cancel_if_abandoned(watched, since)
+            await youtube_downloader.cancel_if_abandoned(abandoned, since)
+
+        asyncio.run(scenario())
+        assert not job_registry.cancel_event(watched).is_set()
+        assert job_registry.cancel_event(abandoned).is_set()
+        for job_id in (watched, abandoned):
+            job_registry.remove(job_id)
+
+
+class TestPipedDownload:
+    """Test the single-video download that is piped to the client"""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.routers import youtube_downloader
+
+        info = {"id": "dQw4w9WgXcQ", "title": "Piped: video", "duration": 60}
+        monkeypatch.setattr(youtube_downloader, "extract_video_info", lambda url: info)
+        monkeypatch.setattr(
+            youtube_downloader,
+            "resolve_pipe_sources",
+            lambda info, selector: [{"url": "https://media", "http_headers": {}}],
+        )
+        return TestClient(app), info
+
+    def test_streams_command_output(self, client, monkeypatch):
+        """Test that ffmpeg's output is the response body"""
+        import sys
+        from app.routers import youtube_downloader
+
+        client, _ = client
+        commands = []
+
+        def fake_command(sources, file_format, bitrate):
+            commands.append((sources, file_format, bitrate))
+            return [sys.executable, "-c", "import sys; sys.stdout.write('media')"]
+
+        monkeypatch.setattr(youtube_downloader, "pipe_command", fake_command)
+        response = client.post(
+            "/api/youtube/download/mp3/stream?bitrate=128",
+            json={"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ"},
+        )
+
+        assert response.status_code == 200
+        assert response.content == b"media"
+        assert response.headers["content-type"] == "audio/mpeg"
+        assert "Piped_video.mp3" in response.headers["content-disposition"]
+        assert commands[0][1:] == ("mp3", "128")
+
+    def test_failure_before_output_is_an_error(self, client, monkeypatch):
+        """Test that ffmpeg failing to start the stream returns a 502"""
+        import sys
+        from app.routers import youtube_downloader
+
+        client, _ = client
+        monkeypatch.setattr(
+            youtube_downloader,
+            "pipe_command",
+            lambda *args: [sys.executable, "-c", "import sys; sys.exit(1)"],
+        )
+        response = client.post(
+            "/api/youtube/download/m4a/stream",
+            json={"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ"},
+        )
+        assert response.status_code == 502
+
+    def test_long_videos_are_rejected(self, client):
+        """Test that the duration limit also applies to piped downloads"""
+        client, info = client
+        info["duration"] = 10 * 3600
+        response = client.post(
+            "/api/youtube/download/mp4/stream",
+            json={"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ"},
+        )
+        assert response.status_code == 400
+        assert "exceeds" in response.json()["detail"]
+
+
+class TestDiskAdmission:
+    """Test that downloads reserve their estimated size before starting"""
+
+    def test_estimates_from_metadata(self):
+        """Test that sizes come from the metadata or duration and bitrate"""
+        from app.routers.youtube_downloader import (
+            estimate_media_bytes,
+            estimate_output_bytes,
+        )
+
+        assert estimate_output_bytes({"duration": 100}, "mp3", "128") == 1_600_000
+        assert estimate_output_bytes({"filesize": 5000}, "mp4") == 5000
+        # The source and the converted file exist side by side
+        info = {"duration": 100, "filesize_approx": 3_000_000}
+        assert estimate_media_bytes(info, "mp3", "128") == 4_600_000
+        assert estimate_output_bytes(None, "m4a") > 0
+
+    def test_playlist_estimate(self):
+        """Test that a playlist is charged its ZIP and the videos in flight"""
+        from app.routers.youtube_downloader import (
+            estimate_media_bytes,
+            estimate_output_bytes,
+            estimate_playlist_bytes,
+        )
+
+        ids = [f"video{i:06d}" for i in range(20)]
+        listed = [
+            {"id": video_id, "duration": 60 * (i + 1)}
+            for i, video_id in enumerate(ids)
+        ]
+        # The last video has no duration; it is assumed to take the median
+        listed[-1] = {"id": ids[-1]}
+        durations = [60 * (i + 1) for i in range(19)] + [600]
+        output = partial(estimate_output_bytes, file_format="mp3", bitrate="128")
+        media = partial(estimate_media_bytes, file_format="mp3", bitrate="128")
+
+        # The ZIP holds every video; 20 videos use 5 download workers, so
+        # the 10 largest can be in flight at once
+        zip_size = sum(output({"duration": d}) for d in durations)
+        peak = sum(media({"duration": d}) for d in sorted(durations)[-10:])
+        estimate = estimate_playlist_bytes({"entries": listed}, ids, "mp3", "128")
+        assert estimate == zip_size + peak
+        # Without a listing every video gets the default duration
+        assert estimate_playlist_bytes(None, ids, "mp3", "128") == (
+            20 * output({}) + 10 * media({})
+        )
+
+    @pytest.mark.parametrize("quota_exceeded, status", [(True, 429), (False, 507)])
+    def test_refused_playlist_job(self, monkeypatch, quota_exceeded, status):
+        """Test that a job that does not fit is refused before it starts"""
+        from fastapi.testclient import TestClient
+
+        from app.main import app
+        from app.routers import youtube_downloader
+        from app.services.cleanup import DiskSpaceUnavailable
+
+        def refuse(client_id, nbytes):
+            raise DiskSpaceUnavailable("No room", quota_exceeded=quota_exceeded)
+
+        monkeypatch.setattr(youtube_downloader, "reserve_disk_space", refuse)
+        response = TestClient(app).post(
+            "/api/youtube/download-playlist",
+            json={
+                "url": "https://www.youtube.com/playlist?list=PL1",
+                "video_ids": ["dQw4w9WgXcQ"],
+            },
+        )
+
+        assert response.status_code == status
+        assert response.json()["detail"] == "No room"
@@ -11,7 +11,9 @@ import {
     CircularProgress,
     Chip,
     Grid,
-    Container
+    Container,
+    FormControlLabel,
+    Switch
 } from '@mui/material';
 import { CloudUpload, Download, Clear, Reorder } from '@mui/icons-material';
 import { DragDropContext, Droppable, Draggable } from 'react-beautiful-dnd';
@@ -27,7 +29,8 @@ function PngToPdfConverter() {
     const [success, setSuccess] = useState('');
     const [settings, setSettings] = useState({
         dpi: 300,
-        filename: 'converted_document'
+        filename: 'converted_document',
+        ocr: false
     });
 
     // Handle file upload
@@ -100,6 +103,7 @@ function PngToPdfConverter() {
             });
             formData.append('dpi', settings.dpi.toString());
             formData.append('filename', settings.filename);
+            formData.append('ocr', settings.ocr.toString());
 
             const blob = await convertToPdf(formData);
 
@@ -295,6 +299,22 @@ function PngToPdfConverter() {
                                 </Typography>
                             </Box>
                         </Grid>
+
+                        {/* OCR */}
+                        <Grid item xs={12}>
+                            <FormControlLabel
+                                control={
+                                    <Switch
+                                        checked={settings.ocr}
+                                        onChange={(e) => setSettings(prev => ({ ...prev, ocr: e.target.checked }))}
+                                    />
+                                }
+                                label="Make text searchable (OCR)"
+                            />
+                            <Typography variant="body2" color="text.secondary">
+                                Recognizes text in the images; conversion takes considerably longer
+                            </Typography>
+                        </Grid>
                     </Grid>
                 </Paper>
             )}
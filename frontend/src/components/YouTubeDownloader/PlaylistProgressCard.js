@@ -5,18 +5,32 @@ import {
     LinearProgress,
     Paper,
     Chip,
-    Alert
+    Alert,
+    Button
 } from '@mui/material';
 import { CloudDownload, CheckCircle, Error } from '@mui/icons-material';
 
+const formatBytes = (bytes) => {
+    if (bytes >= 1024 * 1024 * 1024) return `${(bytes / (1024 * 1024 * 1024)).toFixed(1)} GB`;
+    if (bytes >= 1024 * 1024) return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+    return `${Math.round(bytes / 1024)} KB`;
+};
+
+const formatDuration = (seconds) => {
+    const minutes = Math.floor(seconds / 60);
+    return `${minutes}:${String(seconds % 60).padStart(2, '0')}`;
+};
+
 const PlaylistProgressCard = ({
     downloading,
     progress,
     totalFiles,
+    transfer,
     status,
     error,
     zipPath,
-    onDownloadZip
+    onDownloadZip,
+    onCancel
 }) => {
     if (!downloading && !zipPath && !error) return null;
 
@@ -76,6 +90,28 @@ const PlaylistProgressCard = ({
                         value={totalFiles > 0 ? (progress / totalFiles) * 100 : 0}
                         sx={{ height: 8, borderRadius: 4 }}
                     />
+                    {transfer && transfer.total_bytes > 0 && (
+                        <Box sx={{ mt: 1 }}>
+                            <LinearProgress
+                                variant="determinate"
+                                color="secondary"
+                                value={Math.min(100, (transfer.downloaded_bytes / transfer.total_bytes) * 100)}
+                                sx={{ height: 4, borderRadius: 2 }}
+                            />
+                            <Typography variant="caption" color="text.secondary">
+                                {formatBytes(transfer.downloaded_bytes)} of ~{formatBytes(transfer.total_bytes)}
+                                {transfer.speed > 0 && ` · ${formatBytes(transfer.speed)}/s`}
+                                {transfer.eta != null && ` · about ${formatDuration(transfer.eta)} left`}
+                            </Typography>
+                        </Box>
+                    )}
+                    {onCancel && (
+                        <Box sx={{ mt: 2, textAlign: 'center' }}>
+                            <Button variant="outlined" color="error" size="small" onClick={onCancel}>
+                                Cancel Download
+                            </Button>
+                        </Box>
+                    )}
                 </Box>
             )}
 
@@ -32,6 +32,7 @@ const YouTubeDownloader = () => {
                         onChange={handleFormatChange}
                     >
                         <MenuItem value="mp3">MP3 Audio</MenuItem>
+                        <MenuItem value="m4a">M4A Audio (original quality)</MenuItem>
                         <MenuItem value="mp4">MP4 Video</MenuItem>
                         <MenuItem value="mp3-playlist">MP3 Playlist</MenuItem>
                     </Select>
@@ -39,6 +40,7 @@ const YouTubeDownloader = () => {
             </Paper>
 
             {format === 'mp3' && <YouTubeDownloaderComponent format="mp3" />}
+            {format === 'm4a' && <YouTubeDownloaderComponent format="m4a" />}
             {format === 'mp4' && <YouTubeDownloaderComponent format="mp4" />}
             {format === 'mp3-playlist' && <YouTubePlaylistDownloader />}
         </Container>
@@ -40,7 +40,7 @@ const YouTubeDownloaderComponent = ({ format }) => {
         setError('');
         setStatusMessage(`Downloading and converting to ${format.toUpperCase()}... This may take a moment.`);
         try {
-            const { blob, filename } = await downloadYouTubeFile(url, format);
+            const { blob, filename } = await downloadYouTubeFile(url, format, { stream: true });
             const link = document.createElement('a');
             link.href = window.URL.createObjectURL(blob);
             link.download = filename;
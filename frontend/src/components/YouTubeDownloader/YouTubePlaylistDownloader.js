@@ -13,9 +13,19 @@ import {
     Slider,
     Paper,
     Container,
+    FormControl,
+    InputLabel,
+    Select,
+    MenuItem,
 } from '@mui/material';
 import { PlaylistPlay } from '@mui/icons-material';
-import { getYouTubePlaylistInfo, startYouTubePlaylistDownload, getYouTubePlaylistProgress } from '../../utils/api';
+import {
+    streamYouTubePlaylistInfo,
+    startYouTubePlaylistDownload,
+    getYouTubePlaylistProgress,
+    getYouTubePlaylistProgressEventsUrl,
+    cancelYouTubePlaylistDownload,
+} from '../../utils/api';
 import { API_BASE_URL } from '../../config';
 import PlaylistInfoCard from './PlaylistInfoCard';
 import PlaylistProgressCard from './PlaylistProgressCard';
@@ -31,58 +41,108 @@ const YouTubePlaylistDownloader = () => {
     const [progress, setProgress] = useState(0);
     const [totalFiles, setTotalFiles] = useState(0);
     const [status, setStatus] = useState('');
+    const [transfer, setTransfer] = useState(null);
     const [jobId, setJobId] = useState(null);
     const [zipPath, setZipPath] = useState(null);
+    const [audioFormat, setAudioFormat] = useState('mp3');
+    const [bitrate, setBitrate] = useState('192');
     const pollingIntervalRef = useRef(null);
     const pollRetries = useRef(0);
+    const totalFilesRef = useRef(0);
+
+    useEffect(() => {
+        totalFilesRef.current = totalFiles;
+    }, [totalFiles]);
 
     useEffect(() => {
-        if (jobId) {
+        if (!jobId) {
+            return undefined;
+        }
+
+        let eventSource = null;
+
+        const stopTracking = () => {
+            if (eventSource) {
+                eventSource.close();
+                eventSource = null;
+            }
+            if (pollingIntervalRef.current) {
+                clearInterval(pollingIntervalRef.current);
+                pollingIntervalRef.current = null;
+            }
+        };
+
+        const handleProgress = (progressData) => {
+            if (progressData.status === 'complete') {
+                setStatus('Ready to download');
+                setDownloading(false);
+                stopTracking();
+                setJobId(null);
+                setZipPath(progressData.zip_name);
+                setProgress(progressData.total || totalFilesRef.current);
+                return;
+            }
+            if (progressData.status === 'cancelled') {
+                setStatus('Cancelled');
+                setDownloading(false);
+                stopTracking();
+                setJobId(null);
+                return;
+            }
+            if (progressData.status === 'error') {
+                console.error("Download error from backend:", progressData.message);
+                setError(progressData.message || 'An error occurred during download.');
+                setDownloading(false);
+                stopTracking();
+                setJobId(null);
+                return;
+            }
+            setStatus(progressData.status);
+            setProgress(progressData.current || 0);
+            setTotalFiles(progressData.total || 0);
+            setTransfer(progressData.transfer || null);
+        };
+
+        // Polling fallback for browsers or proxies that cannot hold an event stream
+        const startPolling = () => {
             pollRetries.current = 0;
             pollingIntervalRef.current = setInterval(async () => {
                 try {
                     const progressData = await getYouTubePlaylistProgress(jobId);
                     pollRetries.current = 0;
-
-                    if (progressData.status === 'complete') {
-                        setStatus('Ready to download');
-                        setDownloading(false);
-                        clearInterval(pollingIntervalRef.current);
-                        pollingIntervalRef.current = null;
-                        setJobId(null);
-                        setZipPath(progressData.zip_name);
-                        setProgress(progressData.total || totalFiles);
-                    } else if (progressData.status === 'error') {
-                        console.error("Download error from backend:", progressData.message);
-                        setError(progressData.message || 'An error occurred during download.');
-                        setDownloading(false);
-                        clearInterval(pollingIntervalRef.current);
-                        pollingIntervalRef.current = null;
-                        setJobId(null);
-                    } else {
-                        setStatus(progressData.status);
-                        setProgress(progressData.current || 0);
-                        setTotalFiles(progressData.total || 0);
-                    }
+                    handleProgress(progressData);
                 } catch (error) {
                     pollRetries.current += 1;
                     if (pollRetries.current > 5) {
                         setError('Failed to get download progress. Please try again.');
                         setDownloading(false);
-                        clearInterval(pollingIntervalRef.current);
-                        pollingIntervalRef.current = null;
+                        stopTracking();
                         setJobId(null);
                     }
                 }
             }, 2000);
+        };
+
+        if (window.EventSource) {
+            eventSource = new EventSource(getYouTubePlaylistProgressEventsUrl(jobId));
+            eventSource.addEventListener('progress', (event) => {
+                handleProgress(JSON.parse(event.data));
+            });
+            eventSource.onerror = () => {
+                // The server closes the stream after the final state; anything
+                // else means the stream is unavailable, so fall back to polling.
+                if (eventSource) {
+                    eventSource.close();
+                    eventSource = null;
+                    startPolling();
+                }
+            };
+        } else {
+            startPolling();
         }
 
-        return () => {
-            if (pollingIntervalRef.current) {
-                clearInterval(pollingIntervalRef.current);
-            }
-        };
-    }, [jobId, totalFiles]);
+        return stopTracking;
+    }, [jobId]);
 
     const handleFetchPlaylistInfo = async () => {
         if (!playlistUrl) {
@@ -94,10 +154,27 @@ const YouTubePlaylistDownloader = () => {
         setPlaylistInfo(null);
         setSelectedVideos([]);
         try {
-            const data = await getYouTubePlaylistInfo(playlistUrl);
-            setPlaylistInfo(data);
-            setRange([1, Math.min(data.videos.length, 10)]);
-            setSelectedVideos(data.videos.slice(0, Math.min(data.videos.length, 10)).map(v => v.id));
+            // Render entries as they arrive instead of waiting for the whole listing
+            let title = null;
+            let videos = [];
+            await streamYouTubePlaylistInfo(playlistUrl, (records) => {
+                const listedBefore = videos.length;
+                const added = [];
+                records.forEach((record) => {
+                    if (record.type === 'playlist') {
+                        title = record.title;
+                    } else if (record.type === 'video') {
+                        added.push({ id: record.id, title: record.title });
+                    }
+                });
+                videos = [...videos, ...added];
+                setPlaylistInfo({ title, videos });
+                // Preselect the first 10 videos as they arrive
+                if (listedBefore < 10) {
+                    setRange([1, Math.max(1, Math.min(videos.length, 10))]);
+                    setSelectedVideos(videos.slice(0, Math.min(videos.length, 10)).map(v => v.id));
+                }
+            });
         } catch (error) {
             console.error("Failed to fetch playlist info:", error);
             setError(error.message || 'Failed to fetch playlist info.');
@@ -113,12 +190,13 @@ const YouTubePlaylistDownloader = () => {
         setDownloading(true);
         setError('');
         setProgress(0);
+        setTransfer(null);
         setTotalFiles(selectedVideos.length);
         setStatus('Initializing...');
         setZipPath(null);
 
         try {
-            const response = await startYouTubePlaylistDownload(playlistUrl, selectedVideos);
+            const response = await startYouTubePlaylistDownload(playlistUrl, selectedVideos, { audioFormat, bitrate });
             setJobId(response.job_id);
         } catch (error) {
             console.error("Failed to start playlist download:", error);
@@ -127,6 +205,19 @@ const YouTubePlaylistDownloader = () => {
         }
     };
 
+    const handleCancelDownload = async () => {
+        if (!jobId) {
+            return;
+        }
+        try {
+            await cancelYouTubePlaylistDownload(jobId);
+            setStatus('Cancelling...');
+        } catch (error) {
+            console.error("Failed to cancel playlist download:", error);
+            setError(error.message || 'Failed to cancel playlist download.');
+        }
+    };
+
     const handleDownloadZip = async () => {
         if (zipPath) {
             const downloadUrl = `${API_BASE_URL}/api/youtube/download-zip/?filename=${encodeURIComponent(zipPath)}`;
@@ -256,6 +347,39 @@ const YouTubePlaylistDownloader = () => {
                         ))}
                     </List>
 
+                    <Box sx={{ mt: 3, display: 'flex', gap: 2, justifyContent: 'center' }}>
+                        <FormControl size="small" sx={{ minWidth: 220 }}>
+                            <InputLabel id="playlist-audio-format-label">Audio Format</InputLabel>
+                            <Select
+                                labelId="playlist-audio-format-label"
+                                value={audioFormat}
+                                label="Audio Format"
+                                onChange={(e) => setAudioFormat(e.target.value)}
+                                disabled={downloading}
+                            >
+                                <MenuItem value="mp3">MP3 (re-encoded)</MenuItem>
+                                <MenuItem value="m4a">M4A (original audio, fastest)</MenuItem>
+                                <MenuItem value="opus">Opus (original audio, fastest)</MenuItem>
+                            </Select>
+                        </FormControl>
+                        {audioFormat === 'mp3' && (
+                            <FormControl size="small" sx={{ minWidth: 140 }}>
+                                <InputLabel id="playlist-bitrate-label">Bitrate</InputLabel>
+                                <Select
+                                    labelId="playlist-bitrate-label"
+                                    value={bitrate}
+                                    label="Bitrate"
+                                    onChange={(e) => setBitrate(e.target.value)}
+                                    disabled={downloading}
+                                >
+                                    {['128', '192', '256', '320'].map((rate) => (
+                                        <MenuItem key={rate} value={rate}>{rate} kbps</MenuItem>
+                                    ))}
+                                </Select>
+                            </FormControl>
+                        )}
+                    </Box>
+
                     <Box sx={{ mt: 3, textAlign: 'center' }}>
                         <Button
                             variant="contained"
@@ -273,10 +397,12 @@ const YouTubePlaylistDownloader = () => {
                 downloading={downloading}
                 progress={progress}
                 totalFiles={totalFiles}
+                transfer={transfer}
                 status={status}
                 error={downloading ? error : null}
                 zipPath={zipPath}
                 onDownloadZip={handleDownloadZip}
+                onCancel={jobId ? handleCancelDownload : null}
             />
         </Container>
     );
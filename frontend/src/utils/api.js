@@ -120,8 +120,12 @@ export const getYouTubeInfo = async (url) => {
     return response.json();
 };
 
-export const downloadYouTubeFile = async (url, format) => {
-    const response = await fetch(`${API_BASE_URL}/api/youtube/download/${format}`, {
+// With stream, the server pipes the file while fetching it; formats it cannot
+// pipe, and a busy server, fall back to the regular download
+export const downloadYouTubeFile = async (url, format, { bitrate, stream = false } = {}) => {
+    const query = bitrate ? `?bitrate=${bitrate}` : '';
+    const path = stream ? `${format}/stream` : format;
+    const response = await fetch(`${API_BASE_URL}/api/youtube/download/${path}${query}`, {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
@@ -129,6 +133,16 @@ export const downloadYouTubeFile = async (url, format) => {
         body: JSON.stringify({ url }),
     });
 
+    if (stream && [502, 503].includes(response.status)) {
+        return downloadYouTubeFile(url, format, { bitrate });
+    }
+    if (stream && response.status === 400) {
+        const errorData = await response.clone().json().catch(() => ({}));
+        if ((errorData.detail || '').includes('not available for streaming')) {
+            return downloadYouTubeFile(url, format, { bitrate });
+        }
+    }
+
     if (!response.ok) {
         const errorData = await response.json().catch(() => ({}));
         throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
@@ -169,6 +183,46 @@ export const getYouTubePlaylistInfo = async (url) => {
     return response.json();
 };
 
+// Streams a playlist listing as NDJSON; onRecords receives each batch of parsed records
+export const streamYouTubePlaylistInfo = async (url, onRecords, { offset = 0, limit = 500 } = {}) => {
+    const response = await fetch(
+        `${API_BASE_URL}/api/youtube/playlist-info/stream?offset=${offset}&limit=${limit}`,
+        {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ url }),
+        }
+    );
+
+    if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    for (;;) {
+        const { done, value } = await reader.read();
+        buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+        const lines = buffered.split('\n');
+        buffered = done ? '' : lines.pop();
+        const records = lines.filter(line => line.trim()).map(line => JSON.parse(line));
+        const error = records.find(record => record.type === 'error');
+        if (error) {
+            throw new Error(error.detail);
+        }
+        if (records.length) {
+            onRecords(records);
+        }
+        if (done) {
+            break;
+        }
+    }
+};
+
 export const downloadYouTubePlaylist = async (url, video_ids) => {
     const response = await fetch(`${API_BASE_URL}/api/youtube/download-playlist`, {
         method: 'POST',
@@ -201,13 +255,13 @@ export const downloadYouTubePlaylist = async (url, video_ids) => {
     return { blob, filename };
 };
 
-export const startYouTubePlaylistDownload = async (url, video_ids) => {
+export const startYouTubePlaylistDownload = async (url, video_ids, { audioFormat = 'mp3', bitrate = '192' } = {}) => {
     const response = await fetch(`${API_BASE_URL}/api/youtube/download-playlist`, {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ url, video_ids }),
+        body: JSON.stringify({ url, video_ids, audio_format: audioFormat, bitrate }),
     });
 
     if (!response.ok) {
@@ -229,6 +283,22 @@ export const getYouTubePlaylistProgress = async (jobId) => {
     return response.json();
 };
 
+export const getYouTubePlaylistProgressEventsUrl = (jobId) =>
+    `${API_BASE_URL}/api/youtube/playlist-download-progress/${jobId}/events`;
+
+export const cancelYouTubePlaylistDownload = async (jobId) => {
+    const response = await fetch(`${API_BASE_URL}/api/youtube/playlist-download/${jobId}/cancel`, {
+        method: 'POST',
+    });
+
+    if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+    }
+
+    return response.json();
+};
+
 export const generateMockingText = async (text, start_with_lowercase) => {
     try {
         const response = await fetch(`${API_BASE_URL}/api/mocking-text`, {